@@ -5,6 +5,20 @@ set -e
 DEV_MODE=false
 BOOK_NAME=""
 BUILD_ALL=false
+STATIC_DIAGRAMS=false
+STATIC_DIAGRAMS_LINK=false
+USE_PANDOC_AST=false
+PANDOC_POOL=false
+REPRODUCIBLE=false
+CHUNKED_HTML=false
+PRECOMPRESS=false
+FINGERPRINT_ASSETS=false
+CRITICAL_CSS=false
+BUILD_RESUME=false
+KINDLE_PROFILE=""
+PDF_PROFILE=""
+BUILD_VARIANTS=false
+PDF_DIAGRAMS=vector
 
 # Parse command line arguments
 while [[ $# -gt 0 ]]; do
@@ -21,6 +35,63 @@ while [[ $# -gt 0 ]]; do
             BUILD_ALL=true
             shift
             ;;
+        --static-diagrams)
+            STATIC_DIAGRAMS=true
+            shift
+            ;;
+        --linked-diagrams)
+            STATIC_DIAGRAMS=true
+            STATIC_DIAGRAMS_LINK=true
+            shift
+            ;;
+        --raster-diagrams)
+            PDF_DIAGRAMS=png
+            shift
+            ;;
+        --ast)
+            USE_PANDOC_AST=true
+            shift
+            ;;
+        --pandoc-pool)
+            PANDOC_POOL=true
+            shift
+            ;;
+        --reproducible)
+            REPRODUCIBLE=true
+            shift
+            ;;
+        --chunked)
+            CHUNKED_HTML=true
+            shift
+            ;;
+        --resume)
+            BUILD_RESUME=true
+            shift
+            ;;
+        --fingerprint)
+            FINGERPRINT_ASSETS=true
+            shift
+            ;;
+        --critical-css)
+            CRITICAL_CSS=true
+            shift
+            ;;
+        --compress)
+            PRECOMPRESS=true
+            shift
+            ;;
+        --pdf-profile)
+            PDF_PROFILE="$2"
+            shift 2
+            ;;
+        --kindle-profile)
+            KINDLE_PROFILE="$2"
+            shift 2
+            ;;
+        --variants)
+            BUILD_VARIANTS=true
+            shift
+            ;;
         --help|-h)
             echo "📚 Ebook Builder"
             echo "================"
@@ -32,6 +103,20 @@ while [[ $# -gt 0 ]]; do
             echo "  --dev, -d          Development mode (HTML only, faster)"
             echo "  --book <name>, -b  Build specific book"
             echo "  --all, -a          Build all books (default)"
+            echo "  --static-diagrams  Prerender Mermaid diagrams as inline SVG for HTML"
+            echo "  --linked-diagrams  Prerender Mermaid diagrams as linked SVG files for HTML"
+            echo "  --raster-diagrams  Embed PDF/EPUB diagrams as PNG instead of vector SVG"
+            echo "  --ast              Render HTML and EPUB from a cached pandoc AST"
+            echo "  --pandoc-pool      Run conversions on warm pandoc servers for this build"
+            echo "  --reproducible     Byte-identical outputs (pins dates to SOURCE_DATE_EPOCH)"
+            echo "  --chunked          Also write a multi-page HTML edition (one page per chapter)"
+            echo "  --resume           Continue an interrupted build, skipping completed stages"
+            echo "  --fingerprint      Link assets under content-hashed names for immutable caching"
+            echo "  --critical-css     Inline only first-screen CSS in HTML, load the rest non-blocking"
+            echo "  --compress         Minify HTML/CSS and write .gz/.br files for publishing"
+            echo "  --pdf-profile <p>  PDF profile: screen (default, smallest), ebook or print"
+            echo "  --kindle-profile <p> Kindle output: azw3 (default), mobi (legacy) or azw3,mobi"
+            echo "  --variants         Also build the PDF variants listed in book-config.json"
             echo "  --help, -h         Show this help"
             echo ""
             echo "Examples:"
@@ -52,6 +137,18 @@ done
 echo "📚 Ebook Builder"
 echo "================"
 
+# Reproducible builds date everything to the last commit unless SOURCE_DATE_EPOCH is given
+if [ "$REPRODUCIBLE" = true ]; then
+    if [ -z "$SOURCE_DATE_EPOCH" ]; then
+        SOURCE_DATE_EPOCH=$(git log -1 --format=%ct 2>/dev/null || echo 0)
+    fi
+    export SOURCE_DATE_EPOCH
+    echo "🔒 Reproducible build (SOURCE_DATE_EPOCH=$SOURCE_DATE_EPOCH)"
+fi
+
+# Options consumed by scripts/build-all-formats.sh
+export STATIC_DIAGRAMS STATIC_DIAGRAMS_LINK USE_PANDOC_AST CHUNKED_HTML FINGERPRINT_ASSETS CRITICAL_CSS PRECOMPRESS PDF_PROFILE PDF_DIAGRAMS BUILD_VARIANTS BUILD_RESUME KINDLE_PROFILE
+
 # Check if virtual environment exists
 if [ ! -d ".venv" ]; then
     echo "❌ Virtual environment not found. Please run setup first:"
@@ -71,11 +168,23 @@ fi
 
 echo "✅ Virtual environment activated"
 
+# Start a warm pandoc pool for this build unless one is already running
+if [ "$PANDOC_POOL" = true ] && ! python3 scripts/pandoc_pool.py status | grep -q "pandoc server"; then
+    if python3 scripts/pandoc_pool.py start; then
+        trap 'python3 scripts/pandoc_pool.py stop' EXIT
+    else
+        echo "⚠️ Pandoc pool unavailable, using the pandoc CLI"
+    fi
+fi
+
 # Smart cleaning based on build mode and scope
 echo ""
 echo "🧹 Smart cleaning based on build mode..."
 
-if [ "$DEV_MODE" = true ]; then
+if [ "$BUILD_RESUME" = true ]; then
+    # Resumed build: completed stages stay published and are checked against the journal
+    echo "  🔁 Resuming: keeping public/ (see .cache/build-journal.json)"
+elif [ "$DEV_MODE" = true ]; then
     # Development mode cleaning
     if [ -n "$BOOK_NAME" ]; then
         # Dev + specific book: Only clean that book's HTML
@@ -183,11 +292,11 @@ else
     echo "   • HTML: public/<book-name>/<book-name>.html"
     echo "   • PDF: public/<book-name>/<book-name>.pdf (if WeasyPrint installed)"
     echo "   • EPUB: public/<book-name>/<book-name>.epub"
-    echo "   • MOBI: public/<book-name>/<book-name>.mobi (if Calibre installed)"
+    echo "   • Kindle: public/<book-name>/<book-name>.azw3 (if Calibre installed)"
     echo ""
     echo "📖 To view your books:"
     echo "   • Open HTML files in your browser"
     echo "   • Use any PDF viewer for PDF files"
     echo "   • Use any EPUB reader for EPUB files"
-    echo "   • Transfer MOBI files to your Kindle"
+    echo "   • Transfer AZW3 files to your Kindle"
 fi 
\ No newline at end of file
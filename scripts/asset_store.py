@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Content-addressed asset store shared by all books
+Identical assets (covers, diagrams, stylesheets) are stored once under
+.cache/assets/ by content hash and hardlinked into each book's directory.
+The store lives outside public/, so it survives the clean before each build
+"""
+
+import sys
+import os
+import shutil
+import time
+import argparse
+import tempfile
+
+import build_cache
+
+STORE_DIR = os.environ.get("ASSET_STORE_DIR") or os.path.join(build_cache.CACHE_ROOT, "assets")
+GC_MIN_AGE = 600
+
+
+def stored_path(digest, ext):
+    """Path of an asset inside the store: assets/<hash[:2]>/<hash><ext>"""
+    return os.path.join(STORE_DIR, digest[:2], digest + ext)
+
+
+def _write_store_entry(path, write):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _reuse_store_entry(path):
+    """Refresh an existing entry's mtime so gc leaves it alone; False if missing"""
+    try:
+        os.utime(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def store_file(src_path):
+    """Add a file to the store (skipped when its hash is already present)"""
+    digest = build_cache.file_hash(src_path)
+    path = stored_path(digest, os.path.splitext(src_path)[1].lower())
+    if not _reuse_store_entry(path):
+        _write_store_entry(path, lambda tmp: shutil.copyfile(src_path, tmp))
+    return path
+
+
+def store_bytes(data, ext):
+    """Add in-memory content to the store (skipped when already present)"""
+    digest = build_cache.data_hash(data)
+    path = stored_path(digest, ext.lower())
+    if not _reuse_store_entry(path):
+
+        def write(tmp):
+            with open(tmp, "wb") as f:
+                f.write(data)
+
+        _write_store_entry(path, write)
+    return path
+
+
+def link_to(stored, dest_path):
+    """Hardlink a stored asset to dest_path, copying when links are unsupported"""
+    dest_dir = os.path.dirname(os.path.abspath(dest_path))
+    os.makedirs(dest_dir, exist_ok=True)
+
+    if os.path.exists(dest_path) and os.path.samefile(stored, dest_path):
+        return dest_path
+
+    # Link to a temp name first so dest_path is replaced atomically
+    fd, tmp_path = tempfile.mkstemp(dir=dest_dir, prefix=".tmp-")
+    os.close(fd)
+    os.unlink(tmp_path)
+    try:
+        os.link(stored, tmp_path)
+    except OSError:
+        # Cross-device or no hardlink support: fall back to a plain copy
+        shutil.copyfile(stored, tmp_path)
+    os.replace(tmp_path, dest_path)
+    return dest_path
+
+
+def add_file(src_path, dest_path):
+    """Store src_path and link it to dest_path"""
+    return link_to(store_file(src_path), dest_path)
+
+
+def add_bytes(data, dest_path):
+    """Store data and link it to dest_path"""
+    return link_to(store_bytes(data, os.path.splitext(dest_path)[1]), dest_path)
+
+
+def dedupe_dir(directory):
+    """Replace every regular file under directory with a link into the store"""
+    count = 0
+    store_root = os.path.abspath(STORE_DIR)
+    for root, _dirs, files in os.walk(directory):
+        if os.path.abspath(root).startswith(store_root):
+            continue
+        for name in files:
+            if name.startswith(".tmp-"):
+                continue
+            path = os.path.join(root, name)
+            if os.path.islink(path):
+                continue
+            add_file(path, path)
+            count += 1
+    return count
+
+
+def garbage_collect(min_age=GC_MIN_AGE):
+    """Remove store entries no longer linked from any book"""
+    removed = 0
+    if not os.path.isdir(STORE_DIR):
+        return removed
+    now = time.time()
+    for root, _dirs, files in os.walk(STORE_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            # Fresh entries may be about to be linked by a concurrent build
+            if stat.st_nlink <= 1 and now - stat.st_mtime >= min_age:
+                os.unlink(path)
+                removed += 1
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Content-addressed asset store for published books"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    add_parser = subparsers.add_parser("add", help="Store files and link them")
+    add_parser.add_argument("sources", nargs="+", help="Files to store")
+    add_parser.add_argument(
+        "--dest", required=True, help="Destination file, or directory for many files"
+    )
+
+    dedupe_parser = subparsers.add_parser(
+        "dedupe", help="Replace files in directories with links into the store"
+    )
+    dedupe_parser.add_argument("directories", nargs="+", help="Directories to dedupe")
+
+    gc_parser = subparsers.add_parser("gc", help="Remove unreferenced store entries")
+    gc_parser.add_argument(
+        "--min-age",
+        type=int,
+        default=GC_MIN_AGE,
+        help="Only remove entries older than this many seconds",
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "add":
+        dest_is_dir = (
+            len(args.sources) > 1 or args.dest.endswith("/") or os.path.isdir(args.dest)
+        )
+        for src in args.sources:
+            if not os.path.exists(src):
+                print(f"Error: Asset not found: {src}")
+                sys.exit(1)
+            dest = (
+                os.path.join(args.dest, os.path.basename(src)) if dest_is_dir else args.dest
+            )
+            add_file(src, dest)
+            print(f"  ✓ Linked {src} -> {dest}")
+    elif args.command == "dedupe":
+        for directory in args.directories:
+            count = dedupe_dir(directory)
+            print(f"✓ Deduplicated {count} file(s) in {directory}")
+    elif args.command == "gc":
+        removed = garbage_collect(args.min_age)
+        print(f"✓ Removed {removed} unreferenced asset(s) from {STORE_DIR}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Atomically publish build artifacts into public/
+Each file is staged next to its destination and moved into place with a rename,
+so readers and concurrent builds never see a half-written artifact
+"""
+
+import sys
+import os
+import shutil
+import argparse
+import tempfile
+
+
+def publish_file(src_path, dest_path):
+    """Copy (or hardlink) src_path to dest_path and rename it into place"""
+    dest_dir = os.path.dirname(os.path.abspath(dest_path))
+    os.makedirs(dest_dir, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=dest_dir, prefix=".publish-")
+    os.close(fd)
+    try:
+        os.unlink(tmp_path)
+        try:
+            # Hardlinks keep asset-store sharing and avoid copying on one filesystem
+            os.link(src_path, tmp_path)
+        except OSError:
+            shutil.copy2(src_path, tmp_path)
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return dest_path
+
+
+def replace_dir(src_dir, dest_dir):
+    """Publish a whole directory, dropping files the new build no longer has.
+    The new tree is staged next to dest_dir and swapped in with two renames"""
+    parent = os.path.dirname(os.path.abspath(dest_dir))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=parent, prefix=".publish-")
+    os.chmod(staging, 0o755)
+    retired = None
+    try:
+        published = publish_tree(src_dir, staging)
+        if os.path.isdir(dest_dir):
+            retired = tempfile.mkdtemp(dir=parent, prefix=".retired-")
+            os.rmdir(retired)
+            os.rename(dest_dir, retired)
+        os.rename(staging, dest_dir)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        if retired and not os.path.exists(dest_dir):
+            os.rename(retired, dest_dir)
+        raise
+    if retired:
+        shutil.rmtree(retired, ignore_errors=True)
+    return published
+
+
+def publish_tree(src_dir, dest_dir, names=None, replace_dirs=False):
+    """Publish files under src_dir (or only the given relative names) into dest_dir"""
+    if names is None:
+        names = []
+        for root, _dirs, files in os.walk(src_dir):
+            for name in files:
+                names.append(os.path.relpath(os.path.join(root, name), src_dir))
+
+    published = []
+    for name in sorted(names):
+        src_path = os.path.join(src_dir, name)
+        if os.path.isdir(src_path) and replace_dirs:
+            published += [
+                os.path.join(name, sub)
+                for sub in replace_dir(src_path, os.path.join(dest_dir, name))
+            ]
+            continue
+        if os.path.isdir(src_path):
+            published += [
+                os.path.join(name, sub)
+                for sub in publish_tree(src_path, os.path.join(dest_dir, name))
+            ]
+            continue
+        if not os.path.exists(src_path):
+            continue
+        publish_file(src_path, os.path.join(dest_dir, name))
+        published.append(name)
+    return published
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Atomically publish build artifacts into an output directory"
+    )
+    parser.add_argument("src_dir", help="Directory holding finished artifacts")
+    parser.add_argument("dest_dir", help="Published directory (e.g. public/<book>)")
+    parser.add_argument(
+        "--only", nargs="+", help="Only publish these paths relative to src_dir"
+    )
+    parser.add_argument(
+        "--replace-dirs",
+        action="store_true",
+        help="Replace published directories wholesale (drops stale files)",
+    )
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.src_dir):
+        print(f"Error: Source directory not found: {args.src_dir}")
+        sys.exit(1)
+
+    published = publish_tree(args.src_dir, args.dest_dir, args.only, args.replace_dirs)
+    print(f"✓ Published {len(published)} file(s) to {args.dest_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+Book catalog and build-status store (SQLite, .cache/catalog.sqlite)
+Synced from books/book-config.json and books/*.md: metadata, template, source
+and input hashes per book. Full builds record every finished stage with its
+duration and artifact sizes, so "which books are stale?" is one query instead
+of a jq call and a rebuild per book. Source files are rehashed only when their
+size or mtime changed
+"""
+
+import sys
+import os
+import json
+import time
+import shlex
+import sqlite3
+import argparse
+
+import build_cache
+
+CATALOG_FILE = os.path.join(build_cache.CACHE_ROOT, "catalog.sqlite")
+CONFIG_FILE = os.path.join(build_cache.REPO_ROOT, "books", "book-config.json")
+BOOKS_DIR = os.path.join(build_cache.REPO_ROOT, "books")
+TEMPLATES_DIR = os.path.join(build_cache.REPO_ROOT, "templates")
+FORMATS = ["html", "pdf", "epub", "mobi"]
+
+# Used by build-all-formats.sh for books missing from book-config.json
+DEFAULT_TEMPLATE = "afrinenglish"
+DEFAULT_TITLE = "Unknown Title"
+DEFAULT_AUTHOR = "Param Harrison"
+
+# Bump when the schema changes; the catalog is rebuilt (build history is lost)
+SCHEMA_VERSION = 1
+SCHEMA = """
+CREATE TABLE books (
+    name TEXT PRIMARY KEY,
+    title TEXT,
+    author TEXT,
+    template TEXT,
+    category TEXT,
+    description TEXT,
+    config TEXT,
+    configured INTEGER NOT NULL,
+    source_hash TEXT,
+    inputs_hash TEXT NOT NULL,
+    synced_at REAL NOT NULL
+);
+CREATE TABLE templates (
+    name TEXT PRIMARY KEY,
+    display_name TEXT,
+    description TEXT,
+    css TEXT,
+    html TEXT,
+    config TEXT
+);
+CREATE TABLE builds (
+    book TEXT NOT NULL,
+    format TEXT NOT NULL,
+    built_at REAL NOT NULL,
+    seconds REAL,
+    inputs_hash TEXT NOT NULL,
+    run_id TEXT,
+    PRIMARY KEY (book, format)
+);
+CREATE TABLE artifacts (
+    book TEXT NOT NULL,
+    format TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (book, name)
+);
+CREATE TABLE files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL
+);
+CREATE INDEX books_template ON books (template);
+"""
+
+
+def connect():
+    os.makedirs(os.path.dirname(CATALOG_FILE), exist_ok=True)
+    # Background Kindle jobs and build workers write concurrently
+    conn = sqlite3.connect(CATALOG_FILE, timeout=30)
+    conn.row_factory = sqlite3.Row
+    if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+        with conn:
+            conn.execute("BEGIN EXCLUSIVE")
+            # Checked again under the lock: another build may have just created it
+            if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                for (table,) in conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table'"
+                ).fetchall():
+                    conn.execute(f"DROP TABLE {table}")
+                for statement in SCHEMA.split(";"):
+                    if statement.strip():
+                        conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.execute("PRAGMA journal_mode = WAL")
+    return conn
+
+
+def cached_file_hash(conn, path):
+    """sha256 of a file, recomputed only when its size or mtime changed"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    row = conn.execute("SELECT size, mtime_ns, sha256 FROM files WHERE path = ?", (path,)).fetchone()
+    if row and row["size"] == stat.st_size and row["mtime_ns"] == stat.st_mtime_ns:
+        return row["sha256"]
+    digest = build_cache.file_hash(path)
+    conn.execute(
+        "INSERT OR REPLACE INTO files (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+        (path, stat.st_size, stat.st_mtime_ns, digest),
+    )
+    return digest
+
+
+def cover_path(book):
+    images_dir = os.path.join(BOOKS_DIR, "images")
+    cover = os.path.join(images_dir, f"{book}.jpg")
+    return cover if os.path.exists(cover) else os.path.join(images_dir, "default.jpg")
+
+
+def sync(conn, only=None):
+    """Refresh books and templates from book-config.json and books/*.md;
+    with only, refresh just that book (and the templates)"""
+    with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    templates = config.get("templates", {})
+    variants = json.dumps(config.get("variants", {}), sort_keys=True)
+    now = time.time()
+
+    names = set(config.get("books", {}))
+    names.update(name[:-3] for name in os.listdir(BOOKS_DIR) if name.endswith(".md"))
+    if only is not None:
+        names = {only}
+
+    with conn:
+        conn.execute("DELETE FROM templates")
+        for name, template in templates.items():
+            conn.execute(
+                "INSERT INTO templates VALUES (?, ?, ?, ?, ?, ?)",
+                (name, template.get("name"), template.get("description"),
+                 template.get("css"), template.get("html"), json.dumps(template, sort_keys=True)),
+            )
+
+        for name in sorted(names):
+            book_config = config.get("books", {}).get(name)
+            configured = book_config is not None
+            book_config = book_config or {}
+            template_name = book_config.get("template", DEFAULT_TEMPLATE)
+            template = templates.get(template_name, {})
+
+            source_hash = cached_file_hash(conn, os.path.join(BOOKS_DIR, f"{name}.md"))
+            # Everything a book's stages read (as in build_journal.book_inputs_hash)
+            parts = [
+                json.dumps(book_config, sort_keys=True),
+                json.dumps(template, sort_keys=True),
+                variants,
+                source_hash or "missing",
+                cached_file_hash(conn, cover_path(name)) or "missing",
+            ]
+            parts += [
+                cached_file_hash(conn, os.path.join(TEMPLATES_DIR, template[key])) or "missing"
+                for key in ("css", "html") if template.get(key)
+            ]
+            conn.execute(
+                "INSERT OR REPLACE INTO books VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (name, book_config.get("title"), book_config.get("author"), template_name,
+                 book_config.get("category"), book_config.get("description"),
+                 json.dumps(book_config, sort_keys=True), int(configured), source_hash,
+                 build_cache.content_hash(*parts), now),
+            )
+
+        if only is None:
+            # Books that were removed from both the config and books/
+            placeholders = ", ".join("?" for _ in names) or "''"
+            for table, column in (("books", "name"), ("builds", "book"), ("artifacts", "book")):
+                conn.execute(
+                    f"DELETE FROM {table} WHERE {column} NOT IN ({placeholders})", sorted(names)
+                )
+
+
+def record(conn, book, fmt, publish_dir, names, seconds=None):
+    """Record a finished stage: its duration and the sizes of its published files"""
+    sync(conn, only=book)
+    inputs = conn.execute("SELECT inputs_hash FROM books WHERE name = ?", (book,)).fetchone()[0]
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO builds VALUES (?, ?, ?, ?, ?, ?)",
+            (book, fmt, time.time(), seconds, inputs, os.environ.get("BUILD_RUN_ID")),
+        )
+        conn.execute("DELETE FROM artifacts WHERE book = ? AND format = ?", (book, fmt))
+        for name in names:
+            path = os.path.join(publish_dir, name)
+            if os.path.isfile(path):
+                conn.execute(
+                    "INSERT OR REPLACE INTO artifacts VALUES (?, ?, ?, ?)",
+                    (book, fmt, name, os.path.getsize(path)),
+                )
+
+
+def stale_formats(conn, book, formats):
+    """Formats never built, or built from different inputs than the current ones"""
+    rows = conn.execute(
+        """SELECT b.format FROM builds b JOIN books k ON k.name = b.book
+           WHERE b.book = ? AND b.inputs_hash = k.inputs_hash""",
+        (book,),
+    ).fetchall()
+    fresh = {row["format"] for row in rows}
+    return [fmt for fmt in formats if fmt not in fresh]
+
+
+def query_books(conn, template=None, category=None, stale=False, formats=FORMATS):
+    sql = "SELECT * FROM books WHERE 1 = 1"
+    params = []
+    if template:
+        sql += " AND template = ?"
+        params.append(template)
+    if category:
+        sql += " AND category = ?"
+        params.append(category)
+    books = conn.execute(sql + " ORDER BY name", params).fetchall()
+    if stale:
+        books = [book for book in books if stale_formats(conn, book["name"], formats)]
+    return books
+
+
+def format_age(timestamp):
+    seconds = time.time() - timestamp
+    for unit, size in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds >= size:
+            return f"{seconds / size:.0f}{unit} ago"
+    return "just now"
+
+
+def print_books(conn, books, formats):
+    if not books:
+        print("No matching books")
+        return
+    for book in books:
+        stale = stale_formats(conn, book["name"], formats)
+        status = f"stale: {' '.join(stale)}" if stale else "up to date"
+        configured = "" if book["configured"] else "  (not configured)"
+        print(f"📖 {book['name']:<32} {book['template']:<20} {book['category'] or '-':<18} {status}{configured}")
+
+
+def show(conn, name):
+    book = conn.execute("SELECT * FROM books WHERE name = ?", (name,)).fetchone()
+    if book is None:
+        print(f"Error: Unknown book: {name}")
+        sys.exit(1)
+    print(f"📖 {book['name']}: {book['title'] or '-'} ({book['author'] or '-'})")
+    print(f"   Template: {book['template']}  Category: {book['category'] or '-'}")
+    builds = {
+        row["format"]: row
+        for row in conn.execute("SELECT * FROM builds WHERE book = ?", (name,)).fetchall()
+    }
+    for fmt in FORMATS:
+        build = builds.get(fmt)
+        if build is None:
+            print(f"   {fmt.upper():<5} never built")
+            continue
+        state = "up to date" if build["inputs_hash"] == book["inputs_hash"] else "stale"
+        duration = f", {build['seconds']:.0f}s" if build["seconds"] is not None else ""
+        artifacts = ", ".join(
+            f"{row['name']} {row['size'] / 1024:.0f} KB"
+            for row in conn.execute(
+                "SELECT name, size FROM artifacts WHERE book = ? AND format = ? ORDER BY name",
+                (name, fmt),
+            ).fetchall()
+        )
+        print(f"   {fmt.upper():<5} {state:<11} built {format_age(build['built_at'])}{duration}  {artifacts}")
+
+
+def overview(conn):
+    """Books, templates and book files (the output of scripts/list-books.sh)"""
+    books = conn.execute("SELECT * FROM books ORDER BY name").fetchall()
+    print("📚 Available Books:")
+    print("==================")
+    for book in books:
+        if book["configured"]:
+            print(f"📖 {book['name']}:")
+            print(f"   Title: {book['title']}")
+            print(f"   Author: {book['author']}")
+            print(f"   Template: {book['template']}")
+            print(f"   Category: {book['category']}")
+            print(f"   Description: {book['description']}\n")
+
+    print("\n🎨 Available Templates:")
+    print("======================")
+    for template in conn.execute("SELECT * FROM templates ORDER BY name").fetchall():
+        print(f"🎨 {template['name']}:")
+        print(f"   Name: {template['display_name']}")
+        print(f"   Description: {template['description']}\n")
+
+    print("\n📁 Book Files:")
+    print("==============")
+    for book in books:
+        if book["source_hash"] is None:
+            continue
+        if book["configured"]:
+            print(f"✅ {book['name']}.md (configured)")
+        else:
+            print(f"⚠️  {book['name']}.md (not configured)")
+
+
+def shell(conn, name):
+    """Shell assignments for build-all-formats.sh (one call instead of a jq per field)"""
+    sync(conn, only=name)
+    book = conn.execute("SELECT * FROM books WHERE name = ?", (name,)).fetchone()
+    book_config = json.loads(book["config"]) if book else {}
+    configured = bool(book and book["configured"])
+    template = book["template"] if configured else DEFAULT_TEMPLATE
+    row = conn.execute("SELECT css, html FROM templates WHERE name = ?", (template,)).fetchone()
+    if configured:
+        css_file, html_file = (row["css"], row["html"]) if row else ("", "")
+    else:
+        css_file, html_file = f"{DEFAULT_TEMPLATE}.css", f"{DEFAULT_TEMPLATE}.html"
+
+    values = {
+        "book_configured": "true" if configured else "false",
+        "template": template,
+        "css_file": css_file or "",
+        "html_file": html_file or "",
+        "title": book_config.get("title") or DEFAULT_TITLE,
+        "author": book_config.get("author") or DEFAULT_AUTHOR,
+        "book_pdf_profile": book_config.get("pdf_profile") or "screen",
+        "book_kindle_profile": book_config.get("kindle_profile") or "azw3",
+        "book_chapter_level": book_config.get("chapter_level") or "",
+        "book_variants": " ".join(book_config.get("variants", [])),
+    }
+    for key, value in values.items():
+        print(f"{key}={shlex.quote(value)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Book catalog and build status")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("sync", help="Refresh the catalog from book-config.json and books/")
+    subparsers.add_parser("overview", help="Books, templates and book files")
+
+    list_parser = subparsers.add_parser("list", help="List books, optionally filtered")
+    list_parser.add_argument("--template", help="Only books using this template")
+    list_parser.add_argument("--category", help="Only books in this category")
+    list_parser.add_argument("--stale", action="store_true", help="Only books with a stale format")
+    list_parser.add_argument(
+        "--format", action="append", choices=FORMATS, help="Formats to check (repeatable, default: all)"
+    )
+    list_parser.add_argument("--names", action="store_true", help="Print only the book names")
+
+    show_parser = subparsers.add_parser("show", help="Metadata and build status of a book")
+    show_parser.add_argument("book")
+
+    shell_parser = subparsers.add_parser("shell", help="Print a book's settings as shell assignments")
+    shell_parser.add_argument("book")
+
+    record_parser = subparsers.add_parser("record", help="Record a finished build stage")
+    record_parser.add_argument("book")
+    record_parser.add_argument("format")
+    record_parser.add_argument("names", nargs="+", help="Published files, relative to --dir")
+    record_parser.add_argument("--dir", required=True, help="The book's published directory")
+    record_parser.add_argument("--seconds", type=float, help="Stage duration")
+
+    sql_parser = subparsers.add_parser("sql", help="Run a read-only SQL query")
+    sql_parser.add_argument("query")
+
+    args = parser.parse_args()
+
+    if not os.path.exists(CONFIG_FILE):
+        print("Error: book-config.json not found")
+        sys.exit(1)
+
+    conn = connect()
+    if args.command in ("sync", "overview", "list", "show"):
+        sync(conn)
+
+    if args.command == "sync":
+        count = conn.execute("SELECT COUNT(*) FROM books").fetchone()[0]
+        print(f"✓ Catalog synced: {count} book(s)")
+    elif args.command == "overview":
+        overview(conn)
+    elif args.command == "list":
+        formats = args.format or FORMATS
+        books = query_books(conn, args.template, args.category, args.stale, formats)
+        if args.names:
+            for book in books:
+                print(book["name"])
+        else:
+            print_books(conn, books, formats)
+    elif args.command == "show":
+        show(conn, args.book)
+    elif args.command == "shell":
+        shell(conn, args.book)
+    elif args.command == "record":
+        record(conn, args.book, args.format, args.dir, args.names, args.seconds)
+    elif args.command == "sql":
+        conn.execute("PRAGMA query_only = ON")
+        try:
+            cursor = conn.execute(args.query)
+        except sqlite3.Error as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        print("\t".join(column[0] for column in cursor.description or []))
+        for row in cursor:
+            print("\t".join("" if value is None else str(value) for value in row))
+
+
+if __name__ == "__main__":
+    main()
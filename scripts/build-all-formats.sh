@@ -13,63 +13,192 @@ if ! command -v jq &> /dev/null; then
     exit 1
 fi
 
+# Probe weasyprint, mermaid-cli and calibre once (cached in .cache/tool-probes.json);
+# sets WEASYPRINT_AVAILABLE, MMDC_AVAILABLE and CALIBRE_AVAILABLE and exports the
+# results so the Python helpers skip their own probes
+eval "$(python3 scripts/tool_probe.py shell)"
+
 # Check if weasyprint is available for PDF generation
-if ! python3 -c "import weasyprint" 2>/dev/null; then
+if [ "$WEASYPRINT_AVAILABLE" != true ]; then
     echo "Warning: weasyprint is not installed. PDF generation will be skipped."
     echo "Install with: pip install weasyprint"
-    WEASYPRINT_AVAILABLE=false
-else
-    WEASYPRINT_AVAILABLE=true
 fi
 
+# Static SVG diagrams for the HTML edition (set by build.sh --static-diagrams)
+STATIC_DIAGRAMS=${STATIC_DIAGRAMS:-false}
+STATIC_DIAGRAMS_LINK=${STATIC_DIAGRAMS_LINK:-false}
+
+# Render HTML and EPUB from a cached pandoc AST (set by build.sh --ast)
+USE_PANDOC_AST=${USE_PANDOC_AST:-false}
+
+# Also write a multi-page HTML edition, one page per chapter (set by build.sh --chunked)
+CHUNKED_HTML=${CHUNKED_HTML:-false}
+
+# Content-hashed asset names plus public/asset-manifest.json (set by build.sh --fingerprint)
+FINGERPRINT_ASSETS=${FINGERPRINT_ASSETS:-false}
+
+# Inline only the first-screen CSS, load the rest non-blocking (set by build.sh --critical-css)
+CRITICAL_CSS=${CRITICAL_CSS:-false}
+
+# Minify and precompress published text artifacts (set by build.sh --compress)
+PRECOMPRESS=${PRECOMPRESS:-false}
+
+# Also build each book's PDF variants from book-config.json (set by build.sh --variants)
+BUILD_VARIANTS=${BUILD_VARIANTS:-false}
+
 # Check if calibre is available for MOBI generation
-if ! command -v ebook-convert &> /dev/null; then
-    echo "Warning: calibre is not installed. MOBI generation will be skipped."
+if [ "$CALIBRE_AVAILABLE" != true ]; then
+    echo "Warning: calibre is not installed. Kindle (AZW3/MOBI) generation will be skipped."
     echo "Install with: brew install --cask calibre"
-    CALIBRE_AVAILABLE=false
-else
-    CALIBRE_AVAILABLE=true
 fi
 
+# Output directory and formats (overridable, e.g. by build workers using scratch space)
+PUBLIC_DIR=${PUBLIC_DIR:-public}
+FORMATS=${FORMATS:-"html pdf epub mobi"}
+
+# Markdown source directory (overridable, e.g. by preview builds of a chapter slice)
+BOOKS_DIR=${BOOKS_DIR:-books}
+
+# Partial builds (build workers, previews) skip catalog-wide steps: asset gc, size report
+if [ -n "$BUILD_WORKER" ]; then
+    PARTIAL_BUILD=true
+fi
+PARTIAL_BUILD=${PARTIAL_BUILD:-false}
+
+# Heavy tools (pandoc, WeasyPrint, ebook-convert) take a slot from the host-wide
+# resource governor: per-class concurrency limits plus a memory budget. Peak memory
+# of every job is reported under this run id (see scripts/resource_governor.py)
+BUILD_RUN_ID=${BUILD_RUN_ID:-"$(date +%s)-$$"}
+export BUILD_RUN_ID
+governed() {
+    local tool_class=$1 label=$2
+    shift 2
+    python3 scripts/resource_governor.py run --class "$tool_class" --label "$label" -- "$@"
+}
+
+# Each book is built in its own scratch workspace, on tmpfs when available, and
+# only finished artifacts are published into $PUBLIC_DIR (with atomic renames)
+if [ -z "$BUILD_SCRATCH_DIR" ]; then
+    if [ -d /dev/shm ] && [ -w /dev/shm ]; then
+        BUILD_SCRATCH_DIR=/dev/shm
+    else
+        BUILD_SCRATCH_DIR=${TMPDIR:-/tmp}
+    fi
+fi
+SCRATCH_DIRS=()
+cleanup_scratch() {
+    for scratch_dir in "${SCRATCH_DIRS[@]}"; do
+        rm -rf "$scratch_dir"
+    done
+}
+trap cleanup_scratch EXIT
+
+# Full builds journal each completed stage (book + format) with its output hashes;
+# BUILD_RESUME (build.sh --resume) skips stages whose outputs are still intact
+BUILD_RESUME=${BUILD_RESUME:-false}
+if [ "$PARTIAL_BUILD" = true ]; then
+    BUILD_RESUME=false
+fi
+
+# Publish a finished stage right away and journal it, so a later failure cannot lose it;
+# the catalog (scripts/book_catalog.py) records its duration (since $SECONDS was
+# stage_started) and artifact sizes
+checkpoint() {
+    local book_name=$1 stage=$2 stage_started=$3 out_dir=$4 publish_dir=$5
+    shift 5
+    python3 scripts/atomic_publish.py "$out_dir" "$publish_dir" --only "$@" > /dev/null
+    if [ "$PARTIAL_BUILD" != true ]; then
+        python3 scripts/build_journal.py record "$book_name" "$stage" --dir "$publish_dir" "$@"
+        python3 scripts/book_catalog.py record "$book_name" "$stage" --dir "$publish_dir" \
+            --seconds $((SECONDS - stage_started)) "$@"
+    fi
+}
+
+# Kindle conversions run in the background, overlapping with the next books' stages
+KINDLE_PIDS=()
+KINDLE_LOGS=()
+wait_kindle_jobs() {
+    for i in "${!KINDLE_PIDS[@]}"; do
+        if wait "${KINDLE_PIDS[$i]}"; then
+            cat "${KINDLE_LOGS[$i]}"
+        else
+            echo "Warning: Kindle conversion failed:"
+            sed 's/^/    /' "${KINDLE_LOGS[$i]}"
+        fi
+    done
+    KINDLE_PIDS=()
+    KINDLE_LOGS=()
+}
+
+# Check whether a format is in a space-separated format list
+wants_format() {
+    [[ " $2 " == *" $1 "* ]]
+}
+
 # Function to build a single book in all formats
 build_book_all_formats() {
     local book_name=$1
     local html_only=$2
+    local publish_dir="$PUBLIC_DIR/$book_name"
+    local work_dir
+    work_dir=$(mktemp -d "$BUILD_SCRATCH_DIR/ebook-build-$book_name.XXXXXX")
+    SCRATCH_DIRS+=("$work_dir")
+    local out_dir="$work_dir/$book_name"
+    local book_source="$BOOKS_DIR/$book_name.md"
+    local formats="$FORMATS"
+    local variant_outputs=()
+    local book_started=$SECONDS
     
     if [ "$html_only" = "--html-only" ]; then
+        formats="html"
         echo "Building $book_name in HTML only (dev mode)..."
     else
-        echo "Building $book_name in all formats..."
+        echo "Building $book_name in formats: $formats..."
+    fi
+
+    if [ "$BUILD_RESUME" = true ]; then
+        formats=$(python3 scripts/build_journal.py pending "$book_name" $formats --dir "$publish_dir")
+        if [ -z "$formats" ]; then
+            echo "✓ $book_name already complete, skipping"
+            return 0
+        fi
+        echo "  Resuming $book_name with: $formats"
+    fi
+
+    # HTML is always built as the base; MOBI needs the EPUB as its input
+    local build_pdf=false build_epub=false build_mobi=false
+    wants_format pdf "$formats" && build_pdf=true
+    wants_format epub "$formats" && build_epub=true
+    if wants_format mobi "$formats"; then
+        build_mobi=true
+        build_epub=true
+    fi
+    # Resumed MOBI stage with the EPUB already published: convert that EPUB
+    local reuse_epub=false
+    if [ "$BUILD_RESUME" = true ] && [ "$build_mobi" = true ] && ! wants_format epub "$formats" \
+        && [ -f "$publish_dir/$book_name.epub" ]; then
+        build_epub=false
+        reuse_epub=true
     fi
     
-    # Get book config from JSON
-    book_config=$(jq -r ".books[\"$book_name\"]" "$CONFIG_FILE" 2>/dev/null)
+    # Book settings from the catalog (synced from book-config.json): template,
+    # css_file, html_file, title, author and the book_* options
+    eval "$(python3 scripts/book_catalog.py shell "$book_name")"
     
-    if [ "$book_config" = "null" ]; then
+    if [ "$book_configured" != true ]; then
         echo "Warning: No configuration found for $book_name, using default template"
-        template="afrinenglish"
-        css_file="afrinenglish.css"
-        html_file="afrinenglish.html"
-    else
-        template=$(echo "$book_config" | jq -r '.template')
-        css_file=$(jq -r ".templates[\"$template\"].css" "$CONFIG_FILE")
-        html_file=$(jq -r ".templates[\"$template\"].html" "$CONFIG_FILE")
     fi
     
-    # Get book metadata
-    title=$(echo "$book_config" | jq -r '.title // "Unknown Title"')
-    author=$(echo "$book_config" | jq -r '.author // "Param Harrison"')
-    
     # Use pandoc-mermaid-filter if available in venv
     FILTER=""
     if [ -n "$VIRTUAL_ENV" ] && [ -x "$VIRTUAL_ENV/bin/pandoc-mermaid-filter" ]; then
         FILTER="--filter pandoc-mermaid-filter"
     fi
     
-    # Create output directories and clean up any existing mermaid-images
-    mkdir -p "public/$book_name"
-    if [ -d "public/$book_name/mermaid-images" ]; then
-        rm -rf "public/$book_name/mermaid-images"
+    # Create the scratch output directory (fresh, so no stale mermaid-images)
+    mkdir -p "$out_dir"
+    if [ "$reuse_epub" = true ]; then
+        cp "$publish_dir/$book_name.epub" "$out_dir/$book_name.epub"
     fi
     
     # Copy cover image to book's output directory (for all formats)
@@ -81,9 +210,10 @@ build_book_all_formats() {
     fi
     
     if [ -n "$COVER_IMAGE" ]; then
-        cp "$COVER_IMAGE" "public/$book_name/cover.jpg"
-        echo "  ✓ Copied cover image to public/$book_name/cover.jpg"
-        COVER_OPTION="--epub-cover-image=public/$book_name/cover.jpg"
+        # Covers shared between books (e.g. default.jpg) are stored once and linked
+        python3 scripts/asset_store.py add "$COVER_IMAGE" --dest "$out_dir/cover.jpg" > /dev/null
+        echo "  ✓ Linked cover image to $out_dir/cover.jpg"
+        COVER_OPTION="--epub-cover-image=$out_dir/cover.jpg"
     else
         echo "  ⚠️ No cover image found for $book_name"
         COVER_OPTION=""
@@ -91,45 +221,60 @@ build_book_all_formats() {
     
     # Build HTML first (as base for other formats)
     echo "  Building HTML..."
-    pandoc "books/$book_name.md" \
-        -o "public/$book_name/$book_name.html" \
-        --template="templates/$html_file" \
-        --css="$css_file" \
-        --standalone \
-        --toc \
-        --metadata title="$title" \
-        --metadata author="$author" \
-        $FILTER
+    if [ "$USE_PANDOC_AST" = true ]; then
+        # Render from the cached AST; Mermaid and code blocks are rewritten in-process
+        governed pandoc "$book_name.html" python3 scripts/pandoc_ast.py html "$book_source" "$out_dir/$book_name.html" \
+            --template="templates/$html_file" \
+            --css="$css_file" \
+            --title "$title" \
+            --author "$author"
+    else
+        # Dispatched to the warm pandoc pool when running, else the pandoc CLI
+        governed pandoc "$book_name.html" python3 scripts/pandoc_pool.py convert "$book_source" \
+            -o "$out_dir/$book_name.html" \
+            --template="templates/$html_file" \
+            --css="$css_file" \
+            --standalone \
+            --toc \
+            --metadata title="$title" \
+            --metadata author="$author" \
+            $FILTER
+    fi
 
     # Post-process HTML
     if command -v python3 &> /dev/null; then
-        python3 scripts/fix-mermaid-blocks.py "public/$book_name/$book_name.html" 2>/dev/null || echo "Warning: Skipping mermaid fix."
-        python3 scripts/fix-prism-codeblocks.py "public/$book_name/$book_name.html" 2>/dev/null || echo "Warning: Skipping prism fix."
-        python3 scripts/fix-css-links.py "public/$book_name/$book_name.html" "$css_file" 2>/dev/null || echo "Warning: Skipping CSS fix."
-        python3 scripts/fix-mermaid-and-syntax.py "public/$book_name/$book_name.html" --format html 2>/dev/null || echo "Warning: Skipping mermaid/syntax fix."
+        python3 scripts/fix-mermaid-blocks.py "$out_dir/$book_name.html" 2>/dev/null || echo "Warning: Skipping mermaid fix."
+        python3 scripts/fix-prism-codeblocks.py "$out_dir/$book_name.html" 2>/dev/null || echo "Warning: Skipping prism fix."
+        python3 scripts/pygmentsify_codeblocks.py "$out_dir/$book_name.html" --css "templates/$css_file" 2>/dev/null || echo "Warning: Skipping Pygments highlighting."
+        python3 scripts/fix-css-links.py "$out_dir/$book_name.html" "$css_file" 2>/dev/null || echo "Warning: Skipping CSS fix."
+        python3 scripts/fix-mermaid-and-syntax.py "$out_dir/$book_name.html" --format html 2>/dev/null || echo "Warning: Skipping mermaid/syntax fix."
         
         # Add cover image to HTML (only if cover was copied)
         if [ -n "$COVER_IMAGE" ]; then
             echo "    Adding cover image to HTML..."
-            python3 scripts/add-cover-to-html.py "public/$book_name/$book_name.html" "$book_name" 2>/dev/null || echo "Warning: Skipping cover image addition."
+            python3 scripts/add-cover-to-html.py "$out_dir/$book_name.html" "$book_name" 2>/dev/null || echo "Warning: Skipping cover image addition."
         fi
         
         # Render mermaid images only for production builds (not for HTML-only dev mode)
-        if [ "$html_only" != "--html-only" ]; then
-            python3 scripts/render-mermaid-for-pdf.py "public/$book_name/$book_name.html" 2>/dev/null || echo "Warning: Skipping mermaid rendering for EPUB."
+        # With static diagrams the HTML keeps its sources until SVG prerendering below
+        if { [ "$build_pdf" = true ] || [ "$build_epub" = true ]; } && [ "$STATIC_DIAGRAMS" != true ]; then
+            python3 scripts/render-mermaid-for-pdf.py "$out_dir/$book_name.html" 2>/dev/null || echo "Warning: Skipping mermaid rendering for EPUB."
         fi
 
         # Add dynamic TOC for HTML only (not for PDF/EPUB/MOBI)
-        python3 scripts/generate-toc.py "books/$book_name.md" "public/$book_name/$book_name.html" --title "Table of Contents" --after-cover || echo "Warning: Skipping TOC generation."
+        python3 scripts/generate-toc.py "$book_source" "$out_dir/$book_name.html" --title "Table of Contents" --after-cover || echo "Warning: Skipping TOC generation."
     fi
+    local html_seconds=$((SECONDS - book_started))
 
     # Build PDF using WeasyPrint (first, so we can use its processed HTML for EPUB)
-    if [ "$html_only" != "--html-only" ] && [ "$WEASYPRINT_AVAILABLE" = true ]; then
-        echo "  Building PDF..."
+    local pdf_started=$SECONDS
+    # The PDF-processed HTML is also prepared when only the EPUB is requested
+    if { [ "$build_pdf" = true ] || [ "$build_epub" = true ]; } && [ "$WEASYPRINT_AVAILABLE" = true ]; then
+        echo "  Preparing PDF-processed HTML..."
         
         # Create a clean copy of HTML for PDF processing (without cover image)
-        pdf_html_path="public/$book_name/$book_name-pdf.html"
-        cp "public/$book_name/$book_name.html" "$pdf_html_path"
+        pdf_html_path="$out_dir/$book_name-pdf.html"
+        cp "$out_dir/$book_name.html" "$pdf_html_path"
         
         # Remove cover image from PDF HTML if it exists
         if [ -n "$COVER_IMAGE" ]; then
@@ -137,40 +282,111 @@ build_book_all_formats() {
             python3 scripts/remove-cover-from-pdf.py "$pdf_html_path" 2>/dev/null || echo "Warning: Could not remove cover image from PDF HTML."
         fi
         
-        # Process HTML specifically for PDF (highlight code, render mermaid, fix code blocks)
+        # Process HTML specifically for PDF (render mermaid, fix code blocks)
+        # Code is already highlighted at build time in the HTML stage
         if command -v python3 &> /dev/null; then
-            echo "    Highlighting code blocks for PDF (Pygments)..."
-            python3 scripts/pygmentsify_codeblocks.py "$pdf_html_path" 2>/dev/null || echo "Warning: Skipping Pygments highlighting."
             echo "    Processing HTML for PDF..."
             python3 scripts/render-mermaid-for-pdf.py "$pdf_html_path" 2>/dev/null || echo "Warning: Skipping mermaid rendering for PDF."
             python3 scripts/fix-pdf-code-blocks.py "$pdf_html_path" 2>/dev/null || echo "Warning: Skipping PDF code block fixes."
+            # WeasyPrint renders the light scheme: one Pygments style, readable on its <pre> background
+            python3 scripts/pygmentsify_codeblocks.py "$pdf_html_path" --css "templates/$css_file" --theme light > /dev/null 2>&1 || echo "Warning: Skipping PDF Pygments style."
             echo "    Adjusting font sizes for elegant PDF output..."
             python3 scripts/fix-pdf-fonts.py "$pdf_html_path" 2>/dev/null || echo "Warning: Skipping PDF font adjustments."
         fi
         
         # Preprocess CSS for PDF
-        pdf_css_path="public/$book_name/$book_name-pdf.css"
+        pdf_css_path="$out_dir/$book_name-pdf.css"
         python3 scripts/preprocess-css.py "templates/$css_file" "$pdf_css_path" "pdf"
         
         # Build PDF using the processed HTML
-        python3 scripts/build-pdf.py "$pdf_html_path" "public/$book_name/$book_name.pdf" "$pdf_css_path"
+        if [ "$build_pdf" = true ]; then
+            echo "  Building PDF..."
+            # PDF_PROFILE (build.sh --pdf-profile) overrides the book's pdf_profile
+            pdf_profile=${PDF_PROFILE:-$book_pdf_profile}
+            governed pdf "$book_name.pdf" python3 scripts/build-pdf.py "$pdf_html_path" "$out_dir/$book_name.pdf" "$pdf_css_path" --profile "$pdf_profile"
+
+            # Variants reuse everything above (pandoc, diagrams, highlighting, HTML
+            # processing); only the stylesheet and the PDF layout are redone, in parallel
+            if [ "$BUILD_VARIANTS" = true ]; then
+                local variant_pids=()
+                for variant in $book_variants; do
+                    variant_config=$(jq -c --arg v "$variant" '.variants[$v] // empty' "$CONFIG_FILE")
+                    if [ -z "$variant_config" ]; then
+                        echo "    Warning: Unknown variant '$variant' for $book_name, skipping"
+                        continue
+                    fi
+                    echo "  Building PDF variant: $variant..."
+                    VARIANT_CSS_ARGS=(--page-size "$(echo "$variant_config" | jq -r '.page_size // "A4"')")
+                    variant_margin=$(echo "$variant_config" | jq -r '.margin // empty')
+                    variant_theme=$(echo "$variant_config" | jq -r '.theme // empty')
+                    [ -n "$variant_margin" ] && VARIANT_CSS_ARGS+=(--margin "$variant_margin")
+                    VARIANT_PDF_ARGS=()
+                    if [ -n "$variant_theme" ]; then
+                        VARIANT_CSS_ARGS+=(--theme "$variant_theme")
+                        # The theme must override the light template styles embedded in the HTML
+                        VARIANT_PDF_ARGS+=(--author-css)
+                    fi
+                    variant_profile=$(echo "$variant_config" | jq -r --arg p "$pdf_profile" '.pdf_profile // $p')
+
+                    variant_css_path="$out_dir/$book_name-$variant-pdf.css"
+                    python3 scripts/preprocess-css.py "templates/$css_file" "$variant_css_path" "pdf" "${VARIANT_CSS_ARGS[@]}" > /dev/null
+                    if [ -n "$variant_theme" ]; then
+                        # Overrides the light-scheme Pygments style embedded in the PDF HTML
+                        python3 scripts/pygmentsify_codeblocks.py --stylesheet --css "templates/$css_file" --theme "$variant_theme" >> "$variant_css_path" 2>/dev/null || true
+                    fi
+                    governed pdf "$book_name-$variant.pdf" python3 scripts/build-pdf.py "$pdf_html_path" "$out_dir/$book_name-$variant.pdf" "$variant_css_path" \
+                        --profile "$variant_profile" "${VARIANT_PDF_ARGS[@]}" > "$out_dir/$book_name-$variant.log" 2>&1 &
+                    variant_pids+=($!)
+                    variant_outputs+=("$book_name-$variant.pdf")
+                done
+                for i in "${!variant_pids[@]}"; do
+                    if wait "${variant_pids[$i]}"; then
+                        echo "    ✓ Built ${variant_outputs[$i]}"
+                    else
+                        echo "    Warning: PDF variant ${variant_outputs[$i]} failed:"
+                        sed 's/^/      /' "$out_dir/${variant_outputs[$i]%.pdf}.log"
+                    fi
+                done
+            fi
+            checkpoint "$book_name" pdf "$pdf_started" "$out_dir" "$publish_dir" "$book_name.pdf" "${variant_outputs[@]}"
+        fi
+    fi
+
+    # Build EPUB straight from the cached AST (no HTML round-trip through pandoc)
+    local epub_started=$SECONDS
+    if [ "$build_epub" = true ] && [ "$USE_PANDOC_AST" = true ]; then
+        echo "  Building EPUB from cached pandoc AST..."
+        epub_css_path="$out_dir/$book_name-epub.css"
+        python3 scripts/preprocess-css.py "templates/$css_file" "$epub_css_path" "epub"
+        COVER_ARG=""
+        if [ -n "$COVER_IMAGE" ]; then
+            COVER_ARG="--cover=$out_dir/cover.jpg"
+        fi
+        governed pandoc "$book_name.epub" python3 scripts/pandoc_ast.py epub "$book_source" "$out_dir/$book_name.epub" \
+            --css="$epub_css_path" \
+            --title "$title" \
+            --author "$author" \
+            $COVER_ARG
     fi
 
     # Build EPUB using PDF-processed HTML (better code highlighting and mermaid rendering)
-    if [ "$html_only" != "--html-only" ]; then
+    if [ "$build_epub" = true ] && [ "$USE_PANDOC_AST" != true ]; then
         echo "  Building EPUB..."
         
         # Use PDF-processed HTML for EPUB if available, otherwise use regular HTML
-        if [ "$WEASYPRINT_AVAILABLE" = true ] && [ -f "public/$book_name/$book_name-pdf.html" ]; then
+        if [ "$WEASYPRINT_AVAILABLE" = true ] && [ -f "$out_dir/$book_name-pdf.html" ]; then
             echo "    Using PDF-processed HTML for EPUB (better code highlighting and font adjustments)..."
-            epub_html_path="public/$book_name/$book_name-epub.html"
-            cp "public/$book_name/$book_name-pdf.html" "$epub_html_path"
+            epub_html_path="$out_dir/$book_name-epub.html"
+            cp "$out_dir/$book_name-pdf.html" "$epub_html_path"
         else
             echo "    Using regular HTML for EPUB..."
-            epub_html_path="public/$book_name/$book_name-epub.html"
-            cp "public/$book_name/$book_name.html" "$epub_html_path"
+            epub_html_path="$out_dir/$book_name-epub.html"
+            cp "$out_dir/$book_name.html" "$epub_html_path"
         fi
         
+        # Render any diagrams still left as Mermaid source (e.g. static diagram mode without PDF)
+        python3 scripts/render-mermaid-for-pdf.py "$epub_html_path" 2>/dev/null || echo "Warning: Skipping mermaid rendering for EPUB."
+
         # Remove TOC from EPUB HTML (EPUB has its own native TOC)
         echo "    Removing TOC from EPUB..."
         python3 scripts/remove-toc-from-epub.py "$epub_html_path" 2>/dev/null || echo "Warning: Could not remove TOC from EPUB HTML."
@@ -182,28 +398,112 @@ build_book_all_formats() {
         fi
         
         # Build EPUB using the processed HTML
-        pandoc "$epub_html_path" \
-            -o "public/$book_name/$book_name.epub" \
+        governed pandoc "$book_name.epub" python3 scripts/pandoc_pool.py convert "$epub_html_path" \
+            -o "$out_dir/$book_name.epub" \
             --toc \
             --standalone \
             --metadata title="$title" \
             --metadata author="$author" \
             $COVER_OPTION
+    fi
+
+    # Reproducible builds: sorted zip entries, fixed timestamps and a stable identifier
+    if [ "$build_epub" = true ] && [ -n "$SOURCE_DATE_EPOCH" ] && [ -f "$out_dir/$book_name.epub" ]; then
+        python3 scripts/reproducible.py epub "$out_dir/$book_name.epub" --book "$book_name" || echo "Warning: Could not normalize EPUB."
+    fi
+    if [ "$build_epub" = true ]; then
+        checkpoint "$book_name" epub "$epub_started" "$out_dir" "$publish_dir" "$book_name.epub"
+    fi
+
+    if [ "$build_mobi" = true ] && [ -f "$out_dir/$book_name.epub" ]; then
         if [ "$CALIBRE_AVAILABLE" = true ]; then
-            echo "  Building MOBI from EPUB..."
-            ebook-convert "public/$book_name/$book_name.epub" "public/$book_name/$book_name.mobi" \
-                --title "$title" \
-                --authors "$author" \
-                --mobi-file-type both \
-                --pretty-print
-            echo "    ✓ MOBI built successfully"
+            # KINDLE_PROFILE (build.sh --kindle-profile) overrides the book's kindle_profile:
+            # azw3 (KF8 only, default) and/or mobi (legacy, much slower to convert)
+            kindle_profiles=${KINDLE_PROFILE:-$book_kindle_profile}
+            KINDLE_ARGS=(--book "$book_name" --title "$title" --author "$author")
+            for kindle_profile in ${kindle_profiles//,/ }; do
+                KINDLE_ARGS+=(--profile "$kindle_profile")
+            done
+            if [ -n "$SOURCE_DATE_EPOCH" ]; then
+                source_date=$(date -u -d "@$SOURCE_DATE_EPOCH" +%Y-%m-%dT%H:%M:%SZ 2>/dev/null || date -u -r "$SOURCE_DATE_EPOCH" +%Y-%m-%dT%H:%M:%SZ)
+                KINDLE_ARGS+=(--date "$source_date")
+            fi
+
+            # Convert a copy of the EPUB in its own scratch dir; this book's workspace
+            # is removed before the conversion finishes
+            kindle_dir=$(mktemp -d "$BUILD_SCRATCH_DIR/ebook-kindle-$book_name.XXXXXX")
+            SCRATCH_DIRS+=("$kindle_dir" "$kindle_dir.log")
+            cp "$out_dir/$book_name.epub" "$kindle_dir/"
+            echo "  Building Kindle edition ($kindle_profiles) in the background..."
+            local kindle_started=$SECONDS
+            (
+                python3 scripts/build-kindle.py "$kindle_dir/$book_name.epub" "$kindle_dir/out" "${KINDLE_ARGS[@]}"
+                kindle_files=()
+                for kindle_file in "$kindle_dir"/out/*; do
+                    kindle_files+=("$(basename "$kindle_file")")
+                done
+                checkpoint "$book_name" mobi "$kindle_started" "$kindle_dir/out" "$publish_dir" "${kindle_files[@]}"
+                rm -rf "$kindle_dir"
+            ) > "$kindle_dir.log" 2>&1 &
+            KINDLE_PIDS+=($!)
+            KINDLE_LOGS+=("$kindle_dir.log")
         fi
     fi
     
-    echo "✓ Built $book_name in all formats"
+    # Prerender diagrams as static SVG for the HTML edition (after PDF/EPUB copied it)
+    local html_finish_started=$SECONDS
+    if [ "$STATIC_DIAGRAMS" = true ]; then
+        echo "  Prerendering Mermaid diagrams as SVG for HTML..."
+        if [ "$STATIC_DIAGRAMS_LINK" = true ]; then
+            python3 scripts/render-mermaid-for-html.py "$out_dir/$book_name.html" --link || echo "Warning: Skipping static SVG diagrams."
+        else
+            python3 scripts/render-mermaid-for-html.py "$out_dir/$book_name.html" || echo "Warning: Skipping static SVG diagrams."
+        fi
+    fi
+
+    # Prebuilt full-text search index and widget for the HTML edition (added
+    # only now, so the PDF and EPUB copies made above carry no search markup)
+    python3 scripts/build-search-index.py "$out_dir/$book_name.html" || echo "Warning: Skipping search index."
+
+    # Multi-page edition in $out_dir/chapters/ (after the search index so it links to it)
+    if [ "$CHUNKED_HTML" = true ]; then
+        echo "  Splitting HTML into chapter pages..."
+        LEVEL_ARG=""
+        if [ -n "$book_chapter_level" ]; then
+            LEVEL_ARG="--level=$book_chapter_level"
+        fi
+        python3 scripts/split-html-chapters.py "$out_dir/$book_name.html" $LEVEL_ARG || echo "Warning: Skipping chapter pages."
+    fi
+
+    # Critical CSS for the single-page edition (after splitting, so chapter pages
+    # keep the full shared book.css); the full stylesheet is public/$css_file
+    if [ "$CRITICAL_CSS" = true ]; then
+        python3 scripts/critical-css.py "$out_dir/$book_name.html" "templates/$css_file" --href "../$css_file" || echo "Warning: Skipping critical CSS."
+    fi
+
+    # Publish finished artifacts; intermediates (-pdf.html, -epub.html, CSS) stay in scratch
+    python3 scripts/atomic_publish.py "$out_dir" "$publish_dir" --replace-dirs --only \
+        "$book_name.html" "$book_name.pdf" "$book_name.epub" "$book_name.mobi" "$book_name.azw3" \
+        "$book_name.search.js" cover.jpg mermaid-images chapters "${variant_outputs[@]}"
+    # Scratch on another filesystem means copies; link them back into the asset store
+    if [ -n "$COVER_IMAGE" ]; then
+        python3 scripts/asset_store.py add "$COVER_IMAGE" --dest "$publish_dir/cover.jpg" > /dev/null
+    fi
+    if [ -d "$publish_dir/mermaid-images" ]; then
+        python3 scripts/asset_store.py dedupe "$publish_dir/mermaid-images" > /dev/null
+    fi
+    if [ "$PARTIAL_BUILD" != true ]; then
+        python3 scripts/build_journal.py record "$book_name" html --dir "$publish_dir" \
+            "$book_name.html" "$book_name.search.js"
+        python3 scripts/book_catalog.py record "$book_name" html --dir "$publish_dir" \
+            --seconds $((html_seconds + SECONDS - html_finish_started)) "$book_name.html" "$book_name.search.js"
+    fi
+    rm -rf "$work_dir"
+
+    echo "✓ Built $book_name ($formats)"
 }
 
-mkdir -p public
+mkdir -p "$PUBLIC_DIR"
 
 # Read book configuration
 CONFIG_FILE="books/book-config.json"
@@ -213,11 +513,20 @@ if [ ! -f "$CONFIG_FILE" ]; then
     exit 1
 fi
 
+# Start the stage journal (kept as is when resuming an interrupted build)
+if [ "$PARTIAL_BUILD" != true ]; then
+    if [ "$BUILD_RESUME" = true ]; then
+        python3 scripts/build_journal.py begin --resume
+    else
+        python3 scripts/build_journal.py begin
+    fi
+fi
+
 # Build all books or specific book
 if [ $# -eq 0 ]; then
     # Build all books
     echo "Building all books in all formats..."
-    for book_file in books/*.md; do
+    for book_file in "$BOOKS_DIR"/*.md; do
         if [ -f "$book_file" ]; then
             book_name=$(basename "$book_file" .md)
             build_book_all_formats "$book_name" ""
@@ -226,7 +535,7 @@ if [ $# -eq 0 ]; then
 elif [ "$1" = "--html-only" ]; then
     # Build all books in HTML only
     echo "Building all books in HTML only (dev mode)..."
-    for book_file in books/*.md; do
+    for book_file in "$BOOKS_DIR"/*.md; do
         if [ -f "$book_file" ]; then
             book_name=$(basename "$book_file" .md)
             build_book_all_formats "$book_name" "--html-only"
@@ -237,7 +546,7 @@ else
     book_name=$1
     html_only=$2
     
-    if [ -f "books/$book_name.md" ]; then
+    if [ -f "$BOOKS_DIR/$book_name.md" ]; then
         build_book_all_formats "$book_name" "$html_only"
     else
         echo "Error: Book $book_name.md not found"
@@ -245,23 +554,49 @@ else
     fi
 fi
 
-# Copy all CSS files to public/
-cp templates/*.css public/
-
-# Clean up temporary PDF HTML files to reduce git folder size
-echo "Cleaning up temporary files..."
-for book_dir in public/*/; do
-    if [ -d "$book_dir" ]; then
-        # Remove temporary PDF HTML files
-        find "$book_dir" -name "*-pdf.html" -delete 2>/dev/null || true
-        # Remove PDF CSS files (they're regenerated each time)
-        find "$book_dir" -name "*-pdf.css" -delete 2>/dev/null || true
-        # Remove any temporary EPUB HTML files
-        find "$book_dir" -name "*-epub.html" -delete 2>/dev/null || true
-        # Remove any temporary MOBI HTML files
-        find "$book_dir" -name "*-mobi*.html" -delete 2>/dev/null || true
+# Finish the background Kindle conversions before the catalog-wide steps
+wait_kindle_jobs
+
+# Link all CSS files into the output directory through the shared asset store
+python3 scripts/asset_store.py add templates/*.css --dest "$PUBLIC_DIR/" > /dev/null
+
+# Drop store entries that no book references any more (catalog-wide, so not in partial builds)
+if [ "$PARTIAL_BUILD" != true ]; then
+    python3 scripts/asset_store.py gc
+fi
+
+# Link assets under content-hashed names and point the HTML at them (before compressing,
+# so the hashed files get sidecars too)
+if [ "$FINGERPRINT_ASSETS" = true ] && [ "$PARTIAL_BUILD" != true ]; then
+    if [ -n "$1" ] && [ "$1" != "--html-only" ]; then
+        python3 scripts/fingerprint-assets.py "$PUBLIC_DIR" --book "$1"
+    else
+        python3 scripts/fingerprint-assets.py "$PUBLIC_DIR"
+    fi
+fi
+
+# Minify HTML/CSS and write .gz/.br sidecars for the static file server
+if [ "$PRECOMPRESS" = true ] && [ "$PARTIAL_BUILD" != true ]; then
+    if [ -n "$1" ] && [ "$1" != "--html-only" ]; then
+        python3 scripts/publish-compress.py "$PUBLIC_DIR/$1" "$PUBLIC_DIR"/*.css
+    else
+        python3 scripts/publish-compress.py "$PUBLIC_DIR"
     fi
-done
+fi
+
+# Report artifact sizes against the previous build and enforce size budgets
+if [ "$PARTIAL_BUILD" = true ]; then
+    echo "Skipping size report in partial build (run scripts/size-report.py after the full build)"
+elif [ -n "$1" ] && [ "$1" != "--html-only" ]; then
+    python3 scripts/size-report.py --public "$PUBLIC_DIR" --book "$1"
+else
+    python3 scripts/size-report.py --public "$PUBLIC_DIR"
+fi
+
+# Peak memory per heavy job (partial builds are reported by their coordinator)
+if [ "$PARTIAL_BUILD" != true ]; then
+    python3 scripts/resource_governor.py report --run "$BUILD_RUN_ID"
+fi
 
 echo "Build complete! Check the public/ directory for output files."
 echo ""
@@ -272,5 +607,5 @@ if [ "$WEASYPRINT_AVAILABLE" = true ]; then
 fi
 echo "- EPUB: public/<book-name>/<book-name>.epub"
 if [ "$CALIBRE_AVAILABLE" = true ]; then
-    echo "- MOBI: public/<book-name>/<book-name>.mobi"
+    echo "- Kindle: public/<book-name>/<book-name>.azw3 (or .mobi with --kindle-profile mobi)"
 fi 
\ No newline at end of file
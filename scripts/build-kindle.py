@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Kindle conversion stage (EPUB -> AZW3 / MOBI) with output profiles
+  azw3  KF8 only, read by every current Kindle and Kindle app (default)
+  mobi  legacy MOBI holding both the old MOBI 6 and the KF8 book, for old devices
+Conversions are cached by EPUB content plus profile and options, so an
+unchanged EPUB is never converted twice (the per-build identifier and date
+pandoc writes are ignored), and ebook-convert runs in a calibre slot of the
+resource governor
+"""
+
+import sys
+import os
+import argparse
+
+import build_cache
+import reproducible
+import resource_governor
+import tool_probe
+
+PROFILES = {
+    "azw3": ("azw3", []),
+    "mobi": ("mobi", ["--mobi-file-type", "both"]),
+}
+# Bump to invalidate cached conversions after changing the conversion options
+CACHE_VERSION = "2"
+
+
+def check_calibre():
+    return tool_probe.available("ebook-convert")
+
+
+def convert(epub_path, output_dir, book, profile, metadata_args):
+    """Convert one EPUB for a profile; return (output path, cached) or (None, False)"""
+    ext, profile_args = PROFILES[profile]
+    output_path = os.path.join(output_dir, f"{book}.{ext}")
+    options = profile_args + metadata_args
+    key = build_cache.content_hash(
+        "kindle", CACHE_VERSION, profile, reproducible.epub_digest(epub_path), *options
+    )
+
+    cached = build_cache.get_bytes("kindle", key, f".{ext}")
+    if cached is not None:
+        with open(output_path, "wb") as f:
+            f.write(cached)
+        return output_path, True
+
+    if not check_calibre():
+        print("Warning: calibre (ebook-convert) not found, skipping Kindle conversion")
+        return None, False
+
+    returncode, _peak, _duration = resource_governor.run(
+        "calibre",
+        f"{book}.{ext}",
+        ["ebook-convert", epub_path, output_path] + options,
+    )
+    if returncode != 0 or not os.path.exists(output_path):
+        print(f"Error: ebook-convert failed for {book}.{ext} (exit {returncode})")
+        return None, False
+
+    with open(output_path, "rb") as f:
+        build_cache.put_bytes("kindle", key, f.read(), f".{ext}")
+    return output_path, False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert an EPUB for Kindle devices")
+    parser.add_argument("epub", help="EPUB to convert")
+    parser.add_argument("output_dir", help="Directory for the Kindle files")
+    parser.add_argument("--book", required=True, help="Book name (output file stem)")
+    parser.add_argument(
+        "--profile",
+        action="append",
+        choices=sorted(PROFILES),
+        help="Output profile, repeatable (default: azw3)",
+    )
+    parser.add_argument("--title", help="Book title")
+    parser.add_argument("--author", help="Book author")
+    parser.add_argument("--date", help="Timestamp and publication date (ISO 8601)")
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.epub):
+        print(f"Error: EPUB not found: {args.epub}")
+        sys.exit(1)
+
+    metadata_args = []
+    if args.title:
+        metadata_args += ["--title", args.title]
+    if args.author:
+        metadata_args += ["--authors", args.author]
+    if args.date:
+        metadata_args += ["--timestamp", args.date, "--pubdate", args.date]
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    failed = False
+    for profile in args.profile or ["azw3"]:
+        output_path, cached = convert(
+            args.epub, args.output_dir, args.book, profile, metadata_args
+        )
+        if output_path is None:
+            failed = True
+        else:
+            note = " (cached)" if cached else ""
+            print(f"    ✓ Built {os.path.basename(output_path)}{note}")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,16 +6,35 @@ Converts HTML files to PDF while preserving CSS styles
 
 import sys
 import os
+import re
+import hashlib
 from pathlib import Path
 from urllib.parse import urljoin, urlparse
 import argparse
 
-try:
-    from weasyprint import HTML, CSS
-    from weasyprint.text.fonts import FontConfiguration
-except ImportError:
-    print("Error: WeasyPrint is not installed. Install it with: pip install weasyprint")
-    sys.exit(1)
+import reproducible
+
+# Imported by load_weasyprint() once the arguments are checked: importing
+# WeasyPrint (and pango through it) is the slowest part of this script's startup
+weasyprint = None
+
+# Output profiles: image resolution cap (downsampling), JPEG quality and whether
+# images are recompressed. Fonts are always subset and streams compressed
+PDF_PROFILES = {
+    "screen": {"dpi": 150, "jpeg_quality": 75, "optimize_images": True},
+    "ebook": {"dpi": 200, "jpeg_quality": 85, "optimize_images": True},
+    "print": {"dpi": 300, "jpeg_quality": 95, "optimize_images": False},
+}
+DEFAULT_PROFILE = "screen"
+
+
+def load_weasyprint():
+    global weasyprint
+    try:
+        import weasyprint
+    except ImportError:
+        print("Error: WeasyPrint is not installed. Install it with: pip install weasyprint")
+        sys.exit(1)
 
 
 def fix_html_for_pdf(html_file_path, css_file_path):
@@ -63,32 +82,112 @@ def fix_html_for_pdf(html_file_path, css_file_path):
     )
 
 
-def generate_pdf(html_file_path, output_pdf_path, css_file_path=None):
+def pin_pdf_metadata(html_content, epoch):
+    """
+    Replace any creation/modification dates with SOURCE_DATE_EPOCH so WeasyPrint
+    writes the same PDF metadata on every build
+    """
+    timestamp = reproducible.iso_timestamp(epoch)
+    html_content = re.sub(
+        r'<meta\s+name="dcterms\.(created|modified)"[^>]*>', "", html_content, flags=re.I
+    )
+    metas = (
+        f'<meta name="dcterms.created" content="{timestamp}">'
+        f'<meta name="dcterms.modified" content="{timestamp}">'
+    )
+    return re.sub(r"(<head[^>]*>)", rf"\g<1>{metas}", html_content, count=1, flags=re.I)
+
+
+def reproducible_options(html_content, css_content):
+    """WeasyPrint options for a stable PDF /ID derived from the rendered input"""
+    identifier = hashlib.md5(
+        html_content.encode("utf-8") + (css_content or "").encode("utf-8")
+    ).hexdigest().encode("ascii")
+    if "pdf_identifier" in getattr(weasyprint, "DEFAULT_OPTIONS", {}):
+        return {"pdf_identifier": identifier}
+    return {"identifier": identifier}
+
+
+def profile_options(profile_name):
+    """
+    Translate a PDF profile into write_pdf options for the installed WeasyPrint
+    """
+    profile = PDF_PROFILES[profile_name]
+    defaults = getattr(weasyprint, "DEFAULT_OPTIONS", None)
+
+    if defaults is None:
+        # WeasyPrint < 59: only the optimize_size switch and a shared image cache
+        optimize = ("fonts", "images") if profile["optimize_images"] else ("fonts",)
+        return {"optimize_size": optimize, "image_cache": {}}
+
+    options = {
+        "dpi": profile["dpi"],
+        "jpeg_quality": profile["jpeg_quality"],
+        "optimize_images": profile["optimize_images"],
+        "full_fonts": False,
+        "uncompressed_pdf": False,
+        # One cache for the whole document, so identical images are embedded once
+        "cache": {},
+    }
+    return {key: value for key, value in options.items() if key in defaults}
+
+
+def embed_author_css(html_content, css_content):
+    """
+    Add CSS as the last <style> of the head: author origin, after the template
+    styles, so it overrides them (a user stylesheet loses to the template's
+    light colours, and WeasyPrint ignores prefers-color-scheme)
+    """
+    style = f'<style id="variant-css">\n{css_content}\n</style>\n'
+    head_end = re.search(r"</head\s*>", html_content, flags=re.I)
+    if head_end is None:
+        return style + html_content
+    return html_content[: head_end.start()] + style + html_content[head_end.start():]
+
+
+def generate_pdf(
+    html_file_path, output_pdf_path, css_file_path=None, profile=DEFAULT_PROFILE, author_css=False
+):
     """
     Generate PDF from HTML file using WeasyPrint
     """
     try:
         # Fix HTML for PDF generation
         html_content, css_content = fix_html_for_pdf(html_file_path, css_file_path)
+        if author_css and css_content:
+            html_content = embed_author_css(html_content, css_content)
+            css_content = None
+            print("✓ Embedded CSS as an author stylesheet")
+
+        options = profile_options(profile)
+        print(f"✓ Using PDF profile: {profile}")
+
+        # Reproducible builds: fixed dates and a content-derived file identifier
+        epoch = reproducible.source_date_epoch()
+        if epoch is not None:
+            html_content = pin_pdf_metadata(html_content, epoch)
+            options.update(reproducible_options(html_content, css_content))
+            print(f"✓ Pinned PDF metadata to SOURCE_DATE_EPOCH={epoch}")
 
         # Create font configuration
+        from weasyprint.text.fonts import FontConfiguration
         font_config = FontConfiguration()
 
         # Create HTML object
-        html_obj = HTML(string=html_content)
+        html_obj = weasyprint.HTML(string=html_content)
 
         # Create CSS object if CSS content is available
         css_obj = None
         if css_content:
-            css_obj = CSS(string=css_content, font_config=font_config)
+            css_obj = weasyprint.CSS(string=css_content, font_config=font_config)
 
         # Generate PDF
         if css_obj:
             html_obj.write_pdf(
-                output_pdf_path, stylesheets=[css_obj], font_config=font_config
+                output_pdf_path, stylesheets=[css_obj], font_config=font_config, **options
             )
         else:
-            html_obj.write_pdf(output_pdf_path, font_config=font_config)
+            html_obj.write_pdf(output_pdf_path, font_config=font_config, **options)
 
         print(f"✓ PDF generated successfully: {output_pdf_path}")
         return True
@@ -105,21 +204,40 @@ def main():
     parser.add_argument("html_file", help="Input HTML file path")
     parser.add_argument("output_pdf", help="Output PDF file path")
     parser.add_argument("css_file", nargs="?", help="CSS file path (optional)")
+    parser.add_argument(
+        "--profile",
+        choices=sorted(PDF_PROFILES),
+        default=os.environ.get("PDF_PROFILE") or DEFAULT_PROFILE,
+        help="Output profile: screen (smallest), ebook or print (default: screen)",
+    )
+    parser.add_argument(
+        "--author-css",
+        action="store_true",
+        help="Embed the CSS after the page's own styles so it overrides them (theme variants)",
+    )
 
     args = parser.parse_args()
 
+    if args.profile not in PDF_PROFILES:
+        print(f"Error: Unknown PDF profile: {args.profile} (choose from {', '.join(sorted(PDF_PROFILES))})")
+        sys.exit(1)
+
     # Check if input file exists
     if not os.path.exists(args.html_file):
         print(f"Error: HTML file not found: {args.html_file}")
         sys.exit(1)
 
+    load_weasyprint()
+
     # Create output directory if it doesn't exist
     output_dir = os.path.dirname(args.output_pdf)
     if output_dir and not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
     # Generate PDF
-    success = generate_pdf(args.html_file, args.output_pdf, args.css_file)
+    success = generate_pdf(
+        args.html_file, args.output_pdf, args.css_file, args.profile, args.author_css
+    )
 
     if not success:
         sys.exit(1)
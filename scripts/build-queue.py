@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+Shared-directory build queue for multi-machine builds
+Book-format jobs live as files under .build-queue/ (or BUILD_QUEUE_DIR on a
+shared filesystem). Workers claim jobs with an atomic rename, build them in a
+scratch directory and publish the results into public/ atomically; the
+coordinator commands show progress and requeue jobs held by dead workers
+"""
+
+import sys
+import os
+import json
+import time
+import uuid
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+
+import atomic_publish
+import resource_governor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+QUEUE_DIR = os.environ.get("BUILD_QUEUE_DIR") or os.path.join(REPO_ROOT, ".build-queue")
+PUBLIC_DIR = os.path.join(REPO_ROOT, "public")
+STATES = ["pending", "claimed", "done", "failed"]
+FORMATS = ["html", "pdf", "epub", "mobi"]
+HEARTBEAT_INTERVAL = 10
+STALE_AFTER = 120
+MAX_ATTEMPTS = 3
+
+
+def state_dir(state):
+    return os.path.join(QUEUE_DIR, state)
+
+
+def ensure_queue():
+    for state in STATES + ["logs"]:
+        os.makedirs(state_dir(state), exist_ok=True)
+
+
+def job_name(book, fmt):
+    return f"{book}__{fmt}.json"
+
+
+def read_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_json_atomic(path, data):
+    """Write JSON to a temp file in the same directory and rename it into place"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def parse_claimed(name):
+    """Split a claimed file name into (worker_id, job file name)"""
+    worker_id, _, job = name.partition("__")
+    return worker_id, job
+
+
+def enqueue(books, formats):
+    """Add book-format jobs that are not already queued or running"""
+    ensure_queue()
+    queued = set(os.listdir(state_dir("pending")))
+    queued.update(parse_claimed(name)[1] for name in os.listdir(state_dir("claimed")))
+
+    added = 0
+    for book in books:
+        for fmt in formats:
+            name = job_name(book, fmt)
+            if name in queued:
+                continue
+            job = {"book": book, "format": fmt, "attempts": 0, "queued_at": time.time()}
+            write_json_atomic(os.path.join(state_dir("pending"), name), job)
+            added += 1
+    print(f"✓ Queued {added} job(s) in {QUEUE_DIR}")
+    return added
+
+
+def claim(worker_id):
+    """Atomically claim the next pending job; returns its claimed path or None"""
+    for name in sorted(os.listdir(state_dir("pending"))):
+        if name.startswith(".tmp-"):
+            continue
+        claimed_path = os.path.join(state_dir("claimed"), f"{worker_id}__{name}")
+        try:
+            # rename is atomic on a shared filesystem: exactly one worker wins
+            os.rename(os.path.join(state_dir("pending"), name), claimed_path)
+        except FileNotFoundError:
+            continue
+        try:
+            os.utime(claimed_path)
+            # finish() only moves the file while this claim is still on it
+            job = read_json(claimed_path)
+        except FileNotFoundError:
+            continue  # requeued as stale before the heartbeat started
+        job["claim"] = {"worker": worker_id, "pid": os.getpid(), "token": uuid.uuid4().hex}
+        write_json_atomic(claimed_path, job)
+        return claimed_path
+    return None
+
+
+def owns_claim(job, claim):
+    """Whether a job file still carries this worker's claim (pid and token)"""
+    current = job.get("claim") or {}
+    return (
+        claim is not None
+        and current.get("pid") == claim.get("pid")
+        and current.get("token") == claim.get("token")
+    )
+
+
+def heartbeat(claimed_path, stop_event):
+    """Touch the claimed job file so the coordinator knows the worker is alive"""
+    while not stop_event.wait(HEARTBEAT_INTERVAL):
+        try:
+            os.utime(claimed_path)
+        except FileNotFoundError:
+            return
+
+
+def artifacts_for(book, fmt, scratch_book_dir):
+    """Files a job publishes, relative to the book's output directory"""
+    names = [f"{book}.{fmt}"]
+    if fmt == "mobi":
+        # The Kindle stage writes <book>.azw3 and/or the legacy <book>.mobi (kindle profiles)
+        names = [f"{book}.azw3", f"{book}.mobi"]
+    elif fmt == "html":
+        names += ["cover.jpg", "mermaid-images", f"{book}.search.js", "chapters"]
+    elif fmt == "pdf" and os.path.isdir(scratch_book_dir):
+        # PDF variants (BUILD_VARIANTS) are published as <book>-<variant>.pdf
+        names += sorted(
+            name for name in os.listdir(scratch_book_dir)
+            if name.startswith(f"{book}-") and name.endswith(".pdf")
+        )
+    return [name for name in names if os.path.exists(os.path.join(scratch_book_dir, name))]
+
+
+def run_job(claimed_path, worker_id):
+    """Build one job in a scratch directory and publish its artifacts"""
+    job = read_json(claimed_path)
+    book, fmt = job["book"], job["format"]
+    log_path = os.path.join(state_dir("logs"), job_name(book, fmt).replace(".json", ".log"))
+    scratch = tempfile.mkdtemp(prefix=f"build-{book}-{fmt}-")
+
+    env = dict(os.environ, PUBLIC_DIR=scratch, FORMATS=fmt, BUILD_WORKER=worker_id)
+    started = time.time()
+    try:
+        with open(log_path, "w", encoding="utf-8") as log:
+            result = subprocess.run(
+                ["bash", "scripts/build-all-formats.sh", book],
+                cwd=REPO_ROOT,
+                env=env,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+            )
+        scratch_book_dir = os.path.join(scratch, book)
+        names = artifacts_for(book, fmt, scratch_book_dir)
+
+        if result.returncode != 0:
+            return job, False, f"build exited with {result.returncode} (see {log_path})"
+        if not names or (fmt != "mobi" and f"{book}.{fmt}" not in names):
+            return job, False, f"{book}.{fmt} was not produced (see {log_path})"
+
+        published = atomic_publish.publish_tree(
+            scratch_book_dir, os.path.join(PUBLIC_DIR, book), names
+        )
+        if fmt == "html":
+            stylesheets = [name for name in os.listdir(scratch) if name.endswith(".css")]
+            atomic_publish.publish_tree(scratch, PUBLIC_DIR, stylesheets)
+
+        job["duration"] = round(time.time() - started, 2)
+        job["published"] = published
+        return job, True, "ok"
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def finish(claimed_path, job, ok, message, worker_id):
+    """Move a claimed job to done/, back to pending/ for a retry, or to failed/.
+    Returns False, touching nothing, when the claim was requeued meanwhile"""
+    name = parse_claimed(os.path.basename(claimed_path))[1]
+    claim = job.get("claim")
+    # Take the file out of claimed/ first, so requeue() cannot move it under us
+    finishing = os.path.join(state_dir("claimed"), f".tmp-finish-{uuid.uuid4().hex}")
+    try:
+        os.rename(claimed_path, finishing)
+    except FileNotFoundError:
+        return False
+    if not owns_claim(read_json(finishing), claim):
+        # Requeued and claimed again under the same name: not ours to finish
+        os.rename(finishing, claimed_path)
+        return False
+
+    job["worker"] = worker_id
+    job["message"] = message
+    job["finished_at"] = time.time()
+
+    if ok:
+        target = state_dir("done")
+    else:
+        job["attempts"] = job.get("attempts", 0) + 1
+        target = state_dir("pending") if job["attempts"] < MAX_ATTEMPTS else state_dir("failed")
+
+    write_json_atomic(finishing, job)
+    os.rename(finishing, os.path.join(target, name))
+    return True
+
+
+def worker(worker_id, drain, poll):
+    """Claim and build jobs until stopped (or until the queue is empty with --drain)"""
+    ensure_queue()
+    print(f"👷 Worker {worker_id} watching {QUEUE_DIR}")
+
+    while True:
+        claimed_path = claim(worker_id)
+        if claimed_path is None:
+            if drain:
+                print(f"✓ Worker {worker_id}: queue drained")
+                return
+            time.sleep(poll)
+            continue
+
+        job = read_json(claimed_path)
+        print(f"  🔨 {worker_id}: building {job['book']} ({job['format']})")
+
+        stop_event = threading.Event()
+        beat = threading.Thread(target=heartbeat, args=(claimed_path, stop_event), daemon=True)
+        beat.start()
+        try:
+            job, ok, message = run_job(claimed_path, worker_id)
+        except Exception as e:
+            ok, message = False, f"worker error: {e}"
+        finally:
+            stop_event.set()
+            beat.join()
+
+        if not finish(claimed_path, job, ok, message, worker_id):
+            print(f"  Warning: {worker_id} lost its claim on {job['book']} ({job['format']}), it was requeued")
+            continue
+        print(f"  {'✓' if ok else '✗'} {worker_id}: {job['book']} ({job['format']}): {message}")
+
+
+def worker_is_dead(worker_id, heartbeat_age, stale_after):
+    """A worker is dead when its heartbeat is stale or, on this host, its pid is gone"""
+    if heartbeat_age > stale_after:
+        return True
+    host, _, pid = worker_id.rpartition("-")
+    if host == socket.gethostname() and pid.isdigit():
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            return False
+    return False
+
+
+def claimed_jobs():
+    now = time.time()
+    jobs = []
+    for name in sorted(os.listdir(state_dir("claimed"))):
+        if name.startswith(".tmp-"):
+            continue
+        path = os.path.join(state_dir("claimed"), name)
+        try:
+            age = now - os.stat(path).st_mtime
+        except FileNotFoundError:
+            continue
+        worker_id, job = parse_claimed(name)
+        jobs.append((path, worker_id, job, age))
+    return jobs
+
+
+def status(stale_after):
+    ensure_queue()
+    counts = {state: len(os.listdir(state_dir(state))) for state in STATES}
+    total = sum(counts.values())
+    print(f"📋 Build queue: {QUEUE_DIR}")
+    print(
+        f"   {counts['done']}/{total} done, {counts['claimed']} running, "
+        f"{counts['pending']} pending, {counts['failed']} failed"
+    )
+    for _path, worker_id, job, age in claimed_jobs():
+        dead = worker_is_dead(worker_id, age, stale_after)
+        marker = "💀 dead" if dead else "running"
+        print(f"   • {job[:-5]} on {worker_id} ({marker}, heartbeat {age:.0f}s ago)")
+    for name in sorted(os.listdir(state_dir("failed"))):
+        job = read_json(os.path.join(state_dir("failed"), name))
+        print(f"   ✗ {name[:-5]}: {job.get('message', 'failed')}")
+
+
+def requeue(stale_after):
+    """Return jobs held by dead workers to the pending queue"""
+    ensure_queue()
+    requeued = 0
+    for path, worker_id, job, age in claimed_jobs():
+        if not worker_is_dead(worker_id, age, stale_after):
+            continue
+        try:
+            os.rename(path, os.path.join(state_dir("pending"), job))
+        except FileNotFoundError:
+            continue
+        requeued += 1
+        print(f"   ↻ Requeued {job[:-5]} from {worker_id}")
+    print(f"✓ Requeued {requeued} job(s)")
+    return requeued
+
+
+def run_local(books, formats, workers):
+    """Queue jobs and drain them with several workers on this machine"""
+    enqueue(books, formats)
+    # Workers share one run id so the governor reports all their heavy jobs together
+    run_id = os.environ.get("BUILD_RUN_ID") or f"{int(time.time())}-{os.getpid()}"
+    env = dict(os.environ, BUILD_RUN_ID=run_id)
+    processes = [
+        subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "worker", "--drain", "--id", f"{socket.gethostname()}-local{i}"],
+            env=env,
+        )
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.wait()
+    status(STALE_AFTER)
+    resource_governor.report(run_id)
+    return len(os.listdir(state_dir("failed"))) == 0
+
+
+def all_books():
+    books_dir = os.path.join(REPO_ROOT, "books")
+    return sorted(name[:-3] for name in os.listdir(books_dir) if name.endswith(".md"))
+
+
+def parse_formats(value):
+    formats = [fmt.strip() for fmt in value.split(",") if fmt.strip()]
+    unknown = [fmt for fmt in formats if fmt not in FORMATS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown format(s): {', '.join(unknown)}")
+    return formats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared-directory build queue")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    for name, help_text in [
+        ("enqueue", "Queue book-format jobs"),
+        ("run-local", "Queue jobs and drain them with local workers"),
+    ]:
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument("books", nargs="*", help="Books to build (default: all)")
+        sub.add_argument(
+            "--formats",
+            type=parse_formats,
+            default=FORMATS,
+            help="Comma-separated formats (default: html,pdf,epub,mobi)",
+        )
+        if name == "run-local":
+            sub.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+
+    worker_parser = subparsers.add_parser("worker", help="Run a build worker")
+    worker_parser.add_argument("--id", default=None, help="Worker id (default: host-pid)")
+    worker_parser.add_argument(
+        "--drain", action="store_true", help="Exit when the queue is empty"
+    )
+    worker_parser.add_argument("--poll", type=float, default=2.0, help="Idle poll interval")
+
+    for name, help_text in [
+        ("status", "Show queue progress"),
+        ("requeue", "Requeue jobs held by dead workers"),
+    ]:
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument(
+            "--stale-after",
+            type=int,
+            default=STALE_AFTER,
+            help="Seconds without a heartbeat before a worker counts as dead",
+        )
+
+    subparsers.add_parser("clear", help="Remove finished and failed jobs")
+
+    args = parser.parse_args()
+
+    if args.command == "enqueue":
+        enqueue(args.books or all_books(), args.formats)
+    elif args.command == "run-local":
+        if not run_local(args.books or all_books(), args.formats, args.workers):
+            sys.exit(1)
+    elif args.command == "worker":
+        worker(args.id or default_worker_id(), args.drain, args.poll)
+    elif args.command == "status":
+        status(args.stale_after)
+    elif args.command == "requeue":
+        requeue(args.stale_after)
+    elif args.command == "clear":
+        ensure_queue()
+        for state in ["done", "failed"]:
+            for name in os.listdir(state_dir(state)):
+                os.unlink(os.path.join(state_dir(state), name))
+        print("✓ Cleared finished and failed jobs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Build a full-text search index for the HTML edition
+Splits the processed HTML into sections at each heading, builds an inverted
+index of words with their positions (delta-encoded) and writes it next to the
+book as <book>.search.js, which the search widget from templates/search.js
+loads on first use. The widget and its container are injected into the
+published HTML only, after the PDF and EPUB copies have been made
+"""
+
+import sys
+import os
+import re
+import json
+import argparse
+import unicodedata
+
+from bs4 import BeautifulSoup, NavigableString, Comment
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WIDGET_PATH = os.path.join(REPO_ROOT, "templates", "search.js")
+
+HEADINGS = {"h1", "h2", "h3", "h4"}
+CHAPTER_HEADINGS = {"h1", "h2"}
+SKIP_TAGS = {"script", "style", "svg", "nav", "noscript", "template"}
+SKIP_CLASSES = {"toc-container", "mermaid", "book-search"}
+BLOCK_TAGS = {
+    "p", "div", "section", "pre", "li", "tr", "td", "th", "blockquote",
+    "figure", "figcaption", "dd", "dt", "br", "table",
+}
+SNIPPET_LENGTH = 160
+
+# Common words are not indexed; the widget drops them from queries too
+STOP_WORDS = sorted(
+    """a an and are as at be but by do for from has have he i if in is it its
+    of on or so that the their them then there they this to was we were what
+    when which who will with you your""".split()
+)
+
+WORD_RE = re.compile(r"[^\W_]+")
+WIDGET_ID = "book-search-widget"
+CONTAINER = '<div id="book-search" class="book-search" hidden></div>'
+# Older templates carried the container and a search.js reference themselves
+WIDGET_SCRIPT_RE = re.compile(r'<script\b[^>]*\bsrc="search\.js"[^>]*>\s*</script>\s*')
+CONTAINER_RE = re.compile(r'<div\b[^>]*\bid="book-search"[^>]*>')
+DATA_INDEX_RE = re.compile(r'\s+data-index="[^"]*"')
+BODY_OPEN_RE = re.compile(r"<body\b[^>]*>", re.I)
+BODY_CLOSE_RE = re.compile(r"</body\s*>", re.I)
+
+
+def tokenize(text):
+    """Lowercase words with accents stripped (must match tokenize() in search.js)"""
+    normalized = unicodedata.normalize("NFKD", text)
+    normalized = "".join(c for c in normalized if not unicodedata.combining(c))
+    return WORD_RE.findall(normalized.lower())
+
+
+def walk(node):
+    """Yield ("heading", tag) and ("text", str) events in document order"""
+    for child in node.children:
+        if isinstance(child, Comment):
+            continue
+        if isinstance(child, NavigableString):
+            yield "text", str(child)
+            continue
+        if child.name in SKIP_TAGS or SKIP_CLASSES.intersection(child.get("class", [])):
+            continue
+        if child.name in HEADINGS and child.get("id"):
+            yield "heading", child
+            continue
+        yield from walk(child)
+        if child.name in BLOCK_TAGS:
+            yield "text", " "
+
+
+def split_sections(soup):
+    """Return sections as dicts with anchor, title, level and text"""
+    sections = []
+    current = None
+    for kind, value in walk(soup.body or soup):
+        if kind == "heading":
+            current = {
+                "anchor": value["id"],
+                "title": " ".join(value.get_text(" ").split()),
+                "tag": value.name,
+                "text": [],
+            }
+            sections.append(current)
+        elif current is not None:
+            current["text"].append(value)
+
+    for section in sections:
+        section["text"] = " ".join("".join(section["text"]).split())
+    return sections
+
+
+def snippet(text):
+    if len(text) <= SNIPPET_LENGTH:
+        return text
+    return text[:SNIPPET_LENGTH].rsplit(" ", 1)[0] + "…"
+
+
+def build_index(sections):
+    """Inverted index: term -> [[doc, first position, delta, ...], ...]"""
+    stop = set(STOP_WORDS)
+    docs = []
+    terms = {}
+    chapter = None
+
+    for doc_id, section in enumerate(sections):
+        if section["tag"] in CHAPTER_HEADINGS:
+            chapter = doc_id
+        title_words = tokenize(section["title"])
+        words = title_words + tokenize(section["text"])
+        # doc = [anchor, title, chapter doc, title length, snippet]
+        docs.append(
+            [section["anchor"], section["title"], chapter, len(title_words), snippet(section["text"])]
+        )
+
+        postings = {}
+        for position, word in enumerate(words):
+            if word in stop:
+                continue
+            postings.setdefault(word, []).append(position)
+
+        for word, positions in postings.items():
+            deltas = [positions[0]] + [b - a for a, b in zip(positions, positions[1:])]
+            terms.setdefault(word, []).append([doc_id] + deltas)
+
+    return {"v": 1, "stop": STOP_WORDS, "docs": docs, "terms": terms}
+
+
+def inline_widget(html_content, index_name):
+    """Add the search container at the top of <body> and the inlined widget at
+    its end (once; reruns only re-point the container at the index)"""
+    if not os.path.exists(WIDGET_PATH):
+        print(f"Warning: Search widget not found: {WIDGET_PATH}")
+        return html_content
+    with open(WIDGET_PATH, "r", encoding="utf-8") as f:
+        widget = f.read()
+
+    if not CONTAINER_RE.search(html_content):
+        html_content = BODY_OPEN_RE.sub(
+            lambda m: f"{m.group(0)}\n  {CONTAINER}", html_content, count=1
+        )
+
+    # Post-processing may have reordered attributes, so rewrite the whole tag
+    def point_at_index(match):
+        tag = DATA_INDEX_RE.sub("", match.group(0))
+        return tag[:4] + f' data-index="{index_name}"' + tag[4:]
+
+    html_content = CONTAINER_RE.sub(point_at_index, html_content, count=1)
+    html_content = WIDGET_SCRIPT_RE.sub("", html_content)
+    if f'id="{WIDGET_ID}"' not in html_content:
+        script = f'<script id="{WIDGET_ID}">\n{widget}</script>\n'
+        html_content = BODY_CLOSE_RE.sub(lambda m: script + m.group(0), html_content, count=1)
+    return html_content
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build a full-text search index and widget for an HTML book"
+    )
+    parser.add_argument("html_file", help="Processed book HTML")
+    parser.add_argument(
+        "--output", help="Index path (default: <book>.search.js next to the HTML)"
+    )
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.html_file):
+        print(f"Error: HTML file not found: {args.html_file}")
+        sys.exit(1)
+
+    with open(args.html_file, "r", encoding="utf-8") as f:
+        html_content = f.read()
+
+    sections = split_sections(BeautifulSoup(html_content, "html.parser"))
+    if not sections:
+        print(f"Warning: No headings with ids in {args.html_file}, skipping search index")
+        return
+
+    index = build_index(sections)
+    output = args.output or os.path.splitext(args.html_file)[0] + ".search.js"
+    payload = json.dumps(index, ensure_ascii=False, separators=(",", ":"))
+    with open(output, "w", encoding="utf-8") as f:
+        f.write(f"window.bookSearchIndex={payload};\n")
+
+    if BODY_OPEN_RE.search(html_content) and BODY_CLOSE_RE.search(html_content):
+        index_name = os.path.relpath(output, os.path.dirname(os.path.abspath(args.html_file)))
+        with open(args.html_file, "w", encoding="utf-8") as f:
+            f.write(inline_widget(html_content, index_name))
+    else:
+        print("  ⚠️ HTML has no <body>, index built without widget")
+
+    print(
+        f"✓ Search index: {len(index['docs'])} sections, {len(index['terms'])} terms, "
+        f"{os.path.getsize(output) / 1024:.1f} KB -> {output}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Content-addressed build cache shared by the build scripts
+Stores intermediates (rendered diagrams, highlighted code, ...) under .cache/
+keyed by a hash of their inputs, so unchanged sources are not processed again
+
+With EBOOK_CACHE_URL set, local misses are looked up on a shared HTTP cache
+(GET/PUT <url>/<kind>/<key><suffix>, see scripts/cache-server.py) and new
+entries are uploaded, so other machines pull results instead of recomputing
+"""
+
+import os
+import hashlib
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_ROOT = os.environ.get("EBOOK_CACHE_DIR") or os.path.join(REPO_ROOT, ".cache")
+
+REMOTE_URL = (os.environ.get("EBOOK_CACHE_URL") or "").rstrip("/")
+REMOTE_TOKEN = os.environ.get("EBOOK_CACHE_TOKEN")
+REMOTE_READ_ONLY = os.environ.get("EBOOK_CACHE_READ_ONLY", "").lower() in ("1", "true", "yes")
+REMOTE_TIMEOUT = float(os.environ.get("EBOOK_CACHE_TIMEOUT", "5"))
+
+# Set after the first connection failure so an unreachable server costs one timeout
+_remote_disabled = False
+_push_disabled = REMOTE_READ_ONLY
+
+
+def content_hash(*parts):
+    """Return a stable sha256 hex digest for the given str/bytes parts"""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        # Length prefix keeps ("ab", "c") and ("a", "bc") apart
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def file_hash(file_path):
+    """Return the sha256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def data_hash(data):
+    """Return the sha256 hex digest of raw bytes (matches file_hash)"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def cache_path(kind, key, suffix=""):
+    """Path of a cache entry: .cache/<kind>/<key[:2]>/<key><suffix>"""
+    return os.path.join(CACHE_ROOT, kind, key[:2], key + suffix)
+
+
+def remote_enabled():
+    """True when a shared HTTP cache is configured and reachable so far"""
+    return bool(REMOTE_URL) and not _remote_disabled
+
+
+def _remote_request(method, kind, key, suffix, data=None):
+    """Send one request to the shared cache; return the response body or None"""
+    global _remote_disabled, _push_disabled
+    # Imported here: urllib.request roughly doubles this module's import time
+    import urllib.error
+    import urllib.request
+
+    request = urllib.request.Request(
+        f"{REMOTE_URL}/{kind}/{key}{suffix}", data=data, method=method
+    )
+    if REMOTE_TOKEN:
+        request.add_header("Authorization", f"Bearer {REMOTE_TOKEN}")
+    if data is not None:
+        request.add_header("Content-Type", "application/octet-stream")
+
+    try:
+        with urllib.request.urlopen(request, timeout=REMOTE_TIMEOUT) as response:
+            return response.read()
+    except urllib.error.HTTPError as e:
+        if method == "PUT" and e.code in (401, 403):
+            # Missing token or read-only server: keep pulling, stop pushing
+            _push_disabled = True
+            print(f"Warning: Shared cache rejected upload (HTTP {e.code}), pulling only")
+        elif e.code != 404:
+            print(f"Warning: Shared cache {method} {kind}/{key[:12]} failed: HTTP {e.code}")
+        return None
+    except (urllib.error.URLError, OSError) as e:
+        _remote_disabled = True
+        print(f"Warning: Shared cache {REMOTE_URL} unreachable ({e}), using the local cache only")
+        return None
+
+
+def get_bytes(kind, key, suffix="", shared=True):
+    """
+    Return cached bytes for (kind, key), or None on a miss
+    Local misses fall back to the shared cache (when configured and shared=True);
+    remote hits are stored locally so they are fetched only once
+    """
+    path = cache_path(kind, key, suffix)
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+
+    if not (shared and remote_enabled()):
+        return None
+    data = _remote_request("GET", kind, key, suffix)
+    if data is not None:
+        _write_local(path, data)
+    return data
+
+
+def put_bytes(kind, key, data, suffix="", shared=True):
+    """
+    Store bytes under (kind, key) atomically and return the cache path
+    Also uploads the entry to the shared cache unless EBOOK_CACHE_READ_ONLY is set
+    """
+    path = cache_path(kind, key, suffix)
+    _write_local(path, data)
+    if shared and remote_enabled() and not _push_disabled:
+        _remote_request("PUT", kind, key, suffix, data)
+    return path
+
+
+def _write_local(path, data):
+    """Write a local cache entry atomically"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+
+    # Write to a temp file and rename so concurrent builds never read a partial entry
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def get_text(kind, key, suffix="", shared=True):
+    """Return cached text for (kind, key), or None on a miss"""
+    data = get_bytes(kind, key, suffix, shared)
+    return data.decode("utf-8") if data is not None else None
+
+
+def put_text(kind, key, text, suffix="", shared=True):
+    """Store text under (kind, key) and return the cache path"""
+    return put_bytes(kind, key, text.encode("utf-8"), suffix, shared)
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Build journal for checkpointed, resumable builds
+Full builds record every completed stage (book + format) together with the
+hashes of the artifacts it published and of the book's inputs. A resumed build
+(build.sh --resume) asks which stages are still pending: a stage counts as done
+only if the inputs and build options are unchanged and every recorded artifact
+still exists in public/ with the recorded hash
+"""
+
+import sys
+import os
+import json
+import time
+import fcntl
+import argparse
+import tempfile
+from contextlib import contextmanager
+
+import build_cache
+
+JOURNAL_FILE = os.path.join(build_cache.CACHE_ROOT, "build-journal.json")
+CONFIG_FILE = os.path.join(build_cache.REPO_ROOT, "books", "book-config.json")
+
+# Environment that changes what the stages produce (exported by build.sh)
+OPTION_VARS = [
+    "STATIC_DIAGRAMS", "STATIC_DIAGRAMS_LINK", "USE_PANDOC_AST", "CHUNKED_HTML", "CRITICAL_CSS",
+    "PDF_PROFILE", "PDF_DIAGRAMS", "BUILD_VARIANTS", "KINDLE_PROFILE", "SOURCE_DATE_EPOCH", "MERMAID_RENDERER",
+]
+
+
+def options_hash():
+    return build_cache.content_hash(
+        *(f"{name}={os.environ.get(name, '')}" for name in OPTION_VARS)
+    )
+
+
+def book_inputs_hash(book):
+    """Hash of everything a book's stages read: source, cover, config and template"""
+    books_dir = os.environ.get("BOOKS_DIR") or os.path.join(build_cache.REPO_ROOT, "books")
+    with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    book_config = config.get("books", {}).get(book, {})
+    template = config.get("templates", {}).get(book_config.get("template", "afrinenglish"), {})
+
+    parts = [
+        json.dumps(book_config, sort_keys=True),
+        json.dumps(template, sort_keys=True),
+        json.dumps(config.get("variants", {}), sort_keys=True),
+    ]
+    images_dir = os.path.join(build_cache.REPO_ROOT, "books", "images")
+    cover = os.path.join(images_dir, f"{book}.jpg")
+    if not os.path.exists(cover):
+        cover = os.path.join(images_dir, "default.jpg")
+    paths = [os.path.join(books_dir, f"{book}.md"), cover]
+    paths += [
+        os.path.join(build_cache.REPO_ROOT, "templates", template[key])
+        for key in ("css", "html") if template.get(key)
+    ]
+    for path in paths:
+        parts.append(build_cache.file_hash(path) if os.path.exists(path) else "missing")
+    return build_cache.content_hash(*parts)
+
+
+def load():
+    try:
+        with open(JOURNAL_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+@contextmanager
+def locked():
+    """Serialise journal updates (background Kindle jobs record concurrently)"""
+    os.makedirs(os.path.dirname(JOURNAL_FILE), exist_ok=True)
+    with open(JOURNAL_FILE + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def save(journal):
+    os.makedirs(os.path.dirname(JOURNAL_FILE), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(JOURNAL_FILE), prefix=".tmp-")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(journal, f, indent=2)
+    os.replace(tmp_path, JOURNAL_FILE)
+
+
+def new_journal():
+    return {"started_at": time.time(), "options": options_hash(), "books": {}}
+
+
+def begin(resume):
+    """Start a fresh journal, or keep the existing one for a resumed build"""
+    journal = load()
+    if resume:
+        if journal is None:
+            print("⚠️ No build journal found, building everything")
+        elif journal.get("options") != options_hash():
+            print("⚠️ Build options changed since the interrupted build, building everything")
+            journal = None
+        else:
+            done = sum(len(book["stages"]) for book in journal["books"].values())
+            print(f"🔁 Resuming build: {done} completed stage(s) in the journal")
+            return
+    with locked():
+        save(new_journal())
+
+
+def stage_is_done(stage, publish_dir):
+    for name, digest in stage["outputs"].items():
+        path = os.path.join(publish_dir, name)
+        if not os.path.isfile(path) or build_cache.file_hash(path) != digest:
+            return False
+    return True
+
+
+def pending(book, formats, publish_dir):
+    """Formats of a book that still have to be built"""
+    journal = load()
+    entry = (journal or {}).get("books", {}).get(book)
+    if entry is None or entry.get("inputs") != book_inputs_hash(book):
+        return list(formats)
+
+    remaining = []
+    for fmt in formats:
+        stage = entry["stages"].get(fmt)
+        if stage is None or not stage_is_done(stage, publish_dir):
+            remaining.append(fmt)
+        else:
+            print(f"    ⏭️  {book} ({fmt}) already built", file=sys.stderr)
+    return remaining
+
+
+def record(book, fmt, publish_dir, names):
+    """Journal a completed stage with the hashes of its published files"""
+    inputs = book_inputs_hash(book)
+    outputs = {}
+    for name in names:
+        path = os.path.join(publish_dir, name)
+        if os.path.isfile(path):
+            outputs[name] = build_cache.file_hash(path)
+    if not outputs:
+        return False
+
+    with locked():
+        journal = load() or new_journal()
+        entry = journal["books"].get(book)
+        if entry is None or entry.get("inputs") != inputs:
+            entry = journal["books"][book] = {"inputs": inputs, "stages": {}}
+        entry["stages"][fmt] = {"outputs": outputs, "finished_at": time.time()}
+        save(journal)
+    return True
+
+
+def status():
+    journal = load()
+    if journal is None:
+        print("No build journal")
+        return
+    started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(journal["started_at"]))
+    print(f"📒 Build journal (started {started}):")
+    for book, entry in sorted(journal["books"].items()):
+        stages = ", ".join(sorted(entry["stages"])) or "none"
+        print(f"   {book}: {stages}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Journal of completed build stages")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    begin_parser = subparsers.add_parser("begin", help="Start (or resume) a build journal")
+    begin_parser.add_argument("--resume", action="store_true", help="Keep completed stages")
+
+    pending_parser = subparsers.add_parser("pending", help="Print the formats still to build")
+    pending_parser.add_argument("book")
+    pending_parser.add_argument("formats", nargs="+")
+    pending_parser.add_argument("--dir", required=True, help="The book's published directory")
+
+    record_parser = subparsers.add_parser("record", help="Journal a completed stage")
+    record_parser.add_argument("book")
+    record_parser.add_argument("format")
+    record_parser.add_argument("names", nargs="+", help="Published files, relative to --dir")
+    record_parser.add_argument("--dir", required=True, help="The book's published directory")
+
+    subparsers.add_parser("status", help="Show completed stages")
+
+    args = parser.parse_args()
+
+    if args.command == "begin":
+        begin(args.resume)
+    elif args.command == "pending":
+        print(" ".join(pending(args.book, args.formats, args.dir)))
+    elif args.command == "record":
+        record(args.book, args.format, args.dir, args.names)
+    elif args.command == "status":
+        status()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Minimal shared build cache server
+Serves the HTTP protocol used by build_cache.py when EBOOK_CACHE_URL is set:
+GET/HEAD/PUT /<kind>/<key><suffix>, stored on disk in the same layout as the
+local .cache/ directory. Entries are immutable: a PUT for an existing entry is
+accepted but does not overwrite it
+"""
+
+import sys
+import os
+import re
+import hmac
+import argparse
+import tempfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Only /<kind>/<sha256 key><suffix> paths are valid, which also rules out traversal
+ENTRY_RE = re.compile(r"^/([a-z0-9_-]+)/([0-9a-f]{64})((?:\.[A-Za-z0-9_-]+)*)$")
+DEFAULT_MAX_ENTRY = 64 * 1024 * 1024
+
+
+class CacheHandler(BaseHTTPRequestHandler):
+    """Request handler; the storage root and settings live on the server"""
+
+    server_version = "EbookCache/1.0"
+
+    def entry_path(self):
+        """Return the on-disk path for the request, or None after answering 400"""
+        match = ENTRY_RE.match(self.path.split("?", 1)[0])
+        if not match:
+            self.send_error(400, "Expected /<kind>/<sha256><suffix>")
+            return None
+        kind, key, suffix = match.groups()
+        return os.path.join(self.server.root, kind, key[:2], key + suffix)
+
+    def authorized(self, write):
+        """Check the bearer token (writes only, unless --protect-reads)"""
+        token = self.server.token
+        if not token or (not write and not self.server.protect_reads):
+            return True
+        header = self.headers.get("Authorization", "")
+        if hmac.compare_digest(header, f"Bearer {token}"):
+            return True
+        self.send_error(401, "Missing or invalid token")
+        return False
+
+    def serve_entry(self, with_body):
+        path = self.entry_path()
+        if path is None or not self.authorized(write=False):
+            return
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            self.send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if with_body:
+            self.wfile.write(data)
+
+    def do_GET(self):
+        self.serve_entry(with_body=True)
+
+    def do_HEAD(self):
+        self.serve_entry(with_body=False)
+
+    def do_PUT(self):
+        path = self.entry_path()
+        if path is None or not self.authorized(write=True):
+            return
+        if self.server.read_only:
+            self.send_error(403, "Cache is read-only")
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            self.send_error(411)
+            return
+        if length > self.server.max_entry:
+            self.send_error(413)
+            return
+        data = self.rfile.read(length)
+
+        if os.path.exists(path):
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        self.send_response(201)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve a shared build cache over HTTP (GET/PUT by content hash)"
+    )
+    parser.add_argument(
+        "--root", default="cache-store", help="Directory to store entries (default: cache-store)"
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Address to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on (default: 8765)")
+    parser.add_argument(
+        "--token",
+        default=os.environ.get("EBOOK_CACHE_TOKEN"),
+        help="Bearer token required for uploads (default: $EBOOK_CACHE_TOKEN)",
+    )
+    parser.add_argument(
+        "--protect-reads", action="store_true", help="Require the token for downloads as well"
+    )
+    parser.add_argument("--read-only", action="store_true", help="Reject all uploads")
+    parser.add_argument(
+        "--max-entry-mb", type=int, default=DEFAULT_MAX_ENTRY // (1024 * 1024),
+        help="Largest accepted entry in MB (default: 64)",
+    )
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+
+    args = parser.parse_args()
+
+    if args.host not in ("127.0.0.1", "localhost", "::1") and not args.token:
+        print("Warning: Serving on a public address without --token; anyone can upload entries")
+
+    os.makedirs(args.root, exist_ok=True)
+    server = ThreadingHTTPServer((args.host, args.port), CacheHandler)
+    server.root = os.path.abspath(args.root)
+    server.token = args.token
+    server.protect_reads = args.protect_reads
+    server.read_only = args.read_only
+    server.max_entry = args.max_entry_mb * 1024 * 1024
+    server.verbose = args.verbose
+
+    print(f"🗄️  Build cache serving {server.root} on http://{args.host}:{args.port}")
+    print(f"   Point builds at it with: export EBOOK_CACHE_URL=http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopped")
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Critical CSS for the HTML edition
+Replaces the embedded template stylesheet with only the rules that style the
+first screen (cover, title and table of contents), and loads the full
+stylesheet plus every other <link rel="stylesheet"> (Google Fonts, Prism)
+without blocking the first paint. Rules are kept when their selector matches an
+element above the fold; selectors that cannot be evaluated are kept as well
+"""
+
+import sys
+import os
+import re
+import argparse
+
+from bs4 import BeautifulSoup
+import soupsieve
+
+# Top-level blocks of .book-container kept after the TOC (or from the start
+# when there is no TOC): the book title and its first paragraphs
+FOLD_BLOCKS = 3
+# At-rules holding nested rules; other at-rules are kept or dropped whole
+GROUP_AT_RULES = ("@media", "@supports", "@layer", "@container")
+DROPPED_AT_RULES = ("@import", "@charset", "@page")
+
+COMMENT_RE = re.compile(r"/\*.*?\*/", re.S)
+# Pseudo-elements and state pseudo-classes never change whether an element is on screen
+PSEUDO_RE = re.compile(
+    r"::?(?:-[a-z]+-[a-z-]+|before|after|first-line|first-letter|selection|placeholder|"
+    r"marker|backdrop|hover|focus|focus-visible|focus-within|active|visited|link|target)\b",
+    re.I,
+)
+CLASS_RE = re.compile(r"\.(-?[_a-zA-Z][\w-]*)")
+ID_RE = re.compile(r"#(-?[_a-zA-Z][\w-]*)")
+
+
+def parse_css(css):
+    """Split a stylesheet into (prelude, body) blocks and bare at-rule statements
+    (body None); the bodies of grouping at-rules are parsed recursively"""
+    blocks = []
+    depth = 0
+    start = 0
+    prelude = None
+    quote = None
+    for i, char in enumerate(css):
+        if quote:
+            if char == quote and css[i - 1] != "\\":
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif char == "{":
+            if depth == 0:
+                prelude = css[start:i].strip()
+                start = i + 1
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                body = css[start:i]
+                if prelude.lower().startswith(GROUP_AT_RULES):
+                    body = parse_css(body)
+                blocks.append((prelude, body))
+                start = i + 1
+            depth = max(depth, 0)
+        elif char == ";" and depth == 0:
+            statement = css[start:i].strip()
+            if statement:
+                blocks.append((statement, None))
+            start = i + 1
+    return blocks
+
+
+def split_selectors(prelude):
+    """Split a selector list at top-level commas (not inside :is(...) or [...])"""
+    selectors, depth, start = [], 0, 0
+    for i, char in enumerate(prelude):
+        if char in "([":
+            depth += 1
+        elif char in ")]":
+            depth -= 1
+        elif char == "," and depth == 0:
+            selectors.append(prelude[start:i].strip())
+            start = i + 1
+    selectors.append(prelude[start:].strip())
+    return [selector for selector in selectors if selector]
+
+
+class FoldMatcher:
+    """Answers whether a selector matches any element of the first screen"""
+
+    def __init__(self, elements):
+        self.elements = elements
+        self.classes = {name for el in elements for name in el.get("class", [])}
+        self.ids = {el["id"] for el in elements if el.get("id")}
+        self.cache = {}
+
+    def matches(self, selector):
+        selector = PSEUDO_RE.sub("", selector).strip()
+        if not selector or selector[-1] in ">+~":
+            selector = (selector + " *").strip()
+        if selector in self.cache:
+            return self.cache[selector]
+
+        # Cheap rejection: the rightmost compound names a class or id not on screen
+        last = re.split(r"[\s>+~]+", selector)[-1]
+        if any(name not in self.classes for name in CLASS_RE.findall(last)) or any(
+            name not in self.ids for name in ID_RE.findall(last)
+        ):
+            result = False
+        else:
+            try:
+                compiled = soupsieve.compile(selector)
+                result = any(compiled.match(el) for el in self.elements)
+            except Exception:
+                result = True  # unsupported selector: keep the rule to be safe
+        self.cache[selector] = result
+        return result
+
+
+def fold_elements(soup):
+    """Elements rendered on the first screen: the page chrome, then the
+    container's blocks up to the TOC plus the title blocks after it"""
+    container = soup.find("div", class_="book-container") or soup.body
+    elements = [container] + list(container.parents)
+    elements = [el for el in elements if el.name and el.name != "[document]"]
+
+    # Body-level chrome before the container (e.g. the search box)
+    for sibling in container.find_previous_siblings(True):
+        elements += [sibling] + sibling.find_all(True)
+
+    blocks = container.find_all(True, recursive=False)
+    toc = container.find(class_="toc-container")
+    end = 0
+    if toc is not None:
+        for i, block in enumerate(blocks):
+            if block is toc or toc in block.descendants:
+                end = i + 1
+                break
+    for block in blocks[: end + FOLD_BLOCKS]:
+        elements += [block] + block.find_all(True)
+    return elements
+
+
+def critical_rules(blocks, matcher, indent=""):
+    """Serialise the blocks that style the first screen"""
+    out = []
+    for prelude, body in blocks:
+        lowered = prelude.lower()
+        if body is None or lowered.startswith(DROPPED_AT_RULES) or lowered.startswith("@media print"):
+            continue
+        if isinstance(body, list):
+            inner = critical_rules(body, matcher, indent + "  ")
+            if inner:
+                out.append(f"{indent}{prelude} {{\n{inner}\n{indent}}}")
+        elif lowered.startswith("@"):
+            out.append(f"{indent}{prelude} {{{body.strip()}}}")  # @font-face, @keyframes
+        elif any(matcher.matches(selector) for selector in split_selectors(prelude)):
+            declarations = " ".join(line.strip() for line in body.strip().splitlines())
+            out.append(f"{indent}{prelude} {{ {declarations} }}")
+    return "\n".join(out)
+
+
+def non_blocking_link(soup, href):
+    """Preload a stylesheet and apply it once loaded, with a <noscript> fallback"""
+    preload = soup.new_tag(
+        "link", rel="preload", href=href, attrs={"as": "style"},
+        onload="this.onload=null;this.rel='stylesheet'",
+    )
+    noscript = soup.new_tag("noscript")
+    noscript.append(soup.new_tag("link", rel="stylesheet", href=href))
+    return preload, noscript
+
+
+def process_html(html_file_path, css_file_path, href):
+    with open(css_file_path, "r", encoding="utf-8") as f:
+        full_css = f.read()
+    with open(html_file_path, "r", encoding="utf-8") as f:
+        soup = BeautifulSoup(f.read(), "html.parser")
+
+    if soup.head is None or soup.body is None:
+        print(f"Warning: No <head>/<body> in {html_file_path}, skipping critical CSS")
+        return True
+    if soup.find("style", id="critical-css"):
+        print("Critical CSS already inlined")
+        return True
+
+    # The template stylesheet: embedded by fix-css-links.py, or still linked
+    css_name = os.path.basename(css_file_path)
+    target = None
+    for style in soup.head.find_all("style"):
+        if (style.string or "").strip() == full_css.strip():
+            target = style
+            break
+    if target is None:
+        target = soup.head.find(
+            "link", rel="stylesheet", href=lambda value: value and value.endswith(css_name)
+        )
+    if target is None:
+        print(f"Warning: {css_name} is neither embedded nor linked in {html_file_path}")
+        return True
+
+    matcher = FoldMatcher(fold_elements(soup))
+    critical = critical_rules(parse_css(COMMENT_RE.sub("", full_css)), matcher)
+
+    style = soup.new_tag("style", id="critical-css")
+    style.string = "\n" + critical + "\n"
+    target.replace_with(style)
+    style.insert_after(*non_blocking_link(soup, href))
+
+    # Every other stylesheet link (web fonts, Prism) stops blocking the first paint too
+    deferred = 0
+    for link in soup.head.find_all("link", rel="stylesheet"):
+        if link.find_parent("noscript"):
+            continue
+        link.replace_with(*non_blocking_link(soup, link["href"]))
+        deferred += 1
+
+    with open(html_file_path, "w", encoding="utf-8") as f:
+        f.write(str(soup))
+
+    print(
+        f"✓ Inlined {len(critical) / 1024:.1f} KB of critical CSS "
+        f"(of {len(full_css) / 1024:.1f} KB); {href} and {deferred} other stylesheet(s) load non-blocking"
+    )
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Inline only the first-screen CSS and load the rest non-blocking"
+    )
+    parser.add_argument("html_file", help="HTML file to process")
+    parser.add_argument("css_file", help="Template stylesheet (e.g. templates/afrinenglish.css)")
+    parser.add_argument(
+        "--href",
+        help="URL of the full stylesheet as published (default: ../<css file name>)",
+    )
+
+    args = parser.parse_args()
+
+    for path in (args.html_file, args.css_file):
+        if not os.path.exists(path):
+            print(f"Error: File not found: {path}")
+            sys.exit(1)
+
+    href = args.href or "../" + os.path.basename(args.css_file)
+    if not process_html(args.html_file, args.css_file, href):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Content-hashed names for published assets
+Links every local asset referenced by the published HTML (stylesheets, scripts,
+cover, diagrams, search index) under a name carrying its content hash, e.g.
+cover.3f9a1c2b7d.jpg, and rewrites the references. Hashed files never change,
+so they can be served with Cache-Control: immutable. The logical names stay in
+place, and public/asset-manifest.json maps each logical name to its hashed one
+"""
+
+import sys
+import os
+import re
+import json
+import argparse
+import tempfile
+
+import asset_store
+import build_cache
+
+MANIFEST_NAME = "asset-manifest.json"
+HASH_LENGTH = 10
+ASSET_EXTENSIONS = {
+    ".css", ".js", ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp",
+    ".woff", ".woff2", ".ttf", ".otf", ".ico",
+}
+
+HTML_REF_RE = re.compile(r"""(\b(?:src|href|data-index)\s*=\s*)(["'])([^"'<>]+)\2""", re.I)
+STYLE_BLOCK_RE = re.compile(r"(<style\b[^>]*>)(.*?)(</style>)", re.S | re.I)
+CSS_URL_RE = re.compile(r"""(url\(\s*)(["']?)([^"')]+)\2(\s*\))""", re.I)
+HASHED_NAME_RE = re.compile(r"\.[0-9a-f]{%d}\.[A-Za-z0-9]+$" % HASH_LENGTH)
+
+
+def is_local_reference(url):
+    return not (
+        not url
+        or url.startswith(("#", "/", "data:", "mailto:", "javascript:"))
+        or re.match(r"^[a-z][a-z0-9+.-]*:", url, re.I)
+        or url.startswith("//")
+    )
+
+
+def hashed_name(name, digest):
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{digest[:HASH_LENGTH]}{ext}"
+
+
+class Fingerprinter:
+    """Fingerprints assets under public_dir, each one only once per run"""
+
+    def __init__(self, public_dir):
+        self.public_dir = os.path.abspath(public_dir)
+        self.store_dir = os.path.abspath(asset_store.STORE_DIR)
+        # Absolute logical path -> absolute hashed path
+        self.hashed = {}
+
+    def resolve(self, url, base_dir):
+        """Absolute path of a local asset reference, or None if it is not one"""
+        if not is_local_reference(url):
+            return None
+        path = url.split("#", 1)[0].split("?", 1)[0]
+        target = os.path.normpath(os.path.join(base_dir, path))
+        if os.path.splitext(target)[1].lower() not in ASSET_EXTENSIONS:
+            return None
+        if not target.startswith(self.public_dir + os.sep) or target.startswith(self.store_dir):
+            return None
+        if not os.path.isfile(target):
+            return None
+        return target
+
+    def rewrite_url(self, url, base_dir):
+        target = self.resolve(url, base_dir)
+        if target is None:
+            return url
+        if HASHED_NAME_RE.search(target):
+            # Already fingerprinted by an earlier run: keep it in the manifest
+            stem, ext = os.path.splitext(target)
+            self.hashed.setdefault(os.path.splitext(stem)[0] + ext, target)
+            return url
+        hashed = self.fingerprint(target)
+        suffix = url[len(url.split("#", 1)[0].split("?", 1)[0]):]
+        rel = os.path.relpath(hashed, base_dir).replace(os.sep, "/")
+        return rel + suffix
+
+    def rewrite_css(self, css, base_dir):
+        def replace(match):
+            prefix, quote, url, close = match.groups()
+            return f"{prefix}{quote}{self.rewrite_url(url.strip(), base_dir)}{quote}{close}"
+
+        return CSS_URL_RE.sub(replace, css)
+
+    def fingerprint(self, path):
+        """Link path under its content-hashed name and return the hashed path"""
+        if path in self.hashed:
+            return self.hashed[path]
+
+        with open(path, "rb") as f:
+            data = f.read()
+        if path.lower().endswith(".css"):
+            # Hash the stylesheet after its own url() references are fingerprinted
+            css = data.decode("utf-8", errors="surrogateescape")
+            data = self.rewrite_css(css, os.path.dirname(path)).encode("utf-8", errors="surrogateescape")
+
+        hashed = os.path.join(
+            os.path.dirname(path), hashed_name(os.path.basename(path), build_cache.data_hash(data))
+        )
+        # Through the store, so identical assets across books share one copy
+        asset_store.add_bytes(data, hashed)
+        self.hashed[path] = hashed
+        return hashed
+
+    def rewrite_html(self, html_path):
+        """Point an HTML page's local asset references at the hashed names"""
+        with open(html_path, "r", encoding="utf-8") as f:
+            content = f.read()
+        base_dir = os.path.dirname(html_path)
+
+        def replace_attr(match):
+            prefix, quote, url = match.groups()
+            return f"{prefix}{quote}{self.rewrite_url(url, base_dir)}{quote}"
+
+        def replace_style(match):
+            opening, css, closing = match.groups()
+            return opening + self.rewrite_css(css, base_dir) + closing
+
+        updated = HTML_REF_RE.sub(replace_attr, content)
+        # Only inside <style>: url(...) in the text (e.g. a CSS code sample) stays as is
+        updated = STYLE_BLOCK_RE.sub(replace_style, updated)
+        if updated == content:
+            return False
+
+        # Replace rather than rewrite in place, in case the page is a hardlink
+        fd, tmp_path = tempfile.mkstemp(dir=base_dir, prefix=".tmp-")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(updated)
+        os.replace(tmp_path, html_path)
+        return True
+
+    def manifest_entries(self):
+        return {
+            os.path.relpath(logical, self.public_dir).replace(os.sep, "/"):
+                os.path.relpath(hashed, self.public_dir).replace(os.sep, "/")
+            for logical, hashed in self.hashed.items()
+        }
+
+
+def html_pages(directory, store_dir):
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = [d for d in dirs if os.path.abspath(os.path.join(root, d)) != store_dir]
+        for name in sorted(files):
+            if name.endswith(".html") and not name.startswith(".tmp-"):
+                yield os.path.join(root, name)
+
+
+def prune_stale(public_dir, manifest, directories):
+    """Remove hashed files in the processed directories that the manifest no longer uses"""
+    current = {os.path.join(public_dir, hashed) for hashed in manifest.values()}
+    removed = 0
+    store_dir = os.path.abspath(asset_store.STORE_DIR)
+    for directory in directories:
+        for root, dirs, files in os.walk(directory):
+            dirs[:] = [d for d in dirs if os.path.abspath(os.path.join(root, d)) != store_dir]
+            for name in files:
+                path = os.path.abspath(os.path.join(root, name))
+                if HASHED_NAME_RE.search(name) and path not in current:
+                    os.unlink(path)
+                    removed += 1
+    return removed
+
+
+def prune_stale_root(public_dir, manifest, directories, store_dir):
+    """Remove hashed files at the public/ root (the template stylesheets books
+    share) that the manifest no longer uses and no other book's page links to"""
+    current = {os.path.join(public_dir, hashed) for hashed in manifest.values()}
+    stale = [
+        name for name in os.listdir(public_dir)
+        if HASHED_NAME_RE.search(name)
+        and os.path.isfile(os.path.join(public_dir, name))
+        and os.path.join(public_dir, name) not in current
+    ]
+    if not stale:
+        return 0
+
+    # Books not rebuilt in this run may still point at an older hashed copy
+    processed = tuple(os.path.abspath(directory) + os.sep for directory in directories)
+    for page in html_pages(public_dir, store_dir):
+        if os.path.abspath(page).startswith(processed):
+            continue
+        with open(page, "r", encoding="utf-8", errors="replace") as f:
+            content = f.read()
+        stale = [name for name in stale if name not in content]
+        if not stale:
+            return 0
+
+    for name in stale:
+        os.unlink(os.path.join(public_dir, name))
+    return len(stale)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Link published assets under content-hashed names and rewrite references"
+    )
+    parser.add_argument("public_dir", help="Published output directory (e.g. public)")
+    parser.add_argument(
+        "--book", action="append", help="Only process this book's directory (repeatable)"
+    )
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.public_dir):
+        print(f"Error: Directory not found: {args.public_dir}")
+        sys.exit(1)
+
+    fingerprinter = Fingerprinter(args.public_dir)
+    public_dir = fingerprinter.public_dir
+    directories = (
+        [os.path.join(public_dir, book) for book in args.book] if args.book else [public_dir]
+    )
+
+    rewritten = 0
+    for directory in directories:
+        for page in html_pages(directory, fingerprinter.store_dir):
+            rewritten += fingerprinter.rewrite_html(page)
+
+    manifest_path = os.path.join(public_dir, MANIFEST_NAME)
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        manifest = {}
+    if args.book:
+        # Entries of the books processed now are replaced; other books keep theirs
+        prefixes = tuple(f"{book}/" for book in args.book)
+        manifest = {
+            logical: hashed for logical, hashed in manifest.items()
+            if not logical.startswith(prefixes)
+            and os.path.exists(os.path.join(public_dir, hashed))
+        }
+    else:
+        manifest = {}
+    manifest.update(fingerprinter.manifest_entries())
+    manifest = dict(sorted(manifest.items()))
+
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+
+    removed = prune_stale(public_dir, manifest, directories)
+    if args.book:
+        # The books' root stylesheets live outside their directories
+        removed += prune_stale_root(public_dir, manifest, directories, fingerprinter.store_dir)
+    print(
+        f"✓ Fingerprinted {len(fingerprinter.hashed)} asset(s) in {rewritten} page(s)"
+        + (f", removed {removed} stale" if removed else "")
+    )
+    print(f"  Manifest: {manifest_path}")
+
+
+if __name__ == "__main__":
+    main()
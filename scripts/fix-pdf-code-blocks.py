@@ -9,24 +9,6 @@ import os
 from bs4 import BeautifulSoup
 import argparse
 
-PRISM_CSS_PATH = os.path.join(os.path.dirname(__file__), "prism-vsc-dark-plus.min.css")
-
-
-def embed_prism_css(soup):
-    """Embed Prism VSCode theme CSS into the HTML head."""
-    if not os.path.exists(PRISM_CSS_PATH):
-        print(f"Warning: Prism VSCode CSS not found at {PRISM_CSS_PATH}")
-        return soup
-    with open(PRISM_CSS_PATH, "r", encoding="utf-8") as f:
-        css = f.read()
-    style_tag = soup.new_tag("style")
-    style_tag.string = css
-    head = soup.find("head")
-    if head:
-        head.append(style_tag)
-        print("✓ Embedded Prism VSCode CSS for PDF")
-    return soup
-
 
 def minimal_code_layout_css(soup):
     """Add minimal layout CSS for code blocks (no color overrides)."""
@@ -94,8 +76,7 @@ def process_html_for_pdf(html_file_path):
     # Remove Prism CDN links
     html_content = remove_prism_links(html_content)
     soup = BeautifulSoup(html_content, "html.parser")
-    # Embed Prism VSCode CSS
-    soup = embed_prism_css(soup)
+    # Colors come from the build-time Pygments CSS already embedded in the HTML
     # Add minimal layout CSS
     soup = minimal_code_layout_css(soup)
     # Remove highlight border
@@ -108,7 +89,7 @@ def process_html_for_pdf(html_file_path):
 
 def main():
     parser = argparse.ArgumentParser(
-        description="Fix code block styling for PDF generation (Prism VSCode theme)"
+        description="Fix code block styling for PDF generation"
     )
     parser.add_argument("html_file", help="HTML file to process")
     args = parser.parse_args()
@@ -1,5 +1,4 @@
 import sys
-from bs4 import BeautifulSoup
 
 if len(sys.argv) != 2:
     print("Usage: python fix-prism-codeblocks.py <html_file>")
@@ -8,7 +7,15 @@ if len(sys.argv) != 2:
 html_file = sys.argv[1]
 
 with open(html_file, "r", encoding="utf-8") as f:
-    soup = BeautifulSoup(f, "html.parser")
+    html_content = f.read()
+
+# Nothing to rewrite without Pandoc code blocks; skip importing bs4
+if "sourceCode" not in html_content:
+    sys.exit(0)
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+soup = BeautifulSoup(html_content, "html.parser")
 
 for div in soup.find_all("div", class_="sourceCode"):
     pre = div.find("pre")
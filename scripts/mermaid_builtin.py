@@ -0,0 +1,1284 @@
+#!/usr/bin/env python3
+"""
+Built-in Mermaid renderer
+Renders the diagram types the books use (flowchart/graph and sequenceDiagram)
+to plain SVG in pure Python: no Node, no browser and no foreignObject, so the
+output works in WeasyPrint and e-readers. PNG output needs cairosvg. Anything
+else is left to mermaid-cli (see mermaid_render.py)
+"""
+
+import sys
+import re
+import html
+import argparse
+
+try:
+    import cairosvg
+except (ImportError, OSError):
+    # OSError: the package is installed but the cairo library is not
+    cairosvg = None
+
+# Bumped whenever the output changes, so cached renders are invalidated
+RENDERER_VERSION = "1"
+
+SUPPORTED_TYPES = {"graph", "flowchart", "sequenceDiagram"}
+
+FONT_FAMILY = "'trebuchet ms', verdana, arial, sans-serif"
+FONT_SIZE = 14
+LINE_HEIGHT = 19
+MARGIN = 8
+
+NODE_FILL = "#ECECFF"
+NODE_STROKE = "#9370DB"
+TEXT_COLOR = "#333333"
+EDGE_COLOR = "#333333"
+CLUSTER_FILL = "#ffffde"
+CLUSTER_STROKE = "#aaaa33"
+LABEL_FILL = "#e8e8e8"
+NOTE_FILL = "#fff5ad"
+
+NODE_PAD_X = 15
+NODE_PAD_Y = 10
+NODE_SEP = 40
+DUMMY_SEP = 16
+RANK_SEP = 45
+CLUSTER_PAD = 16
+ARROW_SIZE = 8
+
+BR_RE = re.compile(r"<br\s*/?>", re.I)
+TAG_RE = re.compile(r"</?[a-z][^>]*>", re.I)
+ENTITY_CODE_RE = re.compile(r"#(\d+|[a-z]+);", re.I)
+
+
+def diagram_type(code):
+    """First keyword of the diagram source, skipping comments and front matter"""
+    for line in code.splitlines():
+        line = line.strip()
+        if not line or line.startswith("%%") or line == "---":
+            continue
+        return line.split()[0].rstrip(":;")
+    return None
+
+
+def supports(code):
+    return diagram_type(code) in SUPPORTED_TYPES
+
+
+def png_available():
+    return cairosvg is not None
+
+
+# --- Text ---------------------------------------------------------------------
+
+
+def label_lines(text):
+    """Mermaid label text -> list of plain lines"""
+    text = text.strip()
+    if len(text) >= 2 and text[0] == text[-1] == '"':
+        text = text[1:-1]
+    # Mermaid entity codes: #quot; #35;
+    text = ENTITY_CODE_RE.sub(
+        lambda m: f"&#{m.group(1)};" if m.group(1).isdigit() else f"&{m.group(1)};", text
+    )
+    lines = [html.unescape(TAG_RE.sub("", part)).strip() for part in BR_RE.split(text)]
+    return lines or [""]
+
+
+def char_width(c):
+    """Approximate advance of one character, in ems, for a sans-serif font"""
+    if c in "il.,:;'|!`":
+        return 0.28
+    if c in " fjtrI()[]{}/\\-\"":
+        return 0.36
+    if c in "mwMW@%":
+        return 0.88
+    if c.isupper() or c in "#&":
+        return 0.68
+    if ord(c) > 0x2E80:
+        return 1.0
+    return 0.55
+
+
+def text_width(line, size=FONT_SIZE):
+    return sum(char_width(c) for c in line) * size
+
+
+def text_size(lines, size=FONT_SIZE):
+    return max(text_width(line, size) for line in lines), len(lines) * LINE_HEIGHT
+
+
+def esc(value):
+    return html.escape(str(value), quote=True)
+
+
+def num(value):
+    return f"{value:.1f}".rstrip("0").rstrip(".")
+
+
+def svg_text(lines, cx, cy, color=TEXT_COLOR, anchor="middle", size=FONT_SIZE, weight=None):
+    """Centered multi-line text; baselines are computed, not left to the renderer"""
+    first = cy - (len(lines) - 1) * LINE_HEIGHT / 2 + size * 0.35
+    attrs = f'text-anchor="{anchor}" fill="{esc(color)}" font-size="{size}"'
+    if weight:
+        attrs += f' font-weight="{weight}"'
+    spans = "".join(
+        f'<tspan x="{num(cx)}" y="{num(first + i * LINE_HEIGHT)}">{esc(line)}</tspan>'
+        for i, line in enumerate(lines)
+    )
+    return f"<text {attrs}>{spans}</text>"
+
+
+def svg_document(width, height, body):
+    width, height = width + 2 * MARGIN, height + 2 * MARGIN
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{num(width)}" height="{num(height)}" '
+        f'viewBox="{num(-MARGIN)} {num(-MARGIN)} {num(width)} {num(height)}" '
+        f'font-family="{esc(FONT_FAMILY)}" font-size="{FONT_SIZE}" style="max-width: 100%; height: auto">'
+        + "".join(body)
+        + "</svg>\n"
+    )
+
+
+def arrowhead(tip, tail, kind, color=EDGE_COLOR):
+    """Arrowhead at tip, pointing away from tail (drawn as shapes, no markers)"""
+    dx, dy = tip[0] - tail[0], tip[1] - tail[1]
+    length = (dx * dx + dy * dy) ** 0.5 or 1
+    ux, uy = dx / length, dy / length
+    bx, by = tip[0] - ux * ARROW_SIZE, tip[1] - uy * ARROW_SIZE
+    px, py = -uy * ARROW_SIZE / 2, ux * ARROW_SIZE / 2
+    if kind == "arrow":
+        points = f"{num(tip[0])},{num(tip[1])} {num(bx + px)},{num(by + py)} {num(bx - px)},{num(by - py)}"
+        return f'<polygon points="{points}" fill="{color}"/>'
+    if kind == "open":
+        return (
+            f'<path d="M{num(bx + px)},{num(by + py)} L{num(tip[0])},{num(tip[1])} '
+            f'L{num(bx - px)},{num(by - py)}" fill="none" stroke="{color}" stroke-width="1.5"/>'
+        )
+    if kind == "circle":
+        return (
+            f'<circle cx="{num(tip[0] - ux * 4)}" cy="{num(tip[1] - uy * 4)}" r="4" '
+            f'fill="white" stroke="{color}" stroke-width="1.5"/>'
+        )
+    if kind == "cross":
+        cx, cy = tip[0] - ux * 5, tip[1] - uy * 5
+        return (
+            f'<path d="M{num(cx - 4)},{num(cy - 4)} L{num(cx + 4)},{num(cy + 4)} '
+            f'M{num(cx - 4)},{num(cy + 4)} L{num(cx + 4)},{num(cy - 4)}" '
+            f'stroke="{color}" stroke-width="2"/>'
+        )
+    return ""
+
+
+def split_statements(code):
+    """Source lines split at top-level ';', with comments and blank lines dropped"""
+    statements = []
+    for raw in code.splitlines():
+        if raw.strip().startswith("%%"):
+            continue
+        current, quote, depth = [], False, 0
+        for c in raw:
+            if c == '"':
+                quote = not quote
+            elif not quote and c in "[({":
+                depth += 1
+            elif not quote and c in "])}":
+                depth = max(depth - 1, 0)
+            if c == ";" and not quote and depth == 0:
+                statements.append("".join(current).strip())
+                current = []
+                continue
+            current.append(c)
+        statements.append("".join(current).strip())
+    return [s for s in statements if s]
+
+
+def parse_style(spec):
+    """'fill:#f99,stroke:#c00' -> {'fill': '#f99', 'stroke': '#c00'}"""
+    style = {}
+    for part in spec.split(","):
+        if ":" in part:
+            key, value = part.split(":", 1)
+            style[key.strip()] = value.strip().rstrip(";")
+    return style
+
+
+# --- Flowcharts ---------------------------------------------------------------
+
+# Longest openers first, so "([" is not read as "("
+SHAPES = [
+    ("(((", ")))", "doublecircle"),
+    ("((", "))", "circle"),
+    ("([", "])", "stadium"),
+    ("[[", "]]", "subroutine"),
+    ("[(", ")]", "cylinder"),
+    ("{{", "}}", "hexagon"),
+    ("[/", "/]", "parallelogram"),
+    ("[\\", "\\]", "parallelogram"),
+    ("[/", "\\]", "trapezoid"),
+    ("[", "]", "rect"),
+    ("(", ")", "round"),
+    ("{", "}", "diamond"),
+    (">", "]", "flag"),
+]
+
+NODE_ID_RE = re.compile(r"\w+(?:[.-]\w+)*")
+LINK_TEXT_RE = re.compile(
+    r"(?P<start><)?(?P<open>--|==|-\.)\s+(?P<text>\"[^\"]*\"|[^\"]*?)\s+"
+    r"(?P<close>-{2,}[>xo]|={2,}[>xo]|\.-+[>xo]|-{3,}|={3,}|\.-+)"
+)
+LINK_RE = re.compile(
+    r"(?P<start><|x|o)?(?P<body>-{2,}|={2,}|-\.+-)(?P<end>>|[xo](?!\w))?"
+    r"(?:\s*\|(?P<text>\"[^\"]*\"|[^|]*)\|)?"
+)
+HEAD_KINDS = {">": "arrow", "<": "arrow", "x": "cross", "o": "circle"}
+
+
+class FlowNode:
+    def __init__(self, node_id):
+        self.id = node_id
+        self.lines = [node_id]
+        self.shape = "rect"
+        self.defined = False
+        self.cluster = None
+        self.classes = []
+        self.style = {}
+        self.width = self.height = 0
+        self.x = self.y = 0
+
+
+class Cluster:
+    def __init__(self, cluster_id, title, parent):
+        self.id = cluster_id
+        self.lines = label_lines(title) if title else [""]
+        self.parent = parent
+        self.direction = None
+        self.items = []
+        self.style = {}
+        self.width = self.height = 0
+        self.x = self.y = 0
+
+
+class Flowchart:
+    def __init__(self, direction):
+        self.direction = direction
+        self.nodes = {}
+        self.root = Cluster(None, "", None)
+        self.clusters = {}
+        self.edges = []
+        self.class_defs = {}
+
+    def node(self, node_id, cluster):
+        node = self.nodes.get(node_id)
+        if node is None:
+            node = self.nodes[node_id] = FlowNode(node_id)
+        # Like Mermaid, a node belongs to the first subgraph it is mentioned in
+        if node.cluster is None and cluster is not self.root:
+            node.cluster = cluster
+        return node
+
+
+def _scan_label(text, pos, close):
+    """Read a label up to the closing delimiter; returns (label, end)"""
+    if text.startswith('"', pos):
+        end_quote = text.find('"', pos + 1)
+        if end_quote != -1 and text.startswith(close, end_quote + 1):
+            return text[pos:end_quote + 1], end_quote + 1 + len(close)
+    end = text.find(close, pos)
+    if end == -1:
+        raise ValueError(f"Unclosed node label: {text[pos - 1:]}")
+    return text[pos:end], end + len(close)
+
+
+def _parse_node(chart, text, pos, cluster):
+    match = NODE_ID_RE.match(text, pos)
+    if not match:
+        raise ValueError(f"Expected a node at: {text[pos:]}")
+    node = chart.node(match.group(0), cluster)
+    pos = match.end()
+    for opener, close, shape in SHAPES:
+        if text.startswith(opener, pos):
+            try:
+                label, end = _scan_label(text, pos + len(opener), close)
+            except ValueError:
+                continue
+            node.lines = label_lines(label)
+            node.shape = shape
+            node.defined = True
+            pos = end
+            break
+    if text.startswith(":::", pos):
+        match = re.compile(r":::([\w-]+)").match(text, pos)
+        node.classes.append(match.group(1))
+        pos = match.end()
+    return node, pos
+
+
+def _parse_group(chart, text, pos, cluster):
+    """Nodes joined with '&'"""
+    nodes = []
+    while True:
+        pos = _skip_space(text, pos)
+        node, pos = _parse_node(chart, text, pos, cluster)
+        nodes.append(node)
+        after = _skip_space(text, pos)
+        if text.startswith("&", after):
+            pos = after + 1
+            continue
+        return nodes, pos
+
+
+def _skip_space(text, pos):
+    while pos < len(text) and text[pos].isspace():
+        pos += 1
+    return pos
+
+
+def _parse_link(text, pos):
+    pos = _skip_space(text, pos)
+    match = LINK_TEXT_RE.match(text, pos)
+    if match:
+        close = match.group("close")
+        body = match.group("open") + close
+        end = close[-1] if close[-1] in ">xo" else None
+        label = match.group("text")
+    else:
+        match = LINK_RE.match(text, pos)
+        if not match:
+            raise ValueError(f"Expected a link at: {text[pos:]}")
+        body = match.group("body")
+        end = match.group("end")
+        label = match.group("text")
+    start = match.group("start")
+    link = {
+        "dashed": "." in body,
+        "thick": "=" in body,
+        "head": HEAD_KINDS.get(end),
+        "tail": HEAD_KINDS.get(start),
+        "lines": label_lines(label) if label and label.strip() else None,
+    }
+    return link, match.end()
+
+
+def parse_flowchart(code):
+    statements = split_statements(code)
+    header = statements[0].split()
+    direction = header[1].upper() if len(header) > 1 else "TB"
+    chart = Flowchart("TB" if direction == "TD" else direction)
+    stack = [chart.root]
+    styles = []
+
+    for statement in statements[1:]:
+        keyword = statement.split()[0]
+        rest = statement[len(keyword):].strip()
+
+        if keyword == "subgraph":
+            match = re.match(r'^([\w.-]+)\s*\[(.*)\]$', rest)
+            if match:
+                cluster_id, title = match.group(1), match.group(2)
+            else:
+                cluster_id = title = rest.strip('"')
+            cluster = Cluster(cluster_id, title, stack[-1])
+            chart.clusters[cluster_id] = cluster
+            stack[-1].items.append(cluster)
+            stack.append(cluster)
+        elif keyword == "end" and not rest:
+            if len(stack) > 1:
+                stack.pop()
+        elif keyword == "direction":
+            stack[-1].direction = "TB" if rest.upper() == "TD" else rest.upper()
+        elif keyword == "style":
+            target, _, spec = rest.partition(" ")
+            styles.append((target, parse_style(spec)))
+        elif keyword == "classDef":
+            names, _, spec = rest.partition(" ")
+            for name in names.split(","):
+                chart.class_defs[name] = parse_style(spec)
+        elif keyword == "class":
+            targets, _, name = rest.rpartition(" ")
+            for target in targets.split(","):
+                chart.node(target.strip(), stack[-1]).classes.append(name.strip())
+        elif keyword in ("linkStyle", "click", "accTitle", "accDescr", "title"):
+            continue
+        else:
+            sources, pos = _parse_group(chart, statement, 0, stack[-1])
+            while _skip_space(statement, pos) < len(statement):
+                link, pos = _parse_link(statement, pos)
+                targets, pos = _parse_group(chart, statement, pos, stack[-1])
+                for source in sources:
+                    for target in targets:
+                        chart.edges.append(dict(link, src=source.id, dst=target.id))
+                sources = targets
+
+    # Ids that name a subgraph are edge endpoints on the subgraph's box
+    for cluster_id in chart.clusters:
+        node = chart.nodes.get(cluster_id)
+        if node is not None and not node.defined:
+            del chart.nodes[cluster_id]
+
+    for node in chart.nodes.values():
+        (node.cluster or chart.root).items.append(node)
+    for target, style in styles:
+        owner = chart.nodes.get(target) or chart.clusters.get(target)
+        if owner is not None:
+            owner.style.update(style)
+    return chart
+
+
+def _node_size(node):
+    width, height = text_size(node.lines)
+    width += 2 * NODE_PAD_X
+    height += 2 * NODE_PAD_Y
+    if node.shape in ("circle", "doublecircle"):
+        width = height = max(width, height) + (8 if node.shape == "doublecircle" else 0)
+    elif node.shape == "diamond":
+        width, height = width * 1.3 + 10, height * 1.8
+    elif node.shape in ("hexagon", "parallelogram", "trapezoid", "flag"):
+        width += height / 2
+    elif node.shape == "cylinder":
+        height += 16
+    elif node.shape == "subroutine":
+        width += 16
+    node.width, node.height = width, height
+
+
+def _isotonic(values):
+    """Pool-adjacent-violators: closest non-decreasing sequence (least squares)"""
+    blocks = []
+    for value in values:
+        blocks.append([value, 1])
+        while len(blocks) > 1 and blocks[-2][0] > blocks[-1][0]:
+            value, count = blocks.pop()
+            prev = blocks[-1]
+            prev[0] = (prev[0] * prev[1] + value * count) / (prev[1] + count)
+            prev[1] += count
+    out = []
+    for value, count in blocks:
+        out.extend([value] * count)
+    return out
+
+
+def _place(layer, desired, size, seps):
+    """Closest positions to desired that keep the layer's order and spacing"""
+    offsets, offset = [], 0
+    for i, item in enumerate(layer):
+        if i:
+            offset += (size[layer[i - 1]] + size[item]) / 2 + seps[i - 1]
+        offsets.append(offset)
+    fitted = _isotonic([desired[item] - offsets[i] for i, item in enumerate(layer)])
+    return {item: fitted[i] + offsets[i] for i, item in enumerate(layer)}
+
+
+class _Layout:
+    """Layered (Sugiyama-style) layout of one graph level"""
+
+    def __init__(self, items, edges, direction):
+        self.items = items
+        self.edges = edges
+        self.horizontal = direction in ("LR", "RL")
+        self.direction = direction
+
+    def main_size(self, item):
+        return item.width if self.horizontal else item.height
+
+    def cross_size(self, item):
+        return item.height if self.horizontal else item.width
+
+    def rank(self):
+        index = {id(item): i for i, item in enumerate(self.items)}
+        succ = {i: [] for i in range(len(self.items))}
+        for edge in self.edges:
+            succ[index[id(edge["a"])]].append(index[id(edge["b"])])
+
+        # Depth-first search; back edges are reversed to break cycles
+        state, reversed_edges = {}, set()
+
+        def visit(start):
+            stack = [(start, iter(succ[start]))]
+            state[start] = 1
+            while stack:
+                v, children = stack[-1]
+                for w in children:
+                    if state.get(w) == 1:
+                        reversed_edges.add((v, w))
+                    elif w not in state:
+                        state[w] = 1
+                        stack.append((w, iter(succ[w])))
+                        break
+                else:
+                    state[v] = 2
+                    stack.pop()
+
+        for v in range(len(self.items)):
+            if v not in state:
+                visit(v)
+
+        dag = []
+        for edge in self.edges:
+            a, b = index[id(edge["a"])], index[id(edge["b"])]
+            if a == b:
+                continue
+            if (a, b) in reversed_edges:
+                edge["reversed"] = True
+                a, b = b, a
+            dag.append((a, b, edge))
+
+        length = {}
+        preds = {v: [] for v in range(len(self.items))}
+        succs = {v: [] for v in range(len(self.items))}
+        for a, b, edge in dag:
+            preds[b].append(a)
+            succs[a].append(b)
+            # Labelled edges span two ranks, so the label gets a slot of its own
+            length[a, b] = max(length.get((a, b), 1), 2 if edge.get("label_size") else 1)
+
+        rank = {}
+        order = self._topological(preds, succs)
+        for v in order:
+            rank[v] = max((rank[u] + length[u, v] for u in preds[v]), default=0)
+        # Sources sit right above their first successor rather than at the top
+        for v in reversed(order):
+            if not preds[v] and succs[v]:
+                rank[v] = min(rank[w] - length[v, w] for w in succs[v])
+        lowest = min(rank.values())
+        return {v: r - lowest for v, r in rank.items()}, dag
+
+    @staticmethod
+    def _topological(preds, succs):
+        remaining = {v: len(p) for v, p in preds.items()}
+        queue = [v for v in sorted(preds) if remaining[v] == 0]
+        order = []
+        while queue:
+            v = queue.pop(0)
+            order.append(v)
+            for w in succs[v]:
+                remaining[w] -= 1
+                if remaining[w] == 0:
+                    queue.append(w)
+        return order
+
+    def run(self):
+        """Assign item.x/.y (centers, relative to the level's top-left) and
+        return the level's (width, height); edges get their bend points"""
+        if not self.items:
+            return 0, 0
+        rank, dag = self.rank()
+        for item in self.items:
+            item.points = None
+
+        # Long edges get one dummy per rank they pass through
+        nodes = {v: {"item": item, "cross": self.cross_size(item), "main": self.main_size(item)}
+                 for v, item in enumerate(self.items)}
+        links = []
+        next_id = len(self.items)
+        for a, b, edge in dag:
+            chain = [a]
+            label = edge.get("label_size")
+            for r in range(rank[a] + 1, rank[b]):
+                dummy = {"item": None, "cross": 0, "main": 0}
+                if label and r == rank[a] + 1:
+                    dummy["cross"], dummy["main"] = (label[1], label[0]) if self.horizontal else label
+                    edge["label_dummy"] = next_id
+                nodes[next_id] = dummy
+                rank[next_id] = r
+                chain.append(next_id)
+                next_id += 1
+            chain.append(b)
+            edge["chain"] = chain
+            links.extend(zip(chain, chain[1:]))
+
+        max_rank = max(rank.values())
+        layers = [[] for _ in range(max_rank + 1)]
+        for v in sorted(nodes):
+            layers[rank[v]].append(v)
+        up = {v: [] for v in nodes}
+        down = {v: [] for v in nodes}
+        for a, b in links:
+            down[a].append(b)
+            up[b].append(a)
+
+        # Barycenter ordering sweeps
+        pos = {v: i for layer in layers for i, v in enumerate(layer)}
+        for sweep in range(8):
+            sequence = layers[1:] if sweep % 2 == 0 else layers[-2::-1]
+            neighbours = up if sweep % 2 == 0 else down
+            for layer in sequence:
+                def key(v):
+                    linked = neighbours[v]
+                    return sum(pos[u] for u in linked) / len(linked) if linked else pos[v]
+                layer.sort(key=key)
+                for i, v in enumerate(layer):
+                    pos[v] = i
+
+        # Cross-axis coordinates: pack, then pull towards neighbours
+        size = {v: node["cross"] for v, node in nodes.items()}
+
+        def seps(layer):
+            return [
+                NODE_SEP if nodes[a]["item"] is not None and nodes[b]["item"] is not None else DUMMY_SEP
+                for a, b in zip(layer, layer[1:])
+            ]
+
+        cross = {}
+        for layer in layers:
+            cross.update(_place(layer, {v: 0 for v in layer}, size, seps(layer)))
+        for sweep in range(12):
+            downward = sweep % 2 == 0
+            sequence = layers[1:] if downward else layers[-2::-1]
+            for layer in sequence:
+                desired = {}
+                for v in layer:
+                    linked = (up if downward else down)[v]
+                    if sweep >= 8:
+                        linked = up[v] + down[v]
+                    desired[v] = sum(cross[u] for u in linked) / len(linked) if linked else cross[v]
+                cross.update(_place(layer, desired, size, seps(layer)))
+
+        low = min(cross[v] - size[v] / 2 for v in nodes)
+        high = max(cross[v] + size[v] / 2 for v in nodes)
+
+        # Main-axis coordinates: layer bands separated by RANK_SEP, halved next
+        # to layers that only hold edge bends and labels
+        band = [max(nodes[v]["main"] for v in layer) for layer in layers]
+        real = [any(nodes[v]["item"] is not None for v in layer) for layer in layers]
+        gap = [
+            RANK_SEP if real[r] and real[r + 1] else RANK_SEP / 2
+            for r in range(max_rank)
+        ] + [0]
+        main_at, offset = [], 0
+        for r in range(max_rank + 1):
+            main_at.append(offset + band[r] / 2)
+            offset += band[r] + gap[r]
+        length = offset - gap[-1]
+
+        width, height = (length, high - low) if self.horizontal else (high - low, length)
+
+        def to_xy(v):
+            c, m = cross[v] - low, main_at[rank[v]]
+            if self.direction == "BT":
+                m = length - m
+            elif self.direction == "RL":
+                m = length - m
+            return (m, c) if self.horizontal else (c, m)
+
+        for v, node in nodes.items():
+            if node["item"] is not None:
+                node["item"].x, node["item"].y = to_xy(v)
+        for _a, _b, edge in dag:
+            edge["bends"] = [to_xy(v) for v in edge["chain"][1:-1]]
+            if "label_dummy" in edge:
+                edge["label_at"] = to_xy(edge["label_dummy"])
+        return width, height
+
+
+def _ancestors(chart, owner):
+    """Chain of clusters from the root down to the owner's parent"""
+    chain = []
+    cluster = owner.parent if isinstance(owner, Cluster) else (owner.cluster or chart.root)
+    while cluster is not None:
+        chain.append(cluster)
+        cluster = cluster.parent
+    return chain[::-1]
+
+
+def _endpoint(chart, ref):
+    return chart.nodes.get(ref) or chart.clusters.get(ref)
+
+
+def _level_items(chart, cluster, edge):
+    """The items of this cluster that contain each endpoint of the edge, if any"""
+    found = []
+    for ref in (edge["src"], edge["dst"]):
+        owner = _endpoint(chart, ref)
+        path = _ancestors(chart, owner) + [owner]
+        if cluster not in path or path[-1] is cluster:
+            return None
+        found.append(path[path.index(cluster) + 1])
+    return found
+
+
+def _layout_cluster(chart, cluster, direction, edges):
+    direction = cluster.direction or direction
+    for item in cluster.items:
+        if isinstance(item, Cluster):
+            _layout_cluster(chart, item, direction, edges)
+        else:
+            _node_size(item)
+
+    level_edges = []
+    for edge in edges:
+        items = _level_items(chart, cluster, edge)
+        if items and items[0] is not items[1]:
+            edge["a"], edge["b"] = items
+            edge["level"] = cluster
+            level_edges.append(edge)
+
+    width, height = _Layout(cluster.items, level_edges, direction).run()
+    if cluster is chart.root:
+        cluster.width, cluster.height = width, height
+        cluster.offset = (0, 0)
+        return
+    title_width, title_height = text_size(cluster.lines)
+    top = title_height + 8 if cluster.lines != [""] else CLUSTER_PAD
+    inner_width = max(width, title_width)
+    cluster.offset = (CLUSTER_PAD + (inner_width - width) / 2, top)
+    cluster.width = inner_width + 2 * CLUSTER_PAD
+    cluster.height = height + top + CLUSTER_PAD
+
+
+def _absolute(cluster, origin_x, origin_y):
+    """Turn level-relative centers into absolute coordinates"""
+    base_x, base_y = origin_x + cluster.offset[0], origin_y + cluster.offset[1]
+    cluster.origin = (base_x, base_y)
+    for item in cluster.items:
+        item.x += base_x
+        item.y += base_y
+        if isinstance(item, Cluster):
+            _absolute(item, item.x - item.width / 2, item.y - item.height / 2)
+
+
+def _clip(shape_item, inside, outside):
+    """Point where the segment from the item's center towards outside leaves it"""
+    cx, cy = inside
+    dx, dy = outside[0] - cx, outside[1] - cy
+    if dx == 0 and dy == 0:
+        return inside
+    hw, hh = shape_item.width / 2, shape_item.height / 2
+    shape = getattr(shape_item, "shape", "rect")
+    if shape in ("circle", "doublecircle"):
+        t = hw / (dx * dx + dy * dy) ** 0.5
+    elif shape == "diamond":
+        t = 1 / (abs(dx) / hw + abs(dy) / hh)
+    else:
+        t = min(hw / abs(dx) if dx else float("inf"), hh / abs(dy) if dy else float("inf"))
+    t = min(t, 1)
+    return cx + dx * t, cy + dy * t
+
+
+def _curve(points):
+    """Smooth path through the points (Catmull-Rom as cubic Beziers)"""
+    path = f"M{num(points[0][0])},{num(points[0][1])}"
+    if len(points) == 2:
+        return path + f" L{num(points[1][0])},{num(points[1][1])}"
+    for i in range(len(points) - 1):
+        p0 = points[i - 1] if i else points[i]
+        p1, p2 = points[i], points[i + 1]
+        p3 = points[i + 2] if i + 2 < len(points) else p2
+        c1 = (p1[0] + (p2[0] - p0[0]) / 6, p1[1] + (p2[1] - p0[1]) / 6)
+        c2 = (p2[0] - (p3[0] - p1[0]) / 6, p2[1] - (p3[1] - p1[1]) / 6)
+        path += (
+            f" C{num(c1[0])},{num(c1[1])} {num(c2[0])},{num(c2[1])} {num(p2[0])},{num(p2[1])}"
+        )
+    return path
+
+
+def _item_style(chart, item):
+    style = dict(chart.class_defs.get("default", {})) if isinstance(item, FlowNode) else {}
+    for name in getattr(item, "classes", []):
+        style.update(chart.class_defs.get(name, {}))
+    style.update(item.style)
+    return style
+
+
+def _shape_attrs(style, fill, stroke):
+    attrs = (
+        f'fill="{esc(style.get("fill", fill))}" stroke="{esc(style.get("stroke", stroke))}" '
+        f'stroke-width="{esc(style.get("stroke-width", "1").replace("px", ""))}"'
+    )
+    if "stroke-dasharray" in style:
+        attrs += f' stroke-dasharray="{esc(style["stroke-dasharray"])}"'
+    return attrs
+
+
+def _draw_node(chart, node):
+    style = _item_style(chart, node)
+    attrs = _shape_attrs(style, NODE_FILL, NODE_STROKE)
+    x, y, w, h = node.x - node.width / 2, node.y - node.height / 2, node.width, node.height
+    shape = node.shape
+    parts = []
+    if shape in ("circle", "doublecircle"):
+        parts.append(f'<circle cx="{num(node.x)}" cy="{num(node.y)}" r="{num(w / 2)}" {attrs}/>')
+        if shape == "doublecircle":
+            parts.append(f'<circle cx="{num(node.x)}" cy="{num(node.y)}" r="{num(w / 2 - 4)}" {attrs}/>')
+    elif shape == "diamond":
+        points = [(node.x, y), (x + w, node.y), (node.x, y + h), (x, node.y)]
+        parts.append(_polygon(points, attrs))
+    elif shape == "hexagon":
+        inset = h / 4
+        points = [(x + inset, y), (x + w - inset, y), (x + w, node.y),
+                  (x + w - inset, y + h), (x + inset, y + h), (x, node.y)]
+        parts.append(_polygon(points, attrs))
+    elif shape == "parallelogram":
+        skew = h / 4
+        parts.append(_polygon([(x + skew, y), (x + w, y), (x + w - skew, y + h), (x, y + h)], attrs))
+    elif shape == "trapezoid":
+        skew = h / 4
+        parts.append(_polygon([(x + skew, y), (x + w - skew, y), (x + w, y + h), (x, y + h)], attrs))
+    elif shape == "flag":
+        notch = h / 4
+        parts.append(_polygon([(x, y), (x + w, y), (x + w, y + h), (x, y + h), (x + notch, node.y)], attrs))
+    elif shape == "cylinder":
+        ry = 7
+        parts.append(
+            f'<path d="M{num(x)},{num(y + ry)} a{num(w / 2)},{ry} 0 0,0 {num(w)},0 '
+            f'a{num(w / 2)},{ry} 0 0,0 {num(-w)},0 l0,{num(h - 2 * ry)} '
+            f'a{num(w / 2)},{ry} 0 0,0 {num(w)},0 l0,{num(-(h - 2 * ry))}" {attrs}/>'
+        )
+    else:
+        radius = {"round": 5, "stadium": h / 2}.get(shape, 0)
+        parts.append(
+            f'<rect x="{num(x)}" y="{num(y)}" width="{num(w)}" height="{num(h)}" '
+            f'rx="{num(radius)}" {attrs}/>'
+        )
+        if shape == "subroutine":
+            parts.append(
+                f'<path d="M{num(x + 8)},{num(y)} l0,{num(h)} M{num(x + w - 8)},{num(y)} l0,{num(h)}" '
+                f'stroke="{esc(style.get("stroke", NODE_STROKE))}"/>'
+            )
+    text_y = node.y + (4 if shape == "cylinder" else 0)
+    parts.append(svg_text(node.lines, node.x, text_y, style.get("color", TEXT_COLOR)))
+    return "".join(parts)
+
+
+def _polygon(points, attrs):
+    coords = " ".join(f"{num(px)},{num(py)}" for px, py in points)
+    return f'<polygon points="{coords}" {attrs}/>'
+
+
+def _draw_cluster(chart, cluster):
+    style = _item_style(chart, cluster)
+    x, y = cluster.x - cluster.width / 2, cluster.y - cluster.height / 2
+    parts = [
+        f'<rect x="{num(x)}" y="{num(y)}" width="{num(cluster.width)}" height="{num(cluster.height)}" '
+        f'{_shape_attrs(style, CLUSTER_FILL, CLUSTER_STROKE)}/>'
+    ]
+    if cluster.lines != [""]:
+        _, title_height = text_size(cluster.lines)
+        parts.append(svg_text(cluster.lines, cluster.x, y + 4 + title_height / 2, style.get("color", TEXT_COLOR)))
+    for item in cluster.items:
+        if isinstance(item, Cluster):
+            parts.append(_draw_cluster(chart, item))
+    return "".join(parts)
+
+
+def _draw_edge(chart, edge):
+    source, target = _endpoint(chart, edge["src"]), _endpoint(chart, edge["dst"])
+    bends = list(edge.get("bends", []))
+    if edge.get("reversed"):
+        bends.reverse()
+    parts = []
+    color = EDGE_COLOR
+    stroke = 3.5 if edge["thick"] else 1.5
+    dash = ' stroke-dasharray="3 3"' if edge["dashed"] else ""
+
+    if source is target:
+        # Self loop on the right-hand side
+        x, y = source.x + source.width / 2, source.y
+        points = [(x, y - 8), (x + 20, y - 14), (x + 20, y + 14), (x, y + 8)]
+        label_at = (x + 20, y)
+    else:
+        start = (source.x, source.y)
+        end = (target.x, target.y)
+        first = bends[0] if bends else end
+        last = bends[-1] if bends else start
+        points = [_clip(source, start, first)] + bends + [_clip(target, end, last)]
+        label_at = edge.get("label_at")
+        if label_at is None:
+            middle = len(points) // 2
+            a, b = points[middle - 1], points[middle]
+            label_at = ((a[0] + b[0]) / 2, (a[1] + b[1]) / 2)
+
+    # Leave room for the arrowheads
+    if edge["head"] == "arrow":
+        points[-1] = _shorten(points[-1], points[-2], 2)
+    if edge["tail"] == "arrow":
+        points[0] = _shorten(points[0], points[1], 2)
+    parts.append(
+        f'<path d="{_curve(points)}" fill="none" stroke="{color}" stroke-width="{stroke}"{dash}/>'
+    )
+    if edge["head"]:
+        parts.append(arrowhead(points[-1], points[-2], edge["head"], color))
+    if edge["tail"]:
+        parts.append(arrowhead(points[0], points[1], edge["tail"], color))
+
+    label = ""
+    if edge["lines"]:
+        width, height = edge["label_size"]
+        label = (
+            f'<rect x="{num(label_at[0] - width / 2)}" y="{num(label_at[1] - height / 2)}" '
+            f'width="{num(width)}" height="{num(height)}" fill="{LABEL_FILL}" opacity="0.9"/>'
+            + svg_text(edge["lines"], label_at[0], label_at[1])
+        )
+    return "".join(parts), label
+
+
+def _shorten(point, towards, amount):
+    dx, dy = towards[0] - point[0], towards[1] - point[1]
+    length = (dx * dx + dy * dy) ** 0.5
+    if length <= amount:
+        return point
+    return point[0] + dx / length * amount, point[1] + dy / length * amount
+
+
+def render_flowchart(code):
+    chart = parse_flowchart(code)
+    for edge in chart.edges:
+        if edge["lines"]:
+            width, height = text_size(edge["lines"])
+            edge["label_size"] = (width + 8, height + 4)
+    _layout_cluster(chart, chart.root, chart.direction, chart.edges)
+    _absolute(chart.root, 0, 0)
+    for edge in chart.edges:
+        if "level" in edge:
+            dx, dy = edge["level"].origin
+            edge["bends"] = [(x + dx, y + dy) for x, y in edge["bends"]]
+            if "label_at" in edge:
+                edge["label_at"] = (edge["label_at"][0] + dx, edge["label_at"][1] + dy)
+
+    body = []
+    for item in chart.root.items:
+        if isinstance(item, Cluster):
+            body.append(_draw_cluster(chart, item))
+    labels = []
+    for edge in chart.edges:
+        path, label = _draw_edge(chart, edge)
+        body.append(path)
+        labels.append(label)
+    body.extend(labels)
+    body.extend(_draw_node(chart, node) for node in chart.nodes.values())
+
+    width, height = chart.root.width, chart.root.height
+    # Self loops and labels can stick out of the laid-out area
+    if any(edge["src"] == edge["dst"] for edge in chart.edges):
+        width += 30
+    return svg_document(width, height, body)
+
+
+# --- Sequence diagrams --------------------------------------------------------
+
+PARTICIPANT_RE = re.compile(r"^(participant|actor)\s+(.+?)(?:\s+as\s+(.+))?$")
+MESSAGE_RE = re.compile(
+    r"^(?P<a>[^\s:][^:]*?)\s*(?P<arrow>-->>|->>|--x|-x|--\)|-\)|-->|->)\s*"
+    r"(?P<activation>[+-]?)\s*(?P<b>[^:]+?)\s*(?::\s*(?P<text>.*))?$"
+)
+NOTE_RE = re.compile(r"^note\s+(left of|right of|over)\s+([^:]+?)\s*:\s*(.*)$", re.I)
+BLOCK_OPEN = {"alt", "opt", "loop", "par", "critical", "break", "rect"}
+BLOCK_SECTION = {"else", "and", "option"}
+ACTOR_NAME_RE = re.compile(r"^([\w.-]+)\s*[\[(]+(.*?)[\])]+$")
+
+ACTOR_MIN_WIDTH = 110
+ACTOR_GAP = 40
+MESSAGE_GAP = 14
+
+
+class Participant:
+    def __init__(self, name, label):
+        self.name = name
+        self.lines = label_lines(label)
+        width, height = text_size(self.lines)
+        self.width = max(width + 2 * NODE_PAD_X, ACTOR_MIN_WIDTH)
+        self.height = max(height + 2 * NODE_PAD_Y, 40)
+        self.x = 0
+
+
+def parse_sequence(code):
+    participants = {}
+    order = []
+    events = []
+
+    def participant(name, label=None):
+        name = name.strip()
+        if name not in participants:
+            participants[name] = Participant(name, label or name)
+            order.append(name)
+        return participants[name]
+
+    for statement in split_statements(code)[1:]:
+        lower = statement.lower()
+        keyword = statement.split()[0]
+        match = PARTICIPANT_RE.match(statement)
+        if match:
+            name, alias = match.group(2).strip(), match.group(3)
+            bracketed = ACTOR_NAME_RE.match(name)
+            if bracketed and not alias:
+                name, alias = bracketed.group(1), bracketed.group(2)
+            participant(name, alias.strip().strip('"') if alias else name)
+            continue
+        match = NOTE_RE.match(statement)
+        if match:
+            names = [participant(name).name for name in match.group(2).split(",")]
+            events.append(("note", match.group(1).lower(), names, label_lines(match.group(3))))
+            continue
+        if keyword in BLOCK_OPEN:
+            events.append(("open", keyword, label_lines(statement[len(keyword):])))
+            continue
+        if keyword in BLOCK_SECTION:
+            events.append(("section", keyword, label_lines(statement[len(keyword):])))
+            continue
+        if lower == "end":
+            events.append(("close",))
+            continue
+        if keyword in ("autonumber",):
+            events.append(("autonumber",))
+            continue
+        if keyword in ("activate", "deactivate", "title", "accTitle", "accDescr", "box"):
+            continue
+        match = MESSAGE_RE.match(statement)
+        if not match:
+            raise ValueError(f"Unsupported sequence diagram statement: {statement}")
+        arrow = match.group("arrow")
+        source = participant(match.group("a").lstrip("+-"))
+        target = participant(match.group("b").lstrip("+-"))
+        head = {">>": "arrow", "x": "cross", ")": "open"}.get(arrow.lstrip("-"))
+        events.append(
+            ("message", source.name, target.name, label_lines(match.group("text") or ""),
+             arrow.startswith("--"), head)
+        )
+    return [participants[name] for name in order], events
+
+
+def render_sequence(code):
+    participants, events = parse_sequence(code)
+    if not participants:
+        raise ValueError("Sequence diagram has no participants")
+    index = {p.name: i for i, p in enumerate(participants)}
+    count = len(participants)
+
+    # Gaps between neighbouring lifelines grow to fit the labels between them
+    gaps = [(participants[i].width + participants[i + 1].width) / 2 + ACTOR_GAP for i in range(count - 1)]
+    right_extra = 0
+    spans = []
+    for event in events:
+        if event[0] == "message":
+            a, b = sorted((index[event[1]], index[event[2]]))
+            width = max(text_width(line) for line in event[3]) + 30
+            if a == b:
+                if a < count - 1:
+                    spans.append((a, a + 1, width + 30))
+                else:
+                    right_extra = max(right_extra, width + 30 - participants[a].width / 2)
+            else:
+                spans.append((a, b, width))
+        elif event[0] == "note":
+            width = max(text_width(line) for line in event[3]) + 2 * NODE_PAD_X
+            positions = [index[name] for name in event[2]]
+            a, b = min(positions), max(positions)
+            if event[1] == "right of":
+                if a < count - 1:
+                    spans.append((a, a + 1, width + 30))
+                else:
+                    right_extra = max(right_extra, width + 20 - participants[a].width / 2)
+            elif event[1] == "left of":
+                if a > 0:
+                    spans.append((a - 1, a, width + 30))
+            elif a != b:
+                spans.append((a, b, width - 40))
+    for a, b, need in sorted(spans, key=lambda span: span[1] - span[0]):
+        have = sum(gaps[a:b])
+        if have < need:
+            for i in range(a, b):
+                gaps[i] += (need - have) / (b - a)
+
+    x = participants[0].width / 2
+    for i, p in enumerate(participants):
+        p.x = x
+        if i < count - 1:
+            x += gaps[i]
+    left = 0
+    for event in events:
+        if event[0] == "note" and event[1] == "left of" and index[event[2][0]] == 0:
+            width = max(text_width(line) for line in event[3]) + 2 * NODE_PAD_X
+            left = max(left, width + 20 - participants[0].width / 2)
+    for p in participants:
+        p.x += left
+
+    actor_height = max(p.height for p in participants)
+    y = actor_height + 20
+    body_back, body = [], []
+    blocks = []
+    number = None
+
+    for event in events:
+        kind = event[0]
+        if kind == "autonumber":
+            number = 1
+        elif kind == "message":
+            _, src, dst, lines, dashed, head = event
+            a, b = participants[index[src]], participants[index[dst]]
+            text_lines = [line for line in lines if line] or []
+            text_height = len(text_lines) * LINE_HEIGHT
+            if number is not None:
+                text_lines = [f"{number}. {text_lines[0] if text_lines else ''}"] + text_lines[1:]
+                number += 1
+            dash = ' stroke-dasharray="3 3"' if dashed else ""
+            if a is b:
+                if text_lines:
+                    body.append(svg_text(text_lines, a.x + 12, y + text_height / 2, anchor="start"))
+                top = y + text_height + 6
+                path = f"M{num(a.x)},{num(top)} C{num(a.x + 50)},{num(top - 8)} {num(a.x + 50)},{num(top + 28)} {num(a.x)},{num(top + 20)}"
+                body.append(f'<path d="{path}" fill="none" stroke="{EDGE_COLOR}" stroke-width="1.5"{dash}/>')
+                if head:
+                    body.append(arrowhead((a.x, top + 20), (a.x + 12, top + 23), head))
+                y = top + 20 + MESSAGE_GAP
+                _extend(blocks, a.x, a.x + 60)
+            else:
+                if text_lines:
+                    body.append(svg_text(text_lines, (a.x + b.x) / 2, y + text_height / 2))
+                line_y = y + text_height + 6
+                direction = 1 if b.x > a.x else -1
+                tip = (b.x - direction * 1, line_y)
+                body.append(
+                    f'<path d="M{num(a.x)},{num(line_y)} L{num(tip[0] - direction * (2 if head == "arrow" else 0))},{num(line_y)}" '
+                    f'fill="none" stroke="{EDGE_COLOR}" stroke-width="1.5"{dash}/>'
+                )
+                if head:
+                    body.append(arrowhead(tip, (a.x, line_y), head))
+                y = line_y + MESSAGE_GAP
+                _extend(blocks, min(a.x, b.x), max(a.x, b.x))
+        elif kind == "note":
+            _, position, names, lines = event
+            width, height = text_size(lines)
+            width += 2 * NODE_PAD_X
+            height += 2 * NODE_PAD_Y - 6
+            first, last = participants[index[names[0]]], participants[index[names[-1]]]
+            if position == "right of":
+                x0 = first.x + 10
+            elif position == "left of":
+                x0 = first.x - 10 - width
+            else:
+                lo, hi = min(first.x, last.x), max(first.x, last.x)
+                if lo != hi:
+                    width = max(width, hi - lo + 50)
+                x0 = (lo + hi) / 2 - width / 2
+            body.append(
+                f'<rect x="{num(x0)}" y="{num(y)}" width="{num(width)}" height="{num(height)}" '
+                f'fill="{NOTE_FILL}" stroke="{CLUSTER_STROKE}"/>'
+            )
+            body.append(svg_text(lines, x0 + width / 2, y + height / 2))
+            _extend(blocks, x0, x0 + width)
+            y += height + MESSAGE_GAP
+        elif kind == "open":
+            blocks.append({"kind": event[1], "lines": event[2], "top": y, "sections": [], "lo": None, "hi": None})
+            y += LINE_HEIGHT + 14
+        elif kind == "section" and blocks:
+            blocks[-1]["sections"].append((y, event[2]))
+            y += LINE_HEIGHT + 10
+        elif kind == "close" and blocks:
+            block = blocks.pop()
+            lo = (block["lo"] if block["lo"] is not None else participants[0].x) - 20
+            hi = (block["hi"] if block["hi"] is not None else participants[-1].x) + 20
+            hi = max(hi, lo + 150)
+            body_back.append(_draw_block(block, lo, hi, y))
+            _extend(blocks, lo - 4, hi + 4)
+            y += 14
+
+    height = y + 6
+    width = max(p.x + p.width / 2 for p in participants) + right_extra
+    for p in participants:
+        body_back.append(
+            f'<line x1="{num(p.x)}" y1="{num(actor_height)}" x2="{num(p.x)}" y2="{num(height)}" '
+            f'stroke="#999999" stroke-width="0.5"/>'
+        )
+        body_back.append(_draw_actor(p, 0, actor_height))
+        body_back.append(_draw_actor(p, height, actor_height))
+    return svg_document(width, height + actor_height, body_back + body)
+
+
+def _extend(blocks, lo, hi):
+    for block in blocks:
+        block["lo"] = lo if block["lo"] is None else min(block["lo"], lo)
+        block["hi"] = hi if block["hi"] is None else max(block["hi"], hi)
+
+
+def _draw_actor(p, y, height):
+    x = p.x - p.width / 2
+    return (
+        f'<rect x="{num(x)}" y="{num(y)}" width="{num(p.width)}" height="{num(height)}" rx="3" '
+        f'fill="{NODE_FILL}" stroke="{NODE_STROKE}"/>'
+        + svg_text(p.lines, p.x, y + height / 2)
+    )
+
+
+def _draw_block(block, lo, hi, bottom):
+    top = block["top"]
+    kind_width = text_width(block["kind"]) + 16
+    parts = [
+        f'<rect x="{num(lo)}" y="{num(top)}" width="{num(hi - lo)}" height="{num(bottom - top + 6)}" '
+        f'fill="none" stroke="{NODE_STROKE}" stroke-width="1.5"/>',
+        _polygon(
+            [(lo, top), (lo + kind_width, top), (lo + kind_width, top + 14),
+             (lo + kind_width - 6, top + 20), (lo, top + 20)],
+            f'fill="{NODE_FILL}" stroke="{NODE_STROKE}"',
+        ),
+        svg_text([block["kind"]], lo + kind_width / 2, top + 10, weight="bold"),
+    ]
+    if block["lines"] != [""]:
+        parts.append(svg_text([f"[{' '.join(block['lines'])}]"], (lo + hi) / 2, top + 10, weight="bold"))
+    for section_y, lines in block["sections"]:
+        parts.append(
+            f'<line x1="{num(lo)}" y1="{num(section_y)}" x2="{num(hi)}" y2="{num(section_y)}" '
+            f'stroke="{NODE_STROKE}" stroke-width="1.5" stroke-dasharray="3 3"/>'
+        )
+        if lines != [""]:
+            parts.append(svg_text([f"[{' '.join(lines)}]"], (lo + hi) / 2, section_y + 12, weight="bold"))
+    return "".join(parts)
+
+
+# --- Entry points -------------------------------------------------------------
+
+
+def render_svg(code):
+    """Diagram source -> SVG markup; raises ValueError on unsupported input"""
+    kind = diagram_type(code)
+    if kind in ("graph", "flowchart"):
+        return render_flowchart(code)
+    if kind == "sequenceDiagram":
+        return render_sequence(code)
+    raise ValueError(f"Unsupported diagram type: {kind}")
+
+
+def render(code, fmt="svg", scale=2):
+    """Diagram source -> SVG or PNG bytes, or None when it cannot be rendered"""
+    if fmt == "png" and cairosvg is None:
+        return None
+    try:
+        svg = render_svg(code)
+    except ValueError as e:
+        print(f"Warning: Built-in Mermaid renderer skipped a diagram: {e}")
+        return None
+    if fmt == "svg":
+        return svg.encode("utf-8")
+    return cairosvg.svg2png(bytestring=svg.encode("utf-8"), scale=scale)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Render a Mermaid flowchart or sequence diagram without mermaid-cli"
+    )
+    parser.add_argument("input", help="Mermaid source file (- for stdin)")
+    parser.add_argument("-o", "--output", help="Output file (default: stdout)")
+    parser.add_argument("--format", choices=["svg", "png"], default="svg")
+
+    args = parser.parse_args()
+
+    if args.input == "-":
+        code = sys.stdin.read()
+    else:
+        with open(args.input, "r", encoding="utf-8") as f:
+            code = f.read()
+
+    if args.format == "png" and cairosvg is None:
+        print("Error: PNG output needs cairosvg. Install with: pip install cairosvg")
+        sys.exit(1)
+
+    data = render(code, args.format)
+    if data is None:
+        sys.exit(1)
+    if args.output:
+        with open(args.output, "wb") as f:
+            f.write(data)
+    else:
+        sys.stdout.buffer.write(data)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Shared Mermaid rendering helpers
+Renders diagram source to SVG or PNG and caches the result by diagram source,
+so unchanged diagrams are reused across builds. Flowcharts and sequence
+diagrams go through the built-in renderer (mermaid_builtin.py), everything
+else through mermaid-cli (mmdc). MERMAID_RENDERER selects the order:
+  auto     built-in first, mmdc for the rest (default)
+  mmdc     mmdc first, built-in when mmdc is missing or fails
+  builtin  never start mmdc
+"""
+
+import os
+import json
+import subprocess
+import tempfile
+
+import build_cache
+import mermaid_builtin
+import resource_governor
+import tool_probe
+
+RENDERERS = ("auto", "mmdc", "builtin")
+
+# mermaid-cli config for vector PDF output: labels as SVG <text> instead of HTML
+# inside <foreignObject>, which WeasyPrint cannot draw
+VECTOR_CONFIG = {"htmlLabels": False, "flowchart": {"htmlLabels": False}}
+
+def check_mermaid_cli():
+    """Check if mermaid-cli is available (cached for the session and on disk)"""
+    return tool_probe.available("mmdc")
+
+
+def diagram_key(mermaid_code, fmt, width=800, renderer="mmdc", vector=False):
+    """Stable cache key for a diagram rendered to a given format"""
+    if renderer == "builtin":
+        return build_cache.content_hash(
+            "mermaid-builtin", mermaid_builtin.RENDERER_VERSION, fmt, mermaid_code
+        )
+    kind = "mermaid-vector" if vector else "mermaid"
+    return build_cache.content_hash(kind, fmt, str(width), mermaid_code)
+
+
+def is_vector_safe(svg):
+    """True if WeasyPrint can draw the SVG as vectors (no HTML in foreignObject)"""
+    return b"<foreignobject" not in svg.lower()
+
+
+def renderer_order(mermaid_code, fmt):
+    """Renderers to try for this diagram, in order"""
+    mode = os.environ.get("MERMAID_RENDERER", "auto")
+    if mode not in RENDERERS:
+        print(f"Warning: Unknown MERMAID_RENDERER '{mode}', using auto")
+        mode = "auto"
+
+    builtin = mermaid_builtin.supports(mermaid_code) and (
+        fmt == "svg" or mermaid_builtin.png_available()
+    )
+    if mode == "builtin":
+        return ["builtin"] if builtin else []
+    if mode == "mmdc":
+        return ["mmdc", "builtin"] if builtin else ["mmdc"]
+    return ["builtin", "mmdc"] if builtin else ["mmdc"]
+
+
+def _run_mmdc(mermaid_code, fmt, width, svg_id, config=None):
+    """Render with mmdc into a temp directory and return the output bytes"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_file = os.path.join(tmp_dir, "diagram.mmd")
+        output_file = os.path.join(tmp_dir, f"diagram.{fmt}")
+        with open(input_file, "w", encoding="utf-8") as f:
+            f.write(mermaid_code)
+
+        cmd = [
+            "mmdc",
+            "-i",
+            input_file,
+            "-o",
+            output_file,
+            "--backgroundColor",
+            "transparent",
+            "--width",
+            str(width),
+        ]
+        if svg_id:
+            # Unique ids keep the styles of several inlined SVGs from colliding
+            cmd += ["--svgId", svg_id]
+        if config:
+            config_file = os.path.join(tmp_dir, "config.json")
+            with open(config_file, "w", encoding="utf-8") as f:
+                json.dump(config, f)
+            cmd += ["--configFile", config_file]
+
+        # mmdc starts a headless Chromium: take a slot in the browser class
+        with resource_governor.slot("browser", "mmdc"):
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+
+        if result.returncode == 0 and os.path.exists(output_file):
+            with open(output_file, "rb") as f:
+                return f.read()
+
+        print(f"Warning: Failed to render mermaid diagram: {result.stderr}")
+        return None
+
+
+def _render_with(renderer, mermaid_code, fmt, width, vector=False):
+    key = diagram_key(mermaid_code, fmt, width, renderer, vector)
+    suffix = f".{fmt}"
+
+    # The built-in renderer is faster than a round trip to the shared cache
+    shared = renderer != "builtin"
+    cached = build_cache.get_bytes("mermaid", key, suffix, shared)
+    if cached is not None:
+        return key, cached
+
+    if renderer == "builtin":
+        data = mermaid_builtin.render(mermaid_code, fmt)
+    else:
+        if not check_mermaid_cli():
+            return key, None
+        try:
+            svg_id = f"mermaid-{key[:12]}" if fmt == "svg" else None
+            config = VECTOR_CONFIG if vector else None
+            data = _run_mmdc(mermaid_code, fmt, width, svg_id, config)
+        except Exception as e:
+            print(f"Error rendering mermaid diagram: {e}")
+            return key, None
+
+    if data is not None:
+        build_cache.put_bytes("mermaid", key, data, suffix, shared)
+    return key, data
+
+
+def render_mermaid(mermaid_code, fmt="png", width=800):
+    """
+    Render Mermaid code to SVG or PNG bytes
+    Returns (key, data); data is None when rendering failed
+    """
+    key = diagram_key(mermaid_code, fmt, width)
+    for renderer in renderer_order(mermaid_code, fmt):
+        key, data = _render_with(renderer, mermaid_code, fmt, width)
+        if data is not None:
+            return key, data
+    return key, None
+
+
+def render_mermaid_vector(mermaid_code, width=800):
+    """
+    Render Mermaid code to SVG that WeasyPrint draws as vectors: the built-in
+    renderer's SVG, or mmdc's with SVG text labels. Diagram types that mmdc
+    still renders with foreignObject are rejected
+    Returns (key, data); data is None when no renderer produced a safe SVG
+    """
+    key = None
+    for renderer in renderer_order(mermaid_code, "svg"):
+        key, data = _render_with(renderer, mermaid_code, "svg", width, vector=True)
+        if data is not None and is_vector_safe(data):
+            return key, data
+    return key, None
+
+
+def render_mermaid_image(mermaid_code, width=800, vector=False):
+    """
+    Render Mermaid code for PDF/EPUB: with vector, a foreignObject-free SVG
+    where possible; otherwise PNG, or else the built-in renderer's SVG
+    Returns (key, data, fmt); data is None when rendering failed
+    """
+    if vector:
+        key, data = render_mermaid_vector(mermaid_code, width)
+        if data is not None:
+            return key, data, "svg"
+
+    key, data = render_mermaid(mermaid_code, "png", width)
+    if data is not None:
+        return key, data, "png"
+    if mermaid_builtin.supports(mermaid_code):
+        svg_key, svg = _render_with("builtin", mermaid_code, "svg", width)
+        if svg is not None:
+            return svg_key, svg, "svg"
+    return key, None, "png"
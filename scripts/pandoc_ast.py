@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Cached pandoc AST with in-process filters
+Parses each book's markdown to pandoc's JSON AST once (cached by source hash),
+rewrites Mermaid and code blocks in Python instead of an external filter process,
+and renders both the HTML and EPUB editions from that same AST
+"""
+
+import sys
+import os
+import json
+import html
+import argparse
+import tempfile
+import subprocess
+
+import build_cache
+
+SKIP_CODE_CLASSES = {"mermaid", "sourceCode", "numberLines"}
+
+_PANDOC_VERSION = None
+
+
+def pandoc_version():
+    """First line of `pandoc --version`, part of the AST cache key"""
+    global _PANDOC_VERSION
+    if _PANDOC_VERSION is None:
+        result = subprocess.run(
+            ["pandoc", "--version"], capture_output=True, text=True, check=True
+        )
+        _PANDOC_VERSION = result.stdout.splitlines()[0]
+    return _PANDOC_VERSION
+
+
+def load_ast(markdown_path):
+    """Return the book's pandoc AST, parsing the markdown only on a cache miss"""
+    with open(markdown_path, "rb") as f:
+        source = f.read()
+
+    key = build_cache.content_hash("ast", pandoc_version(), source)
+    cached = build_cache.get_text("ast", key, ".json")
+    if cached is not None:
+        print(f"✓ Reusing cached pandoc AST for {markdown_path}")
+        return json.loads(cached)
+
+    result = subprocess.run(
+        ["pandoc", "-f", "markdown", "-t", "json", markdown_path],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    build_cache.put_text("ast", key, result.stdout, ".json")
+    print(f"✓ Parsed pandoc AST for {markdown_path}")
+    return json.loads(result.stdout)
+
+
+def map_blocks(blocks, fn):
+    """Apply fn to every block (recursing into containers); fn returns a block"""
+    mapped = []
+    for block in blocks:
+        block = fn(block)
+        content = block.get("c")
+        kind = block.get("t")
+        if kind == "BlockQuote":
+            block["c"] = map_blocks(content, fn)
+        elif kind == "Div":
+            block["c"] = [content[0], map_blocks(content[1], fn)]
+        elif kind == "Figure":
+            block["c"] = [content[0], content[1], map_blocks(content[2], fn)]
+        elif kind == "BulletList":
+            block["c"] = [map_blocks(item, fn) for item in content]
+        elif kind == "OrderedList":
+            block["c"] = [content[0], [map_blocks(item, fn) for item in content[1]]]
+        elif kind == "DefinitionList":
+            block["c"] = [
+                [term, [map_blocks(d, fn) for d in defs]] for term, defs in content
+            ]
+        elif kind == "Table":
+            block["c"] = map_table(content, fn)
+        elif kind == "LineBlock":
+            # Lines of inlines only: fn has seen the block, no blocks are nested
+            pass
+        mapped.append(block)
+    return mapped
+
+
+def map_rows(rows, fn):
+    """Table rows: [attr, [cell]], cell = [attr, align, rowspan, colspan, blocks]"""
+    return [
+        [attr, [cell[:4] + [map_blocks(cell[4], fn)] for cell in cells]] for attr, cells in rows
+    ]
+
+
+def map_table(content, fn):
+    """Apply map_blocks to a table's caption and head, body and foot cells"""
+    if len(content) == 5:
+        # pandoc < 2.10: [caption inlines, aligns, widths, head cells, rows of cells]
+        caption, aligns, widths, head, rows = content
+        return [
+            caption, aligns, widths,
+            [map_blocks(cell, fn) for cell in head],
+            [[map_blocks(cell, fn) for cell in row] for row in rows],
+        ]
+    attr, (short, caption), colspecs, (head_attr, head_rows), bodies, (foot_attr, foot_rows) = content
+    return [
+        attr,
+        [short, map_blocks(caption, fn)],
+        colspecs,
+        [head_attr, map_rows(head_rows, fn)],
+        [
+            [body_attr, row_head_columns, map_rows(intermediate, fn), map_rows(body_rows, fn)]
+            for body_attr, row_head_columns, intermediate, body_rows in bodies
+        ],
+        [foot_attr, map_rows(foot_rows, fn)],
+    ]
+
+
+def raw_html(markup):
+    return {"t": "RawBlock", "c": ["html", markup]}
+
+
+def code_block_parts(block):
+    """Return (classes, code) for a CodeBlock"""
+    (_ident, classes, _attrs), code = block["c"]
+    return classes, code
+
+
+def mermaid_to_html(block):
+    """Mermaid code block -> <div class="mermaid"> (replaces pandoc-mermaid-filter)"""
+    if block.get("t") != "CodeBlock":
+        return block
+    classes, code = code_block_parts(block)
+    if "mermaid" not in classes:
+        return block
+    return raw_html(f'<div class="mermaid">{html.escape(code, quote=False)}</div>')
+
+
+def highlight_code(block):
+    """Language-tagged code block -> build-time Pygments markup"""
+    if block.get("t") != "CodeBlock":
+        return block
+    classes, code = code_block_parts(block)
+    lang = next((c for c in classes if c not in SKIP_CODE_CLASSES), None)
+    if not lang or "mermaid" in classes:
+        return block
+
+    import pygmentsify_codeblocks
+
+    return raw_html(pygmentsify_codeblocks.highlight_code(code, lang))
+
+
+def mermaid_to_image(output_dir):
+    """Mermaid code block -> rendered PNG (or plain SVG) image (for EPUB)"""
+    import asset_store
+    import mermaid_render
+
+    def transform(block):
+        if block.get("t") != "CodeBlock":
+            return block
+        classes, code = code_block_parts(block)
+        if "mermaid" not in classes:
+            return block
+
+        # Vector SVG unless PDF_DIAGRAMS=png, as in render-mermaid-for-pdf.py
+        vector = os.environ.get("PDF_DIAGRAMS") != "png"
+        key, content, fmt = mermaid_render.render_mermaid_image(code.strip(), vector=vector)
+        if content is None:
+            return block
+
+        image_path = asset_store.add_bytes(
+            content, os.path.join(output_dir, f"mermaid_{key[:12]}.{fmt}")
+        )
+        alt = [{"t": "Str", "c": "Diagram"}]
+        image = {
+            "t": "Image",
+            "c": [["", ["mermaid-rendered"], []], alt, [os.path.abspath(image_path), ""]],
+        }
+        return {"t": "Para", "c": [image]}
+
+    return transform
+
+
+def apply_filters(ast, filters):
+    """Run in-process filters over the AST blocks"""
+    for fn in filters:
+        ast["blocks"] = map_blocks(ast["blocks"], fn)
+    return ast
+
+
+def render(ast, spec):
+    """Render an AST through the pandoc pool (or CLI), feeding the JSON as text"""
+    import pandoc_pool
+
+    spec = dict(spec, text=json.dumps(ast), **{"from": "json"})
+    pandoc_pool.convert(spec)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Render a book from its cached pandoc AST"
+    )
+    parser.add_argument("format", choices=["html", "epub"], help="Output format")
+    parser.add_argument("markdown_file", help="Book markdown source")
+    parser.add_argument("output", help="Output file path")
+    parser.add_argument("--title", help="Book title metadata")
+    parser.add_argument("--author", help="Book author metadata")
+    parser.add_argument("--template", help="HTML template (html only)")
+    parser.add_argument("--css", action="append", default=[], help="Stylesheet")
+    parser.add_argument("--cover", help="EPUB cover image (epub only)")
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.markdown_file):
+        print(f"Error: Markdown file not found: {args.markdown_file}")
+        sys.exit(1)
+
+    spec = {
+        "output": args.output,
+        "to": args.format,
+        "standalone": True,
+        "toc": True,
+        "css": list(args.css),
+        "metadata": {},
+    }
+    if args.title:
+        spec["metadata"]["title"] = args.title
+    if args.author:
+        spec["metadata"]["author"] = args.author
+
+    try:
+        ast = load_ast(args.markdown_file)
+
+        if args.format == "html":
+            ast = apply_filters(ast, [mermaid_to_html, highlight_code])
+            spec["template"] = args.template
+        else:
+            output_dir = os.path.join(os.path.dirname(args.output), "mermaid-images")
+            ast = apply_filters(ast, [mermaid_to_image(output_dir), highlight_code])
+            spec["cover"] = args.cover
+
+            # Highlighted blocks need the Pygments classes styled inside the EPUB
+            import pygmentsify_codeblocks
+
+            with tempfile.NamedTemporaryFile(
+                "w", suffix=".css", delete=False, encoding="utf-8"
+            ) as f:
+                # One style, readable on the <pre> background of the EPUB stylesheet
+                f.write(pygmentsify_codeblocks.template_stylesheet(
+                    args.css[0] if args.css else None, single=True
+                ))
+                highlight_css = f.name
+            spec["css"].append(highlight_css)
+
+        try:
+            render(ast, spec)
+        finally:
+            if args.format == "epub":
+                os.unlink(highlight_css)
+    except subprocess.CalledProcessError as e:
+        print(f"Error running pandoc: {e}")
+        sys.exit(1)
+
+    print(f"✓ Rendered {args.format.upper()} from pandoc AST: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
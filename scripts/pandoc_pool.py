@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Warm pandoc conversion pool
+Keeps long-lived `pandoc server` processes running and dispatches conversions
+to them with a concurrency limit, falling back to the per-invocation pandoc CLI
+whenever the pool is not running or a request cannot be served
+"""
+
+import sys
+import os
+import re
+import json
+import time
+import fcntl
+import base64
+import socket
+import signal
+import argparse
+import subprocess
+from contextlib import contextmanager
+
+import build_cache
+
+POOL_DIR = os.path.join(build_cache.CACHE_ROOT, "pandoc-pool")
+POOL_FILE = os.path.join(POOL_DIR, "pool.json")
+SLOT_WAIT_TIMEOUT = 300
+
+IMG_SRC_RE = re.compile(r"""<img\b[^>]*?\bsrc\s*=\s*["']([^"']+)["']""", re.I)
+MARKDOWN_IMAGE_RE = re.compile(r"!\[[^\]]*\]\(\s*<?([^)\s>]+)")
+REMOTE_RE = re.compile(r"^[a-z][a-z0-9+.-]*:", re.I)
+
+
+class PoolUnavailable(Exception):
+    """Raised when a conversion cannot be served by the pool"""
+
+
+def read_pool():
+    """Return the running pool description, or None"""
+    try:
+        with open(POOL_FILE, "r", encoding="utf-8") as f:
+            pool = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+    alive = []
+    for server in pool.get("servers", []):
+        try:
+            os.kill(server["pid"], 0)
+            alive.append(server)
+        except OSError:
+            continue
+    if not alive:
+        return None
+    pool["servers"] = alive
+    return pool
+
+
+def _wait_for_port(port, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def start_pool(workers, base_port, max_concurrent):
+    """Start `workers` pandoc servers on consecutive ports"""
+    if read_pool():
+        print("ℹ️ Pandoc pool already running")
+        return True
+
+    os.makedirs(POOL_DIR, exist_ok=True)
+    servers = []
+    for i in range(workers):
+        port = base_port + i
+        try:
+            process = subprocess.Popen(
+                ["pandoc", "server", "--port", str(port)],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                start_new_session=True,
+            )
+        except FileNotFoundError:
+            print("Error: pandoc is not installed")
+            break
+        if not _wait_for_port(port):
+            process.kill()
+            print(f"Warning: pandoc server did not start on port {port}")
+            continue
+        servers.append({"port": port, "pid": process.pid})
+
+    if not servers:
+        print("Warning: No pandoc servers started (needs pandoc 3 with server support)")
+        return False
+
+    with open(POOL_FILE, "w", encoding="utf-8") as f:
+        json.dump({"servers": servers, "max_concurrent": max_concurrent}, f, indent=2)
+    print(f"✓ Started {len(servers)} pandoc server(s), {max_concurrent} job(s) each")
+    return True
+
+
+def stop_pool():
+    """Stop all pool servers"""
+    pool = read_pool()
+    if pool:
+        for server in pool["servers"]:
+            try:
+                os.kill(server["pid"], signal.SIGTERM)
+            except OSError:
+                pass
+        print(f"✓ Stopped {len(pool['servers'])} pandoc server(s)")
+    if os.path.exists(POOL_FILE):
+        os.unlink(POOL_FILE)
+
+
+@contextmanager
+def acquire_slot(pool):
+    """Hold one of servers * max_concurrent slots (shared across processes)"""
+    servers = pool["servers"]
+    slots = len(servers) * max(1, pool.get("max_concurrent", 1))
+    deadline = time.time() + SLOT_WAIT_TIMEOUT
+
+    while True:
+        for slot in range(slots):
+            lock_file = open(os.path.join(POOL_DIR, f"slot-{slot}.lock"), "w")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                continue
+            try:
+                yield servers[slot % len(servers)]
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                lock_file.close()
+            return
+        if time.time() > deadline:
+            raise PoolUnavailable("timed out waiting for a pandoc pool slot")
+        time.sleep(0.05)
+
+
+def _read_text(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _encode_file(path):
+    with open(path, "rb") as f:
+        return base64.b64encode(f.read()).decode("ascii")
+
+
+def _ast_images(node):
+    """Targets of every Image node in a pandoc JSON AST"""
+    if isinstance(node, dict):
+        if node.get("t") == "Image":
+            yield node["c"][2][0]
+            return
+        for value in node.values():
+            yield from _ast_images(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _ast_images(value)
+
+
+def local_images(spec, text):
+    """Local image references the output must embed (not data: URIs or URLs)"""
+    if spec["from"] == "json":
+        targets = _ast_images(json.loads(text))
+    elif spec["from"].startswith("html"):
+        targets = IMG_SRC_RE.findall(text)
+    else:
+        targets = MARKDOWN_IMAGE_RE.findall(text)
+    return sorted({target for target in targets if target and not REMOTE_RE.match(target)})
+
+
+def _resource_file(reference, spec):
+    """Local file for an image reference: as given, else next to the input"""
+    candidates = [reference]
+    if "input" in spec and not os.path.isabs(reference):
+        candidates.append(os.path.join(os.path.dirname(spec["input"]), reference))
+    for candidate in candidates:
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def server_request(spec):
+    """Translate a conversion spec into a pandoc-server JSON request"""
+    if spec.get("filters"):
+        raise PoolUnavailable("filters are not supported by pandoc server")
+
+    text = spec["text"] if "text" in spec else _read_text(spec["input"])
+    request = {
+        "text": text,
+        "from": spec["from"],
+        "to": spec["to"],
+        "standalone": spec.get("standalone", False),
+        "table-of-contents": spec.get("toc", False),
+    }
+    if spec.get("template"):
+        request["template"] = _read_text(spec["template"])
+    if spec.get("metadata"):
+        request["metadata"] = spec["metadata"]
+
+    # The server has no file system access; files it must read (EPUB stylesheets,
+    # the cover, images) are shipped in the request's virtual file tree under their paths
+    files = {}
+    if spec.get("css"):
+        request["variables"] = {"css": spec["css"]}
+        if spec["to"].startswith("epub"):
+            for css in spec["css"]:
+                files[css] = _encode_file(css)
+    if spec.get("cover"):
+        request["epub-cover-image"] = spec["cover"]
+        files[spec["cover"]] = _encode_file(spec["cover"])
+    if spec["to"].startswith("epub"):
+        # Images (e.g. rendered diagrams) are embedded too, under their referenced paths
+        for reference in local_images(spec, text):
+            path = _resource_file(reference, spec)
+            if path is None:
+                raise PoolUnavailable(f"cannot ship image {reference} to pandoc server")
+            files[reference] = _encode_file(path)
+    if files:
+        request["files"] = files
+    return request
+
+
+def convert_with_pool(pool, spec):
+    """Run a conversion on a pool server and write the output file"""
+    payload = json.dumps(server_request(spec)).encode("utf-8")
+
+    with acquire_slot(pool) as server:
+        import urllib.request
+
+        http_request = urllib.request.Request(
+            f"http://127.0.0.1:{server['port']}/",
+            data=payload,
+            headers={"Content-Type": "application/json", "Accept": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(http_request, timeout=600) as response:
+                result = json.loads(response.read().decode("utf-8"))
+        except (OSError, ValueError) as e:
+            raise PoolUnavailable(str(e))
+
+    if "output" not in result:
+        raise PoolUnavailable(result.get("error", "unexpected pandoc server response"))
+    for message in result.get("messages", []):
+        # A resource missing from the file tree: the CLI can read it from disk
+        if message.get("type") == "CouldNotFetchResource" or "could not fetch resource" in str(
+            message.get("message", "")
+        ).lower():
+            raise PoolUnavailable(message.get("message") or "could not fetch resource")
+
+    if result.get("base64"):
+        data = base64.b64decode(result["output"])
+    else:
+        data = result["output"].encode("utf-8")
+
+    with open(spec["output"], "wb") as f:
+        f.write(data)
+
+
+def cli_args(spec):
+    """Translate a conversion spec into pandoc CLI arguments"""
+    args = ["pandoc", "-f", spec["from"], "-t", spec["to"], "-o", spec["output"]]
+    if spec.get("standalone"):
+        args.append("--standalone")
+    if spec.get("toc"):
+        args.append("--toc")
+    if spec.get("template"):
+        args.append(f"--template={spec['template']}")
+    for css in spec.get("css", []):
+        args.append(f"--css={css}")
+    for key, value in spec.get("metadata", {}).items():
+        args += ["--metadata", f"{key}={value}"]
+    if spec.get("cover"):
+        args.append(f"--epub-cover-image={spec['cover']}")
+    for name in spec.get("filters", []):
+        args += ["--filter", name]
+    if "input" in spec:
+        args.append(spec["input"])
+    return args
+
+
+def convert(spec):
+    """Convert with the warm pool when available, otherwise with the pandoc CLI"""
+    pool = read_pool()
+    if pool:
+        try:
+            convert_with_pool(pool, spec)
+            return "pool"
+        except PoolUnavailable as e:
+            print(f"ℹ️ Pandoc pool unavailable ({e}), falling back to CLI")
+
+    subprocess.run(cli_args(spec), input=spec.get("text"), text=True, check=True)
+    return "cli"
+
+
+def guess_format(path, default):
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    return {"md": "markdown", "htm": "html", "json": "json"}.get(ext, ext or default)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm pandoc conversion pool")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    start_parser = subparsers.add_parser("start", help="Start pandoc servers")
+    start_parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    start_parser.add_argument("--port", type=int, default=3030, help="First port")
+    start_parser.add_argument(
+        "--max-concurrent", type=int, default=2, help="Concurrent jobs per server"
+    )
+
+    subparsers.add_parser("stop", help="Stop pandoc servers")
+    subparsers.add_parser("status", help="Show pool status")
+
+    convert_parser = subparsers.add_parser(
+        "convert", help="Convert a document (pandoc-compatible subset of options)"
+    )
+    convert_parser.add_argument("input", help="Input file")
+    convert_parser.add_argument("-o", "--output", required=True)
+    convert_parser.add_argument("-f", "--from", dest="from_format")
+    convert_parser.add_argument("-t", "--to", dest="to_format")
+    convert_parser.add_argument("--template")
+    convert_parser.add_argument("--css", action="append", default=[])
+    convert_parser.add_argument("--toc", action="store_true")
+    convert_parser.add_argument("--standalone", action="store_true")
+    convert_parser.add_argument("--metadata", action="append", default=[])
+    convert_parser.add_argument("--epub-cover-image", dest="cover")
+    convert_parser.add_argument("--filter", action="append", default=[])
+
+    args = parser.parse_args()
+
+    if args.command == "start":
+        if not start_pool(args.workers, args.port, args.max_concurrent):
+            sys.exit(1)
+    elif args.command == "stop":
+        stop_pool()
+    elif args.command == "status":
+        pool = read_pool()
+        if not pool:
+            print("Pandoc pool is not running")
+        else:
+            for server in pool["servers"]:
+                print(f"  ✓ pandoc server pid {server['pid']} on port {server['port']}")
+            print(f"  Max concurrent jobs per server: {pool.get('max_concurrent', 1)}")
+    elif args.command == "convert":
+        if not os.path.exists(args.input):
+            print(f"Error: Input file not found: {args.input}")
+            sys.exit(1)
+        spec = {
+            "input": args.input,
+            "output": args.output,
+            "from": args.from_format or guess_format(args.input, "markdown"),
+            "to": args.to_format or guess_format(args.output, "html"),
+            "standalone": args.standalone,
+            "toc": args.toc,
+            "template": args.template,
+            "css": args.css,
+            "metadata": dict(item.split("=", 1) for item in args.metadata),
+            "cover": args.cover,
+            "filters": args.filter,
+        }
+        try:
+            convert(spec)
+        except subprocess.CalledProcessError as e:
+            print(f"Error running pandoc: {e}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
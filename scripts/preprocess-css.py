@@ -7,8 +7,38 @@ Converts modern CSS to widely-supported CSS for all formats
 import re
 import os
 import sys
+import argparse
 from pathlib import Path
 
+THEMES = ["light", "dark"]
+COLOR_SCHEME_RE = re.compile(r"@media\s*\(\s*prefers-color-scheme:\s*(light|dark)\s*\)\s*\{")
+
+
+def color_scheme_blocks(css_content):
+    """(start, end, scheme) of each @media (prefers-color-scheme: ...) block"""
+    blocks = []
+    for match in COLOR_SCHEME_RE.finditer(css_content):
+        depth, pos = 1, match.end()
+        while depth and pos < len(css_content):
+            depth += {"{": 1, "}": -1}.get(css_content[pos], 0)
+            pos += 1
+        blocks.append((match.start(), pos, match.group(1)))
+    return blocks
+
+
+def select_theme(css_content, theme):
+    """Keep one color scheme: its media blocks apply unconditionally, the
+    other scheme's blocks are dropped"""
+    out, last = [], 0
+    for start, end, scheme in color_scheme_blocks(css_content):
+        out.append(css_content[last:start])
+        if scheme == theme:
+            body = css_content[start:end]
+            out.append(body[body.index("{") + 1:-1])
+        last = end
+    out.append(css_content[last:])
+    return "".join(out)
+
 
 def extract_css_variables(css_content):
     """Extract CSS custom properties (variables) from :root and globally"""
@@ -93,15 +123,21 @@ def remove_unsupported_css(css_content):
     return css_content
 
 
-def add_pdf_optimizations(css_content):
+def page_rule(page_size="A4", margin=None):
+    """@page rule for a page size (A4, Letter, A5, "6in 9in", ...)"""
+    declarations = [f"size: {page_size};"]
+    if margin:
+        declarations.append(f"margin: {margin};")
+    return "@page {\n        " + "\n        ".join(declarations) + "\n    }"
+
+
+def add_pdf_optimizations(css_content, page_size="A4", margin=None):
     """Add PDF-specific optimizations for better page breaks and layout"""
 
     # Add page break controls
     pdf_css = """
     /* PDF-specific optimizations */
-    @page {
-        size: A4;
-    }
+    """ + page_rule(page_size, margin) + """
     
     /* Prevent page breaks in important elements */
     h1, h2, h3, h4, h5, h6 {
@@ -379,12 +415,18 @@ def fix_mermaid_and_syntax_highlighting(css_content):
     return css_content + mermaid_css
 
 
-def preprocess_css_for_format(css_file_path, output_path, format_type):
+def preprocess_css_for_format(
+    css_file_path, output_path, format_type, page_size="A4", margin=None, theme=None
+):
     """Preprocess CSS for specific format (pdf, epub, mobi)"""
 
     with open(css_file_path, "r", encoding="utf-8") as f:
         css_content = f.read()
 
+    # Variants can pin the color scheme (otherwise the last definition wins)
+    if theme:
+        css_content = select_theme(css_content, theme)
+
     # Extract and replace CSS variables
     variables = extract_css_variables(css_content)
     css_content = replace_css_variables(css_content, variables)
@@ -394,7 +436,7 @@ def preprocess_css_for_format(css_file_path, output_path, format_type):
 
     # Add format-specific optimizations
     if format_type == "pdf":
-        css_content = add_pdf_optimizations(css_content)
+        css_content = add_pdf_optimizations(css_content, page_size, margin)
     elif format_type in ["epub", "mobi"]:
         css_content = add_epub_optimizations(css_content)
 
@@ -409,26 +451,27 @@ def preprocess_css_for_format(css_file_path, output_path, format_type):
 
 
 def main():
-    if len(sys.argv) != 4:
-        print("Usage: python3 preprocess-css.py <input-css> <output-css> <format>")
-        print("Format options: pdf, epub, mobi")
-        sys.exit(1)
-
-    input_css = sys.argv[1]
-    output_css = sys.argv[2]
-    format_type = sys.argv[3]
+    parser = argparse.ArgumentParser(
+        description="Preprocess template CSS for PDF, EPUB or MOBI"
+    )
+    parser.add_argument("input_css", help="Template CSS file")
+    parser.add_argument("output_css", help="Where to write the processed CSS")
+    parser.add_argument("format", choices=["pdf", "epub", "mobi"])
+    parser.add_argument("--page-size", default="A4", help="PDF page size (default: A4)")
+    parser.add_argument("--margin", help="PDF page margin (default: WeasyPrint's)")
+    parser.add_argument("--theme", choices=THEMES, help="Use one color scheme only")
 
-    if not os.path.exists(input_css):
-        print(f"Error: Input CSS file not found: {input_css}")
-        sys.exit(1)
+    args = parser.parse_args()
 
-    if format_type not in ["pdf", "epub", "mobi"]:
-        print(f"Error: Invalid format '{format_type}'. Use: pdf, epub, or mobi")
+    if not os.path.exists(args.input_css):
+        print(f"Error: Input CSS file not found: {args.input_css}")
         sys.exit(1)
 
     try:
-        processed_path = preprocess_css_for_format(input_css, output_css, format_type)
-        print(f"✓ Preprocessed CSS for {format_type}: {processed_path}")
+        processed_path = preprocess_css_for_format(
+            args.input_css, args.output_css, args.format, args.page_size, args.margin, args.theme
+        )
+        print(f"✓ Preprocessed CSS for {args.format}: {processed_path}")
     except Exception as e:
         print(f"Error preprocessing CSS: {e}")
         sys.exit(1)
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Fast PDF preview for selected chapters
+Slices a book's markdown down to the chosen chapters (or a heading range) and
+runs only the PDF stage of build-all-formats.sh on that slice, so template CSS
+changes can be checked in seconds. Diagrams and code highlighting come from the
+shared build cache; HTML, EPUB and MOBI are not built
+"""
+
+import sys
+import os
+import re
+import time
+import shutil
+import argparse
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PREVIEW_DIR = os.path.join(REPO_ROOT, ".cache", "preview")
+
+HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+FENCE_RE = re.compile(r"^\s*(```|~~~)")
+
+
+def parse_sections(lines):
+    """Return the book's headings as (line, level, text), skipping code fences"""
+    headings = []
+    fence = None
+    for i, line in enumerate(lines):
+        match = FENCE_RE.match(line)
+        if match:
+            # Lines starting with '#' inside code fences are not headings
+            if fence is None:
+                fence = match.group(1)
+            elif match.group(1) == fence:
+                fence = None
+            continue
+        if fence is None:
+            heading = HEADING_RE.match(line)
+            if heading:
+                headings.append((i, len(heading.group(1)), heading.group(2)))
+    return headings
+
+
+def chapter_level(headings):
+    """Shallowest heading level used more than once (a lone H1 is the book title)"""
+    levels = [level for _line, level, _text in headings]
+    for level in range(1, 7):
+        if levels.count(level) > 1:
+            return level
+    return levels[0] if levels else 1
+
+
+def section_end(lines, headings, index):
+    """Line where the section started by headings[index] ends"""
+    level = headings[index][1]
+    for line, other_level, _text in headings[index + 1 :]:
+        if other_level <= level:
+            return line
+    return len(lines)
+
+
+def chapters(lines, headings, level):
+    """List of (title, start, end) for every heading at the chapter level"""
+    return [
+        (text, line, section_end(lines, headings, i))
+        for i, (line, heading_level, text) in enumerate(headings)
+        if heading_level == level
+    ]
+
+
+def parse_chapter_spec(spec, count):
+    """Parse "2", "2,5" or "3-6" into sorted chapter numbers (1-based)"""
+    numbers = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-", 1)
+            numbers.update(range(int(first), int(last) + 1))
+        else:
+            numbers.add(int(part))
+    invalid = [n for n in numbers if n < 1 or n > count]
+    if invalid:
+        raise ValueError(f"chapter(s) {invalid} out of range 1-{count}")
+    return sorted(numbers)
+
+
+def find_heading(headings, text, start=0):
+    """Index of the first heading at or after start whose text contains text"""
+    needle = text.lower()
+    for i in range(start, len(headings)):
+        if needle in headings[i][2].lower():
+            return i
+    return None
+
+
+def front_matter(lines):
+    """YAML metadata block at the top of the file, if any"""
+    if lines and lines[0].strip() == "---":
+        for i in range(1, len(lines)):
+            if lines[i].strip() in ("---", "..."):
+                return lines[: i + 1] + [""]
+    return []
+
+
+def slice_book(source, chapter_spec=None, start_heading=None, end_heading=None, level=None):
+    """Return (markdown, description) for the selected part of the book"""
+    lines = source.split("\n")
+    headings = parse_sections(lines)
+    if not headings:
+        raise ValueError("no headings found in the book")
+
+    if chapter_spec:
+        level = level or chapter_level(headings)
+        book_chapters = chapters(lines, headings, level)
+        numbers = parse_chapter_spec(chapter_spec, len(book_chapters))
+        ranges = [book_chapters[n - 1][1:] for n in numbers]
+        description = ", ".join(f"{n}. {book_chapters[n - 1][0]}" for n in numbers)
+    else:
+        first = find_heading(headings, start_heading)
+        if first is None:
+            raise ValueError(f"no heading matches '{start_heading}'")
+        last = first
+        if end_heading:
+            last = find_heading(headings, end_heading, first)
+            if last is None:
+                raise ValueError(f"no heading after '{start_heading}' matches '{end_heading}'")
+        ranges = [(headings[first][0], section_end(lines, headings, last))]
+        description = f"{headings[first][2]} → {headings[last][2]}"
+
+    selected = front_matter(lines)
+    for start, end in ranges:
+        selected += lines[start:end] + [""]
+    return "\n".join(selected), description
+
+
+def build_env(scratch):
+    """Environment for a PDF-only partial build into the preview scratch dir"""
+    env = dict(
+        os.environ,
+        PUBLIC_DIR=os.path.join(scratch, "public"),
+        BOOKS_DIR=os.path.join(scratch, "books"),
+        FORMATS="pdf",
+        PARTIAL_BUILD="true",
+    )
+    # Use the project venv (WeasyPrint, mermaid filter) like build.sh does
+    venv = os.path.join(REPO_ROOT, ".venv")
+    if not env.get("VIRTUAL_ENV") and os.path.isdir(venv):
+        env["VIRTUAL_ENV"] = venv
+        env["PATH"] = os.path.join(venv, "bin") + os.pathsep + env.get("PATH", "")
+    return env
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Render selected chapters of a book to PDF for quick layout checks"
+    )
+    parser.add_argument("book", help="Book name (books/<book>.md)")
+    selection = parser.add_mutually_exclusive_group(required=True)
+    selection.add_argument(
+        "--chapters", help="Chapter numbers to render, e.g. 3 or 2,5 or 4-6"
+    )
+    selection.add_argument(
+        "--from", dest="start_heading", help="First heading to render (text match)"
+    )
+    selection.add_argument(
+        "--list", action="store_true", help="List the book's chapters and exit"
+    )
+    parser.add_argument(
+        "--to", dest="end_heading", help="Last heading to render (with --from)"
+    )
+    parser.add_argument(
+        "--level", type=int, help="Heading level that counts as a chapter (default: auto)"
+    )
+    parser.add_argument(
+        "--output", help="Preview PDF path (default: .cache/preview/<book>.pdf)"
+    )
+
+    args = parser.parse_args()
+
+    if args.end_heading and args.chapters:
+        parser.error("--to cannot be combined with --chapters (use --from ... --to)")
+    if args.end_heading and not args.start_heading:
+        parser.error("--to requires --from")
+
+    source_path = os.path.join(REPO_ROOT, "books", f"{args.book}.md")
+    if not os.path.exists(source_path):
+        print(f"Error: Book {args.book}.md not found")
+        sys.exit(1)
+
+    with open(source_path, "r", encoding="utf-8") as f:
+        source = f.read()
+
+    if args.list:
+        lines = source.split("\n")
+        headings = parse_sections(lines)
+        level = args.level or chapter_level(headings)
+        print(f"📖 Chapters in {args.book} (heading level {level}):")
+        for n, (title, _start, _end) in enumerate(chapters(lines, headings, level), 1):
+            print(f"  {n:>3}. {title}")
+        return
+
+    try:
+        markdown, description = slice_book(
+            source, args.chapters, args.start_heading, args.end_heading, args.level
+        )
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    scratch = os.path.join(PREVIEW_DIR, args.book)
+    books_dir = os.path.join(scratch, "books")
+    os.makedirs(books_dir, exist_ok=True)
+    with open(os.path.join(books_dir, f"{args.book}.md"), "w", encoding="utf-8") as f:
+        f.write(markdown)
+
+    print(f"🔍 Previewing {args.book}: {description}")
+    started = time.time()
+    result = subprocess.run(
+        ["bash", "scripts/build-all-formats.sh", args.book],
+        cwd=REPO_ROOT,
+        env=build_env(scratch),
+    )
+    if result.returncode != 0:
+        print(f"Error: Preview build failed with exit code {result.returncode}")
+        sys.exit(result.returncode)
+
+    built_pdf = os.path.join(scratch, "public", args.book, f"{args.book}.pdf")
+    if not os.path.exists(built_pdf):
+        print("Error: No PDF was produced (is WeasyPrint installed?)")
+        sys.exit(1)
+
+    output = args.output or os.path.join(PREVIEW_DIR, f"{args.book}.pdf")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    shutil.copyfile(built_pdf, output)
+    print(f"✓ Preview PDF ready in {time.time() - started:.1f}s: {output}")
+
+
+if __name__ == "__main__":
+    main()
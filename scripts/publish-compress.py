@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Minify and precompress published text artifacts
+Minifies HTML (keeping <pre>, <textarea>, <script> and <style> contents intact,
+apart from CSS minification inside <style>) and CSS, then writes .gz and .br
+sidecars for every text artifact in parallel, so a static server can send the
+precompressed files instead of compressing on each request. Before/after sizes
+are recorded in .cache/compress-report.json
+"""
+
+import os
+import re
+import gzip
+import json
+import shutil
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_REPORT = os.path.join(REPO_ROOT, ".cache", "compress-report.json")
+TEXT_EXTENSIONS = {".html", ".css", ".js", ".json", ".svg", ".xml", ".txt"}
+SIDECARS = (".gz", ".br")
+# Below this size a sidecar is not worth the extra file
+MIN_SIZE = 512
+
+# Whitespace is significant in these, and in Mermaid sources (rendered client-side)
+PRESERVE_RE = re.compile(
+    r"(<(pre|textarea|script|style)\b[^>]*>.*?</\2\s*>"
+    r"|<div\b[^>]*\bclass=\"[^\"]*(?<![\w-])mermaid(?![\w-])[^\"]*\"[^>]*>.*?</div\s*>)",
+    re.S | re.I,
+)
+STYLE_RE = re.compile(r"(<style\b[^>]*>)(.*?)(</style\s*>)", re.S | re.I)
+COMMENT_RE = re.compile(r"<!--(?!\[if).*?-->", re.S)
+CSS_TOKEN_RE = re.compile(r"(\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*'|/\*.*?\*/)", re.S)
+CSS_STRING_RE = re.compile(r"(\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*')", re.S)
+CSS_PUNCT_RE = re.compile(r"\s*([{};,>])\s*")
+
+
+def minify_css(css):
+    """Drop comments and redundant whitespace; strings are left untouched"""
+    # Comments go first so the whitespace around them collapses with its neighbours
+    parts = CSS_TOKEN_RE.split(css)
+    css = "".join(
+        part
+        for i, part in enumerate(parts)
+        if not (i % 2 and part.startswith("/*") and not part.startswith("/*!"))
+    )
+
+    out = []
+    for i, part in enumerate(CSS_STRING_RE.split(css)):
+        if i % 2:
+            out.append(part)
+            continue
+        part = re.sub(r"\s+", " ", part)
+        # Spaces around ':' are kept, they are significant in selectors
+        part = CSS_PUNCT_RE.sub(r"\1", part)
+        # The last declaration's ';' is redundant (only outside strings)
+        out.append(part.replace(";}", "}"))
+    return "".join(out).strip()
+
+
+def minify_html(markup):
+    """Collapse whitespace runs outside preserved blocks and drop comments"""
+    out = []
+    for i, part in enumerate(PRESERVE_RE.split(markup)):
+        # split() yields text, block, tag name, text, block, tag name, ...
+        kind = i % 3
+        if kind == 2:
+            continue
+        if kind == 1:
+            if part[:6].lower() == "<style":
+                part = STYLE_RE.sub(
+                    lambda m: m.group(1) + minify_css(m.group(2)) + m.group(3), part
+                )
+            out.append(part)
+            continue
+        part = COMMENT_RE.sub("", part)
+        out.append(re.sub(r"\s+", " ", part))
+    return "".join(out).strip() + "\n"
+
+
+def write_atomic(path, data):
+    """Replace path via a temp file (published files may be hardlinked store entries)"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".compress-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        if os.path.exists(path):
+            shutil.copymode(path, tmp_path)
+        else:
+            os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def brotli_compress(data):
+    if brotli is not None:
+        return brotli.compress(data, quality=11)
+    if shutil.which("brotli"):
+        result = subprocess.run(
+            ["brotli", "--best", "--stdout", "-"], input=data, capture_output=True, check=True
+        )
+        return result.stdout
+    return None
+
+
+def process_file(path, minify):
+    """Minify one artifact and write its sidecars; returns its size record"""
+    with open(path, "rb") as f:
+        data = f.read()
+    record = {"original": len(data)}
+
+    ext = os.path.splitext(path)[1].lower()
+    if minify and ext in (".html", ".css"):
+        text = data.decode("utf-8")
+        minified = minify_html(text) if ext == ".html" else minify_css(text) + "\n"
+        if minified != text:
+            data = minified.encode("utf-8")
+            write_atomic(path, data)
+    record["minified"] = len(data)
+
+    compressed = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+    if len(data) >= MIN_SIZE:
+        br = brotli_compress(data)
+        if br is not None:
+            compressed[".br"] = br
+
+    for suffix in SIDECARS:
+        sidecar = path + suffix
+        payload = compressed.get(suffix)
+        if len(data) >= MIN_SIZE and payload is not None and len(payload) < len(data):
+            write_atomic(sidecar, payload)
+            record[suffix.lstrip(".")] = len(payload)
+        elif os.path.exists(sidecar):
+            os.unlink(sidecar)
+    return path, record
+
+
+def text_artifacts(root):
+    """Text files under root, and sidecars whose source no longer exists"""
+    artifacts, orphans = [], []
+    for dirpath, dirs, files in os.walk(root):
+        if dirpath == root:
+            # Content-addressed store entries are never served directly
+            dirs[:] = [d for d in dirs if d != "assets"]
+        for name in files:
+            path = os.path.join(dirpath, name)
+            if name.endswith(SIDECARS):
+                if not os.path.exists(path[:-3]):
+                    orphans.append(path)
+            elif os.path.splitext(name)[1].lower() in TEXT_EXTENSIONS and not name.startswith("."):
+                artifacts.append(path)
+    return sorted(artifacts), orphans
+
+
+def format_size(size):
+    return f"{size / 1024:.1f} KB" if size < 1024 * 1024 else f"{size / 1024 / 1024:.2f} MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Minify HTML/CSS and write .gz/.br sidecars for published artifacts"
+    )
+    parser.add_argument(
+        "paths", nargs="*", default=["public"], help="Files or directories (default: public)"
+    )
+    parser.add_argument("--no-minify", action="store_true", help="Only precompress")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument(
+        "--report", default=DEFAULT_REPORT, help="Where before/after sizes are recorded"
+    )
+
+    args = parser.parse_args()
+
+    files, orphans = [], []
+    for path in args.paths:
+        if os.path.isdir(path):
+            found, stale = text_artifacts(path)
+            files += found
+            orphans += stale
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            print(f"Warning: Skipping missing path: {path}")
+
+    for orphan in orphans:
+        os.unlink(orphan)
+
+    if not files:
+        print("No text artifacts to compress")
+        return
+
+    if brotli is None and not shutil.which("brotli"):
+        print("Warning: brotli is not installed, writing .gz sidecars only")
+        print("Install with: pip install brotli")
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        results = dict(
+            executor.map(process_file, files, [not args.no_minify] * len(files))
+        )
+
+    # Files without a sidecar are served as-is, so they count at their minified size
+    totals = {
+        key: sum(record.get(key, record["minified"]) for record in results.values())
+        for key in ("original", "minified", "gz", "br")
+    }
+    print(f"🗜️  Minified and precompressed {len(results)} text artifact(s)")
+    print(f"   original {format_size(totals['original'])} → minified {format_size(totals['minified'])}")
+    brotli_total = format_size(totals["br"]) if any("br" in r for r in results.values()) else "n/a"
+    print(f"   gzip {format_size(totals['gz'])}, brotli {brotli_total}")
+
+    previous = {}
+    if os.path.exists(args.report):
+        with open(args.report, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+    previous.update({os.path.relpath(path): record for path, record in results.items()})
+    os.makedirs(os.path.dirname(os.path.abspath(args.report)), exist_ok=True)
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(previous, f, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
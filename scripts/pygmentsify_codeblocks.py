@@ -1,50 +1,236 @@
+#!/usr/bin/env python3
+"""
+Build-time syntax highlighting shared by all formats
+Highlights <pre><code class="language-*"> blocks once with Pygments into
+class-based markup, embeds the matching stylesheet and drops client-side Prism,
+so the HTML, PDF and EPUB editions all reuse the same highlighted markup.
+The Pygments style follows the template: a dark one on dark <pre> backgrounds
+"""
+
 import sys
 import os
+import re
+import argparse
 from bs4 import BeautifulSoup
-from pygments import highlight
-from pygments.lexers import get_lexer_by_name, guess_lexer
-from pygments.formatters import HtmlFormatter
-
-if len(sys.argv) != 2:
-    print("Usage: python pygmentsify_codeblocks.py <html_file>")
-    sys.exit(1)
-
-html_file = sys.argv[1]
-if not os.path.exists(html_file):
-    print(f"Error: HTML file not found: {html_file}")
-    sys.exit(1)
-
-with open(html_file, "r", encoding="utf-8") as f:
-    soup = BeautifulSoup(f, "html.parser")
-
-formatter = HtmlFormatter(style="monokai", noclasses=False)
-css = formatter.get_style_defs(".highlight")
-
-# Embed Pygments CSS in <head>
-head = soup.find("head")
-if head:
-    style_tag = soup.new_tag("style")
-    style_tag.string = css
-    head.append(style_tag)
+
+import build_cache
+
+LIGHT_STYLE = "default"
+DARK_STYLE = "monokai"
+STYLE_TAG_ID = "pygments-css"
+THEMES = ["light", "dark"]
+
+COLOR_SCHEME_RE = re.compile(r"@media\s*\(\s*prefers-color-scheme:\s*(light|dark)\s*\)\s*\{")
+VARIABLE_RE = re.compile(r"(--[a-zA-Z0-9-_]+)\s*:\s*([^;]+);")
+RULE_RE = re.compile(r"([^{}]+)\{([^{}]*)\}")
+BACKGROUND_RE = re.compile(r"background(?:-color)?\s*:\s*([^;]+)")
+
+# Pygments is imported only on a cache miss: its lexer registry is slow to load
+_formatter = None
+
+
+def highlight_code(code, lang):
+    """Return class-based highlighted HTML for a code block (cached by content)"""
+    key = build_cache.content_hash("highlight", lang, code)
+    # Local only: Pygments is faster than a round trip to the shared cache per block
+    cached = build_cache.get_text("highlight", key, ".html", shared=False)
+    if cached is not None:
+        return cached
+
+    global _formatter
+    from pygments import highlight
+    from pygments.lexers import get_lexer_by_name, guess_lexer
+    from pygments.util import ClassNotFound
+
+    if _formatter is None:
+        from pygments.formatters import HtmlFormatter
+        _formatter = HtmlFormatter(cssclass="highlight", noclasses=False)
+
+    try:
+        lexer = get_lexer_by_name(lang)
+    except ClassNotFound:
+        lexer = guess_lexer(code)
+    highlighted = highlight(code, lexer, _formatter)
+
+    build_cache.put_text("highlight", key, highlighted, ".html", shared=False)
+    return highlighted
+
+
+def scheme_css(css, theme):
+    """The template CSS as seen in one color scheme: its @media blocks apply,
+    the other scheme's are dropped (no theme: everything, last definition wins,
+    as preprocess-css.py does for the PDF)"""
+    if not theme:
+        return css
+    out, last = [], 0
+    for match in COLOR_SCHEME_RE.finditer(css):
+        depth, pos = 1, match.end()
+        while depth and pos < len(css):
+            depth += {"{": 1, "}": -1}.get(css[pos], 0)
+            pos += 1
+        out.append(css[last:match.start()])
+        if match.group(1) == theme:
+            out.append(css[match.end():pos - 1])
+        last = pos
+    out.append(css[last:])
+    return "".join(out)
+
+
+def pre_background(css, theme=None):
+    """Background colour of <pre> blocks in the template, with variables resolved"""
+    css = re.sub(r"/\*.*?\*/", "", scheme_css(css, theme), flags=re.S)
+    variables = dict(VARIABLE_RE.findall(css))
+    background = None
+    for selectors, body in RULE_RE.findall(css):
+        if "pre" in (selector.strip() for selector in selectors.split(",")):
+            match = BACKGROUND_RE.search(body)
+            if match:
+                background = match.group(1).strip()
+    for _ in range(5):  # variables may refer to other variables
+        if not background or "var(" not in background:
+            break
+        background = re.sub(
+            r"var\((--[a-zA-Z0-9-_]+)[^)]*\)", lambda m: variables.get(m.group(1), ""), background
+        )
+    return background
+
+
+def is_dark(color):
+    """Whether a #rgb, #rrggbb or rgb() colour is dark (None if unknown)"""
+    if not color:
+        return None
+    match = re.search(r"#([0-9a-fA-F]{3}|[0-9a-fA-F]{6})\b", color)
+    if match:
+        digits = match.group(1)
+        if len(digits) == 3:
+            digits = "".join(d * 2 for d in digits)
+        rgb = [int(digits[i:i + 2], 16) for i in (0, 2, 4)]
+    else:
+        match = re.search(r"rgba?\(\s*(\d+)[\s,]+(\d+)[\s,]+(\d+)", color)
+        if not match:
+            return None
+        rgb = [int(value) for value in match.groups()]
+    return (0.299 * rgb[0] + 0.587 * rgb[1] + 0.114 * rgb[2]) / 255 < 0.5
+
+
+def template_style(css_file, theme=None):
+    """Pygments style readable on the template's <pre> background"""
+    with open(css_file, "r", encoding="utf-8") as f:
+        css = f.read()
+    return DARK_STYLE if is_dark(pre_background(css, theme)) else LIGHT_STYLE
+
+
+def stylesheet(light_style=LIGHT_STYLE, dark_style=DARK_STYLE):
+    """Pygments CSS for light pages, with a dark variant for dark color schemes
+    (a single style when both are the same)"""
+    from pygments.formatters import HtmlFormatter
+
+    light = HtmlFormatter(style=light_style).get_style_defs(".highlight")
+    if dark_style == light_style:
+        return light + "\n"
+    dark = HtmlFormatter(style=dark_style).get_style_defs(".highlight")
+    return f"{light}\n@media (prefers-color-scheme: dark) {{\n{dark}\n}}\n"
+
+
+def template_stylesheet(css_file=None, theme=None, single=False):
+    """Pygments CSS matching a template: both color schemes for the web, or one
+    style only (the PDF and EPUB have no prefers-color-scheme)"""
+    if not css_file:
+        return stylesheet(LIGHT_STYLE, LIGHT_STYLE) if single or theme else stylesheet()
+    if single or theme:
+        style = template_style(css_file, theme)
+        return stylesheet(style, style)
+    return stylesheet(template_style(css_file, "light"), template_style(css_file, "dark"))
+
+
+def remove_prism(soup):
+    """Remove Prism.js stylesheets and scripts; highlighting is done at build time"""
+    for link in soup.find_all("link", href=lambda x: x and "prism" in x.lower()):
+        link.decompose()
+    for script in soup.find_all("script", src=lambda x: x and "prism" in x.lower()):
+        script.decompose()
+
+
+def embed_stylesheet(soup, css=None):
+    """Embed the Pygments CSS in <head>, replacing an earlier one (e.g. the web
+    stylesheet in the HTML copied for the PDF)"""
+    head = soup.find("head")
+    if head is None:
+        return
+    style_tag = soup.find("style", id=STYLE_TAG_ID)
+    if style_tag is None:
+        style_tag = soup.new_tag("style", id=STYLE_TAG_ID)
+        head.append(style_tag)
+    style_tag.string = css if css is not None else stylesheet()
     print("✓ Embedded Pygments CSS in HTML head")
 
-# Highlight all code blocks
-for pre in soup.find_all("pre"):
-    code = pre.find("code")
-    if code and code.has_attr("class"):
+
+def highlight_soup(soup, css=None):
+    """Highlight every language-tagged code block in the document"""
+    count = 0
+    for pre in soup.find_all("pre"):
+        code = pre.find("code")
+        if not code or not code.has_attr("class"):
+            continue
         lang_class = next((c for c in code["class"] if c.startswith("language-")), None)
-        if lang_class:
-            lang = lang_class.replace("language-", "")
-            try:
-                lexer = get_lexer_by_name(lang)
-            except Exception:
-                lexer = guess_lexer(code.get_text())
-            highlighted = highlight(code.get_text(), lexer, formatter)
-            # Replace <pre><code>...</code></pre> with highlighted HTML
-            new_soup = BeautifulSoup(highlighted, "html.parser")
-            pre.replace_with(new_soup)
-            print(f"✓ Highlighted code block: {lang}")
-
-with open(html_file, "w", encoding="utf-8") as f:
-    f.write(str(soup))
-    print(f"✓ Updated HTML with Pygments highlighting: {html_file}")
+        if not lang_class:
+            continue
+
+        lang = lang_class.replace("language-", "")
+        highlighted = highlight_code(code.get_text(), lang)
+        # Replace <pre><code>...</code></pre> with highlighted HTML
+        pre.replace_with(BeautifulSoup(highlighted, "html.parser"))
+        count += 1
+
+    remove_prism(soup)
+    embed_stylesheet(soup, css)
+    return count
+
+
+def process_html_file(html_file, css=None):
+    with open(html_file, "r", encoding="utf-8") as f:
+        soup = BeautifulSoup(f, "html.parser")
+
+    count = highlight_soup(soup, css)
+
+    with open(html_file, "w", encoding="utf-8") as f:
+        f.write(str(soup))
+    print(f"✓ Highlighted {count} code block(s) with Pygments: {html_file}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Highlight code blocks at build time with Pygments"
+    )
+    parser.add_argument("html_file", nargs="?", help="HTML file to process")
+    parser.add_argument(
+        "--css", help="Template stylesheet; the Pygments style follows its <pre> background"
+    )
+    parser.add_argument(
+        "--theme", choices=THEMES,
+        help="One Pygments style, for this color scheme of the template (PDF)",
+    )
+    parser.add_argument(
+        "--stylesheet", action="store_true", help="Print the Pygments CSS instead of processing HTML"
+    )
+    args = parser.parse_args()
+
+    if args.css and not os.path.exists(args.css):
+        print(f"Error: CSS file not found: {args.css}")
+        sys.exit(1)
+    css = template_stylesheet(args.css, args.theme)
+
+    if args.stylesheet:
+        sys.stdout.write(css)
+        return
+    if not args.html_file:
+        parser.error("html_file is required unless --stylesheet is given")
+    if not os.path.exists(args.html_file):
+        print(f"Error: HTML file not found: {args.html_file}")
+        sys.exit(1)
+
+    process_html_file(args.html_file, css)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Prerender Mermaid diagrams as static SVG for the HTML edition
+Replaces mermaid divs with inline (or linked) SVG rendered at build time and
+removes the client-side Mermaid script, so browsers no longer lay out diagrams
+"""
+
+import sys
+import os
+import argparse
+
+import asset_store
+import mermaid_render
+
+
+def remove_mermaid_script(soup):
+    """Remove the client-side Mermaid module import from the page"""
+    removed = 0
+    for script in soup.find_all("script"):
+        src = script.get("src") or ""
+        if "mermaid" in src.lower() or "mermaid" in (script.string or "").lower():
+            script.decompose()
+            removed += 1
+    return removed
+
+
+def build_svg_element(soup, svg_content, index):
+    """Parse rendered SVG markup into an element that can be inlined"""
+    from bs4 import BeautifulSoup
+
+    svg_soup = BeautifulSoup(svg_content.decode("utf-8"), "html.parser")
+    svg = svg_soup.find("svg")
+    if svg is None:
+        return None
+
+    wrapper = soup.new_tag("div")
+    wrapper["class"] = "mermaid-rendered"
+    wrapper["role"] = "img"
+    wrapper["aria-label"] = f"Mermaid diagram {index}"
+    wrapper["style"] = "max-width: 100%; margin: 1em auto; text-align: center;"
+    wrapper.append(svg)
+    return wrapper
+
+
+def build_img_element(soup, svg_content, key, output_dir, html_dir, index):
+    """Link the SVG next to the HTML and return an <img> referencing it"""
+    svg_path = asset_store.add_bytes(
+        svg_content, os.path.join(output_dir, f"mermaid_{key[:12]}.svg")
+    )
+
+    img_tag = soup.new_tag("img")
+    img_tag["src"] = os.path.relpath(svg_path, html_dir).replace(os.sep, "/")
+    img_tag["alt"] = f"Mermaid diagram {index}"
+    img_tag["loading"] = "lazy"
+    img_tag["decoding"] = "async"
+    img_tag["style"] = "max-width: 100%; height: auto; display: block; margin: 1em auto;"
+    img_tag["class"] = "mermaid-rendered"
+    return img_tag
+
+
+def process_html(html_file_path, link=False, output_dir=None):
+    """Render every Mermaid diagram in the HTML file to static SVG"""
+
+    with open(html_file_path, "r", encoding="utf-8") as f:
+        html_content = f.read()
+
+    # No diagrams and no Mermaid script to remove: skip parsing (and importing bs4)
+    if "mermaid" not in html_content:
+        print("No Mermaid diagrams found in HTML")
+        return True
+
+    from bs4 import BeautifulSoup
+
+    if not mermaid_render.check_mermaid_cli():
+        print(
+            "Warning: mermaid-cli (mmdc) not found. Install with: npm install -g @mermaid-js/mermaid-cli"
+        )
+        print("Only flowcharts, sequence diagrams (built-in renderer) and cached diagrams can be prerendered.")
+
+    html_dir = os.path.dirname(os.path.abspath(html_file_path))
+    if output_dir is None:
+        output_dir = os.path.join(html_dir, "mermaid-images")
+
+    soup = BeautifulSoup(html_content, "html.parser")
+
+    mermaid_divs = soup.find_all("div", class_="mermaid")
+
+    if not mermaid_divs:
+        print("No Mermaid diagrams found in HTML")
+        if remove_mermaid_script(soup):
+            print("✓ Removed unused client-side Mermaid script")
+        with open(html_file_path, "w", encoding="utf-8") as f:
+            f.write(str(soup))
+        return True
+
+    print(f"Found {len(mermaid_divs)} Mermaid diagrams to prerender as SVG...")
+
+    failed = 0
+    for i, div in enumerate(mermaid_divs, start=1):
+        mermaid_code = div.get_text().strip()
+        if not mermaid_code:
+            continue
+
+        key, svg_content = mermaid_render.render_mermaid(mermaid_code, "svg")
+        element = None
+        if svg_content is not None:
+            if link:
+                element = build_img_element(
+                    soup, svg_content, key, output_dir, html_dir, i
+                )
+            else:
+                element = build_svg_element(soup, svg_content, i)
+
+        if element is None:
+            failed += 1
+            print(f"✗ Failed to prerender diagram {i}")
+            continue
+
+        div.replace_with(element)
+        print(f"✓ Prerendered diagram {i} as SVG")
+
+    # Keep the client-side renderer only when some diagrams still need it
+    if failed == 0:
+        if remove_mermaid_script(soup):
+            print("✓ Removed client-side Mermaid script")
+    else:
+        print(f"Warning: {failed} diagram(s) left for client-side rendering")
+
+    with open(html_file_path, "w", encoding="utf-8") as f:
+        f.write(str(soup))
+
+    print(f"✓ Processed HTML file: {html_file_path}")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Prerender Mermaid diagrams as static SVG for the HTML edition"
+    )
+    parser.add_argument("html_file", help="HTML file to process")
+    parser.add_argument(
+        "--link",
+        action="store_true",
+        help="Write SVG files and reference them with <img> instead of inlining",
+    )
+    parser.add_argument(
+        "--output-dir",
+        help="Directory to store linked SVG files (default: mermaid-images/ in same dir as HTML)",
+    )
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.html_file):
+        print(f"Error: HTML file not found: {args.html_file}")
+        sys.exit(1)
+
+    success = process_html(args.html_file, args.link, args.output_dir)
+
+    if not success:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
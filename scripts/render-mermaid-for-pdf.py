@@ -1,98 +1,76 @@
 #!/usr/bin/env python3
 """
-Render Mermaid diagrams as PNG for PDF generation
-Replaces mermaid divs with rendered PNG images for PDF compatibility
-This avoids issues with SVG foreignObject elements in PDF rendering
+Render Mermaid diagrams as images for PDF (and EPUB) generation
+Replaces mermaid divs with embedded images. By default diagrams are vector SVG
+without foreignObject elements (which WeasyPrint cannot draw): the built-in
+renderer's SVG, or mmdc's with labels as SVG text. Diagrams that only render
+with foreignObject fall back to PNG; PDF_DIAGRAMS=png (build.sh
+--raster-diagrams) or --png rasterizes every diagram as before
 """
 
 import sys
 import os
 import re
 import base64
-import tempfile
-import subprocess
 from pathlib import Path
-from bs4 import BeautifulSoup
 import argparse
 
+import asset_store
+import mermaid_render
+
 
 def check_mermaid_cli():
     """Check if mermaid-cli is available"""
-    try:
-        result = subprocess.run(
-            ["mmdc", "--version"], capture_output=True, text=True, timeout=5
-        )
-        return result.returncode == 0
-    except (subprocess.TimeoutExpired, FileNotFoundError):
-        return False
-
-
-def render_mermaid_to_png(mermaid_code, output_dir):
-    """Render Mermaid code to PNG using mermaid-cli"""
-    try:
-        # Create temporary input file
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".mmd", delete=False) as f:
-            f.write(mermaid_code)
-            input_file = f.name
-
-        # Create output file path
-        output_file = os.path.join(
-            output_dir, f"mermaid_{hash(mermaid_code) % 10000}.png"
-        )
+    return mermaid_render.check_mermaid_cli()
 
-        # Render using mermaid-cli
-        cmd = [
-            "mmdc",
-            "-i",
-            input_file,
-            "-o",
-            output_file,
-            "--backgroundColor",
-            "transparent",
-            "--width",
-            "800",
-        ]
-
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-
-        # Clean up temp file
-        os.unlink(input_file)
-
-        if result.returncode == 0 and os.path.exists(output_file):
-            return output_file
-        else:
-            print(f"Warning: Failed to render mermaid diagram: {result.stderr}")
-            return None
 
-    except Exception as e:
-        print(f"Error rendering mermaid diagram: {e}")
+def render_mermaid_to_image(mermaid_code, output_dir, vector=True):
+    """Render Mermaid code to vector SVG or PNG, cached by diagram source"""
+    key, content, fmt = mermaid_render.render_mermaid_image(mermaid_code, vector=vector)
+    if content is None:
         return None
 
+    # Name the file after the diagram source so names are stable across builds
+    # Identical diagrams across books share one copy in the asset store
+    output_file = os.path.join(output_dir, f"mermaid_{key[:12]}.{fmt}")
+    return asset_store.add_bytes(content, output_file)
 
-def embed_png_as_data_url(png_file_path):
-    """Convert PNG file to data URL for embedding in HTML"""
+
+def embed_image_as_data_url(image_file_path):
+    """Convert PNG (or SVG) file to data URL for embedding in HTML"""
+    mime_type = "image/svg+xml" if image_file_path.endswith(".svg") else "image/png"
     try:
-        with open(png_file_path, "rb") as f:
-            png_content = f.read()
+        with open(image_file_path, "rb") as f:
+            image_content = f.read()
 
         # Encode as base64
-        png_encoded = base64.b64encode(png_content).decode("utf-8")
-        return f"data:image/png;base64,{png_encoded}"
+        image_encoded = base64.b64encode(image_content).decode("utf-8")
+        return f"data:{mime_type};base64,{image_encoded}"
 
     except Exception as e:
-        print(f"Error encoding PNG: {e}")
+        print(f"Error encoding image: {e}")
         return None
 
 
-def process_html_for_pdf(html_file_path, output_dir=None):
+def process_html_for_pdf(html_file_path, output_dir=None, vector=True):
     """Process HTML file to render Mermaid diagrams for PDF"""
 
+    # Read HTML file
+    with open(html_file_path, "r", encoding="utf-8") as f:
+        html_content = f.read()
+
+    # Most chapters have no diagrams: skip parsing (and importing bs4) entirely
+    if "mermaid" not in html_content:
+        print("No Mermaid diagrams found in HTML")
+        return True
+
+    from bs4 import BeautifulSoup
+
     if not check_mermaid_cli():
         print(
             "Warning: mermaid-cli (mmdc) not found. Install with: npm install -g @mermaid-js/mermaid-cli"
         )
-        print("Mermaid diagrams will not be rendered in PDF.")
-        return False
+        print("Only flowcharts and sequence diagrams (built-in renderer) will be rendered in PDF.")
 
     # Create output directory for SVG files
     if output_dir is None:
@@ -100,10 +78,6 @@ def process_html_for_pdf(html_file_path, output_dir=None):
 
     os.makedirs(output_dir, exist_ok=True)
 
-    # Read HTML file
-    with open(html_file_path, "r", encoding="utf-8") as f:
-        html_content = f.read()
-
     soup = BeautifulSoup(html_content, "html.parser")
 
     # Find all mermaid divs
@@ -113,7 +87,8 @@ def process_html_for_pdf(html_file_path, output_dir=None):
         print("No Mermaid diagrams found in HTML")
         return True
 
-    print(f"Found {len(mermaid_divs)} Mermaid diagrams to render as PNG...")
+    kind = "vector SVG" if vector else "PNG"
+    print(f"Found {len(mermaid_divs)} Mermaid diagrams to render as {kind}...")
 
     for i, div in enumerate(mermaid_divs):
         mermaid_code = div.get_text().strip()
@@ -123,12 +98,12 @@ def process_html_for_pdf(html_file_path, output_dir=None):
 
         print(f"Rendering diagram {i+1}/{len(mermaid_divs)}...")
 
-        # Render to PNG
-        png_file = render_mermaid_to_png(mermaid_code, output_dir)
+        # Render to SVG or PNG
+        image_file = render_mermaid_to_image(mermaid_code, output_dir, vector)
 
-        if png_file:
+        if image_file:
             # Convert to data URL
-            data_url = embed_png_as_data_url(png_file)
+            data_url = embed_image_as_data_url(image_file)
 
             if data_url:
                 # Replace div with img
@@ -143,7 +118,7 @@ def process_html_for_pdf(html_file_path, output_dir=None):
                 # Replace the div with the img
                 div.replace_with(img_tag)
 
-                print(f"✓ Rendered diagram {i+1} as PNG")
+                print(f"✓ Rendered diagram {i+1} as {image_file.rsplit('.', 1)[-1].upper()}")
             else:
                 print(f"✗ Failed to encode diagram {i+1}")
         else:
@@ -159,12 +134,18 @@ def process_html_for_pdf(html_file_path, output_dir=None):
 
 def main():
     parser = argparse.ArgumentParser(
-        description="Render Mermaid diagrams as PNG for PDF generation"
+        description="Render Mermaid diagrams as vector SVG (or PNG) for PDF generation"
     )
     parser.add_argument("html_file", help="HTML file to process")
     parser.add_argument(
         "--output-dir",
-        help="Directory to store PNG files (default: mermaid-images/ in same dir as HTML)",
+        help="Directory to store image files (default: mermaid-images/ in same dir as HTML)",
+    )
+    parser.add_argument(
+        "--png",
+        action="store_true",
+        default=os.environ.get("PDF_DIAGRAMS") == "png",
+        help="Rasterize every diagram to PNG (default: vector SVG, PNG as fallback)",
     )
 
     args = parser.parse_args()
@@ -173,7 +154,7 @@ def main():
         print(f"Error: HTML file not found: {args.html_file}")
         sys.exit(1)
 
-    success = process_html_for_pdf(args.html_file, args.output_dir)
+    success = process_html_for_pdf(args.html_file, args.output_dir, vector=not args.png)
 
     if not success:
         sys.exit(1)
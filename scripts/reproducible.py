@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Reproducible-build helpers
+Pins every timestamp and identifier that would otherwise change between builds
+of unchanged sources: SOURCE_DATE_EPOCH for dates, identifiers derived from the
+book name, and EPUB archives rewritten with sorted entries and fixed metadata
+"""
+
+import sys
+import os
+import re
+import uuid
+import zipfile
+import argparse
+import tempfile
+import datetime
+
+# Namespace for stable per-book identifiers (EPUB dc:identifier, PDF /ID)
+BOOK_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "https://github.com/Param-Harrison/ebook-writer")
+
+# Earliest timestamp a zip entry can hold
+ZIP_EPOCH = datetime.datetime(1980, 1, 1, tzinfo=datetime.timezone.utc)
+
+MODIFIED_RE = re.compile(
+    r'(<meta\s+property="dcterms:modified"\s*>)[^<]*(</meta>)', re.I
+)
+DATE_RE = re.compile(r"(<dc:date[^>]*>)[^<]*(</dc:date>)", re.I)
+IDENTIFIER_RE = re.compile(r'(<dc:identifier\s+id="[^"]*"\s*>)[^<]*(</dc:identifier>)', re.I)
+UUID_URN_RE = re.compile(r"urn:uuid:[0-9a-f-]{36}", re.I)
+
+
+def source_date_epoch():
+    """SOURCE_DATE_EPOCH as an int, or None when reproducible mode is off"""
+    value = os.environ.get("SOURCE_DATE_EPOCH")
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        print(f"Warning: Ignoring invalid SOURCE_DATE_EPOCH: {value}")
+        return None
+
+
+def source_datetime(epoch):
+    return datetime.datetime.fromtimestamp(epoch, datetime.timezone.utc)
+
+
+def iso_timestamp(epoch):
+    """Timestamp in the form EPUB and PDF metadata expect (UTC, no fraction)"""
+    return source_datetime(epoch).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def book_uuid(book_name):
+    """Stable UUID for a book, the same on every build and machine"""
+    return uuid.uuid5(BOOK_NAMESPACE, book_name)
+
+
+def _zip_date_time(epoch):
+    stamp = max(source_datetime(epoch), ZIP_EPOCH)
+    return stamp.timetuple()[:6]
+
+
+def _pin_opf(content, epoch, identifier):
+    """Pin the modification date and identifier in an OPF package document"""
+    timestamp = iso_timestamp(epoch)
+    content = MODIFIED_RE.sub(rf"\g<1>{timestamp}\g<2>", content)
+    content = DATE_RE.sub(rf"\g<1>{timestamp}\g<2>", content)
+    if identifier:
+        content = IDENTIFIER_RE.sub(rf"\g<1>{identifier}\g<2>", content)
+    return content
+
+
+def normalize_epub(path, epoch, identifier=None):
+    """Rewrite an EPUB deterministically: mimetype first and stored, other
+    entries sorted, fixed timestamps and permissions, pinned OPF metadata"""
+    with zipfile.ZipFile(path) as source:
+        entries = {info.filename: source.read(info) for info in source.infolist()}
+
+    # Pandoc writes a random urn:uuid when no identifier is given; replace it everywhere
+    random_ids = set()
+    for name, data in entries.items():
+        if name.endswith(".opf"):
+            random_ids.update(UUID_URN_RE.findall(data.decode("utf-8", errors="replace")))
+
+    date_time = _zip_date_time(epoch)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".epub")
+    os.close(fd)
+    try:
+        with zipfile.ZipFile(tmp_path, "w") as target:
+            names = sorted(entries, key=lambda name: (name != "mimetype", name))
+            for name in names:
+                data = entries[name]
+                if identifier and name.endswith((".opf", ".ncx", ".xhtml")):
+                    text = data.decode("utf-8")
+                    for random_id in random_ids:
+                        text = text.replace(random_id, identifier)
+                    if name.endswith(".opf"):
+                        text = _pin_opf(text, epoch, identifier)
+                    data = text.encode("utf-8")
+
+                info = zipfile.ZipInfo(name, date_time=date_time)
+                info.external_attr = 0o644 << 16
+                info.create_system = 3
+                if name == "mimetype":
+                    info.compress_type = zipfile.ZIP_STORED
+                else:
+                    info.compress_type = zipfile.ZIP_DEFLATED
+                target.writestr(info, data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def epub_digest(path):
+    """Digest of an EPUB's content, ignoring what pandoc changes on every build
+    (the random urn:uuid identifier and the modification date) and zip metadata"""
+    import build_cache
+
+    with zipfile.ZipFile(path) as epub:
+        entries = {info.filename: epub.read(info) for info in epub.infolist()}
+
+    parts = []
+    for name in sorted(entries):
+        data = entries[name]
+        if name.endswith((".opf", ".ncx", ".xhtml")):
+            text = UUID_URN_RE.sub("urn:uuid:", data.decode("utf-8", errors="replace"))
+            if name.endswith(".opf"):
+                text = MODIFIED_RE.sub(r"\g<1>\g<2>", text)
+                text = DATE_RE.sub(r"\g<1>\g<2>", text)
+                text = IDENTIFIER_RE.sub(r"\g<1>\g<2>", text)
+            data = text.encode("utf-8")
+        parts += [name, data]
+    return build_cache.content_hash(*parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Make build artifacts byte-identical across rebuilds"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    epub_parser = subparsers.add_parser("epub", help="Normalize an EPUB archive")
+    epub_parser.add_argument("epub_file", help="EPUB file to rewrite in place")
+    epub_parser.add_argument("--book", help="Book name used for a stable identifier")
+
+    subparsers.add_parser("epoch", help="Print the SOURCE_DATE_EPOCH in effect")
+
+    args = parser.parse_args()
+
+    epoch = source_date_epoch()
+    if args.command == "epoch":
+        print(epoch if epoch is not None else "SOURCE_DATE_EPOCH is not set")
+        return
+
+    if epoch is None:
+        print("Error: SOURCE_DATE_EPOCH is not set")
+        sys.exit(1)
+    if not os.path.exists(args.epub_file):
+        print(f"Error: EPUB file not found: {args.epub_file}")
+        sys.exit(1)
+
+    identifier = f"urn:uuid:{book_uuid(args.book)}" if args.book else None
+    normalize_epub(args.epub_file, epoch, identifier)
+    print(f"✓ Normalized EPUB for reproducible builds: {args.epub_file}")
+
+
+if __name__ == "__main__":
+    main()
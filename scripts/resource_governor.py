@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Host-wide admission control for the heavy external tools
+Every job of a tool class (browser = mmdc/Chromium, pdf = WeasyPrint,
+calibre = ebook-convert, pandoc) takes a slot before it starts. A slot is
+granted only while the class is under its concurrency limit and the projected
+memory of all running jobs fits the memory budget; peak RSS is measured per
+job and remembered to project the next run of the same class. State is shared
+between processes (build-queue workers, variant PDFs, ...) through a locked
+file under .cache/governor/
+
+Tuning (environment):
+  EBOOK_MEMORY_BUDGET        total budget, e.g. 6G or 4096M (default: 75% of RAM)
+  EBOOK_LIMIT_<CLASS>        concurrency per class, e.g. EBOOK_LIMIT_PDF=1
+  EBOOK_GOVERNOR=off         run everything immediately (no admission control)
+"""
+
+import sys
+import os
+import json
+import time
+import fcntl
+import socket
+import argparse
+import subprocess
+import threading
+from contextlib import contextmanager
+
+import build_cache
+
+GOVERNOR_DIR = os.path.join(build_cache.CACHE_ROOT, "governor")
+# Per host: .cache/ may sit on a filesystem shared by several build machines
+STATE_FILE = os.path.join(GOVERNOR_DIR, f"state-{socket.gethostname()}.json")
+HISTORY_FILE = os.path.join(GOVERNOR_DIR, "history.json")
+JOBS_LOG = os.path.join(GOVERNOR_DIR, "jobs.jsonl")
+
+CPUS = os.cpu_count() or 2
+# (concurrency limit, first-run memory estimate in MB) per tool class
+CLASSES = {
+    "browser": (2, 500),
+    "pdf": (max(1, CPUS // 2), 1500),
+    "calibre": (max(1, CPUS // 2), 700),
+    "pandoc": (CPUS, 300),
+}
+HISTORY_SIZE = 10
+POLL_INTERVAL = 0.25
+SAMPLE_INTERVAL = 0.2
+# Nested jobs (e.g. mmdc inside a governed pandoc run) skip the memory check
+PARENT_ENV = "EBOOK_GOVERNOR_JOB"
+
+
+def enabled():
+    return os.environ.get("EBOOK_GOVERNOR", "on").lower() not in ("off", "0", "false", "no")
+
+
+def parse_size_mb(value):
+    """Parse '6G', '4096M', '4096' (MB) into megabytes"""
+    value = value.strip().upper().rstrip("B")
+    units = {"K": 1 / 1024, "M": 1, "G": 1024, "T": 1024 * 1024}
+    if value and value[-1] in units:
+        return float(value[:-1]) * units[value[-1]]
+    return float(value)
+
+
+def physical_memory_mb():
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return 8192
+
+
+def memory_budget_mb():
+    value = os.environ.get("EBOOK_MEMORY_BUDGET")
+    if value:
+        try:
+            return parse_size_mb(value)
+        except ValueError:
+            print(f"Warning: Invalid EBOOK_MEMORY_BUDGET '{value}', using 75% of RAM")
+    return physical_memory_mb() * 0.75
+
+
+def class_limit(tool_class):
+    value = os.environ.get(f"EBOOK_LIMIT_{tool_class.upper()}")
+    if value and value.isdigit() and int(value) > 0:
+        return int(value)
+    return CLASSES[tool_class][0]
+
+
+def _read_json(path, default):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return default
+
+
+@contextmanager
+def _locked_state():
+    """Yield the running-jobs table under an exclusive lock; changes are saved"""
+    os.makedirs(GOVERNOR_DIR, exist_ok=True)
+    with open(STATE_FILE, "a+", encoding="utf-8") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            f.seek(0)
+            try:
+                state = json.loads(f.read() or "{}")
+            except ValueError:
+                state = {}
+            # Drop jobs whose process died without releasing its slot
+            state = {job_id: job for job_id, job in state.items() if _pid_alive(job["pid"])}
+            yield state
+            f.seek(0)
+            f.truncate()
+            json.dump(state, f, indent=2)
+            f.flush()
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def projected_mb(tool_class):
+    """Projected peak for the next job of a class: the largest recent peak"""
+    peaks = _read_json(HISTORY_FILE, {}).get(tool_class)
+    if peaks:
+        return max(peaks)
+    return CLASSES[tool_class][1]
+
+
+def _record_peak(tool_class, peak_mb):
+    # The state lock also serialises history updates
+    with _locked_state():
+        history = _read_json(HISTORY_FILE, {})
+        peaks = (history.get(tool_class) or []) + [round(peak_mb, 1)]
+        history[tool_class] = peaks[-HISTORY_SIZE:]
+        with open(HISTORY_FILE, "w", encoding="utf-8") as f:
+            json.dump(history, f, indent=2)
+
+
+def acquire(tool_class, label):
+    """Block until a slot for tool_class is granted; return (job_id, waited seconds)"""
+    if tool_class not in CLASSES:
+        raise ValueError(f"unknown tool class '{tool_class}'")
+
+    nested = bool(os.environ.get(PARENT_ENV))
+    need = projected_mb(tool_class)
+    limit = class_limit(tool_class)
+    budget = memory_budget_mb()
+    job_id = f"{os.getpid()}-{time.monotonic_ns()}"
+    started = time.time()
+    announced = False
+
+    while True:
+        with _locked_state() as state:
+            running = [job for job in state.values() if job["class"] == tool_class]
+            in_use = sum(job["mb"] for job in state.values())
+            fits_memory = nested or not state or in_use + need <= budget
+            if len(running) < limit and fits_memory:
+                state[job_id] = {
+                    "class": tool_class,
+                    "label": label,
+                    "pid": os.getpid(),
+                    "mb": need,
+                    "since": time.time(),
+                }
+                return job_id, time.time() - started
+
+        if not announced:
+            reason = (
+                f"{len(running)}/{limit} {tool_class} jobs running"
+                if len(running) >= limit
+                else f"{in_use:.0f}+{need:.0f} MB over {budget:.0f} MB budget"
+            )
+            print(f"    ⏳ Waiting for a {tool_class} slot for {label} ({reason})")
+            announced = True
+        time.sleep(POLL_INTERVAL)
+
+
+def release(job_id):
+    with _locked_state() as state:
+        state.pop(job_id, None)
+
+
+def _process_tree_rss_mb(root_pid):
+    """Current RSS of a process and all its descendants (Linux /proc), in MB"""
+    children = {}
+    rss_pages = {}
+    try:
+        pids = [int(name) for name in os.listdir("/proc") if name.isdigit()]
+    except OSError:
+        return 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat", "rb") as f:
+                fields = f.read().rsplit(b")", 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        # After the command name: state, ppid, ... rss is field 24 overall
+        children.setdefault(int(fields[1]), []).append(pid)
+        rss_pages[pid] = int(fields[21])
+
+    total = 0
+    stack = [root_pid]
+    while stack:
+        pid = stack.pop()
+        total += rss_pages.get(pid, 0)
+        stack.extend(children.get(pid, []))
+    return total * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def run(tool_class, label, cmd, quiet=False):
+    """Run a command in a governed slot; return (exit code, peak MB, seconds)"""
+    if not enabled():
+        return subprocess.call(cmd), 0.0, 0.0
+
+    job_id, waited = acquire(tool_class, label)
+    env = dict(os.environ, **{PARENT_ENV: job_id})
+    started = time.time()
+    peak = [0.0]
+    finished = threading.Event()
+    try:
+        process = subprocess.Popen(cmd, env=env)
+
+        # Sample the whole process tree: mmdc and ebook-convert do their work in children
+        def sample():
+            while not finished.wait(SAMPLE_INTERVAL):
+                peak[0] = max(peak[0], _process_tree_rss_mb(process.pid))
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        # wait4 reports this child's own ru_maxrss, catching peaks between samples
+        _pid, wait_status, usage = os.wait4(process.pid, 0)
+        finished.set()
+        sampler.join()
+        returncode = os.waitstatus_to_exitcode(wait_status)
+    finally:
+        release(job_id)
+
+    duration = time.time() - started
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    maxrss_mb = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    peak_mb = max(peak[0], maxrss_mb)
+    _record_peak(tool_class, peak_mb)
+    _log_job(tool_class, label, returncode, peak_mb, duration, waited)
+    if not quiet:
+        waited_note = f", waited {waited:.1f}s" if waited >= 1 else ""
+        print(f"    📈 {label}: peak {peak_mb:.0f} MB, {duration:.1f}s ({tool_class}{waited_note})")
+    return returncode, peak_mb, duration
+
+
+@contextmanager
+def slot(tool_class, label):
+    """Hold a governed slot around in-process work that starts a heavy tool"""
+    if not enabled():
+        yield
+        return
+    job_id, _waited = acquire(tool_class, label)
+    try:
+        yield
+    finally:
+        release(job_id)
+
+
+def _log_job(tool_class, label, returncode, peak_mb, duration, waited):
+    entry = {
+        "class": tool_class,
+        "label": label,
+        "exit": returncode,
+        "peak_mb": round(peak_mb, 1),
+        "seconds": round(duration, 2),
+        "waited": round(waited, 2),
+        "finished_at": round(time.time(), 3),
+        "run": os.environ.get("BUILD_RUN_ID", ""),
+    }
+    os.makedirs(GOVERNOR_DIR, exist_ok=True)
+    # One short append per job; O_APPEND keeps concurrent lines intact
+    with open(JOBS_LOG, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+def report(run_id=None):
+    """Print per-job peaks for a build run (default: the most recent run)"""
+    try:
+        with open(JOBS_LOG, "r", encoding="utf-8") as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        entries = []
+    if run_id is None and entries:
+        run_id = entries[-1]["run"]
+    entries = [entry for entry in entries if entry["run"] == run_id]
+    if not entries:
+        print("No governed jobs recorded")
+        return
+
+    print(f"📈 Peak memory per job (budget {memory_budget_mb():.0f} MB):")
+    for entry in sorted(entries, key=lambda e: -e["peak_mb"]):
+        status = "" if entry["exit"] == 0 else f"  ✗ exit {entry['exit']}"
+        waited = f", waited {entry['waited']:.1f}s" if entry["waited"] >= 1 else ""
+        print(
+            f"   {entry['class']:<8} {entry['label']:<40} {entry['peak_mb']:>7.0f} MB "
+            f"{entry['seconds']:>7.1f}s{waited}{status}"
+        )
+
+
+def status():
+    """Print limits, projections and the jobs currently holding slots"""
+    budget = memory_budget_mb()
+    with _locked_state() as state:
+        running = list(state.values())
+    in_use = sum(job["mb"] for job in running)
+    print(f"🚦 Resource governor ({'on' if enabled() else 'off'}): {in_use:.0f}/{budget:.0f} MB projected in use")
+    for tool_class in CLASSES:
+        count = sum(1 for job in running if job["class"] == tool_class)
+        print(
+            f"   {tool_class:<8} {count}/{class_limit(tool_class)} running, "
+            f"projected {projected_mb(tool_class):.0f} MB per job"
+        )
+    for job in running:
+        print(f"   • {job['class']}: {job['label']} (pid {job['pid']}, {time.time() - job['since']:.0f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Admission control for heavy build tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run a command in a governed slot")
+    run_parser.add_argument("--class", dest="tool_class", choices=sorted(CLASSES), required=True)
+    run_parser.add_argument("--label", help="Job name shown in reports (default: the command)")
+    run_parser.add_argument("--quiet", action="store_true", help="Do not print the peak line")
+    run_parser.add_argument("cmd", nargs=argparse.REMAINDER, help="Command to run (after --)")
+
+    report_parser = subparsers.add_parser("report", help="Show per-job peak memory")
+    report_parser.add_argument("--run", help="Build run id (default: the most recent run)")
+
+    subparsers.add_parser("status", help="Show limits and running jobs")
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        cmd = args.cmd[1:] if args.cmd[:1] == ["--"] else args.cmd
+        if not cmd:
+            parser.error("run needs a command after --")
+        returncode, _peak, _duration = run(
+            args.tool_class, args.label or os.path.basename(cmd[0]), cmd, args.quiet
+        )
+        sys.exit(returncode)
+    elif args.command == "report":
+        report(args.run)
+    elif args.command == "status":
+        status()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Per-artifact size report and size budgets
+Breaks each book's HTML, PDF, EPUB and MOBI down by component (text, images,
+CSS, fonts, diagrams), compares with the previous build and enforces the
+per-book, per-format budgets configured in book-config.json
+"""
+
+import sys
+import os
+import re
+import json
+import zipfile
+import argparse
+import posixpath
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_REPORT = os.path.join(REPO_ROOT, ".cache", "size-report.json")
+FORMATS = ["html", "pdf", "epub", "mobi", "azw3"]
+COMPONENTS = ["text", "images", "css", "fonts", "diagrams"]
+
+STYLE_RE = re.compile(r"<style[^>]*>.*?</style>", re.S | re.I)
+FONT_FACE_RE = re.compile(r"@font-face\s*\{[^}]*\}", re.S | re.I)
+SVG_RE = re.compile(r"<svg\b.*?</svg>", re.S | re.I)
+IMG_RE = re.compile(r"<img\b[^>]*>", re.S | re.I)
+DATA_URL_RE = re.compile(r"data:[^\"')\s]+")
+SRC_RE = re.compile(r"""\bsrc\s*=\s*["']([^"']+)["']""", re.I)
+CLASS_RE = re.compile(r"""\bclass\s*=\s*["']([^"']*)["']""", re.I)
+PDF_OBJECT_RE = re.compile(rb"<<(.*?)>>\s*stream\r?\n", re.S)
+PDF_LENGTH_RE = re.compile(rb"/Length\s+(\d+)(?!\s+\d+\s+R)")
+PDF_FONT_MARKERS = (b"/Length1", b"/Type1C", b"/CIDFontType0C", b"/OpenType")
+UNITS = {"b": 1, "kb": 1024, "mb": 1024 ** 2, "gb": 1024 ** 3}
+
+
+def parse_size(value):
+    """Parse a budget such as 2500000, "800KB" or "2.5MB" into bytes"""
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = re.fullmatch(r"\s*([\d.]+)\s*([kmg]?b)?\s*", str(value).lower())
+    if not match:
+        raise ValueError(f"Invalid size: {value}")
+    return int(float(match.group(1)) * UNITS[match.group(2) or "b"])
+
+
+def format_size(size):
+    for unit in ["B", "KB", "MB"]:
+        if abs(size) < 1024 or unit == "MB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def empty_breakdown():
+    return {component: 0 for component in COMPONENTS}
+
+
+def html_breakdown(path):
+    """Split an HTML file into embedded CSS, fonts, inline images, diagrams and text"""
+    with open(path, "rb") as f:
+        raw = f.read()
+    content = raw.decode("utf-8", errors="replace")
+    breakdown = empty_breakdown()
+
+    for style in STYLE_RE.findall(content):
+        fonts = sum(len(face.encode()) for face in FONT_FACE_RE.findall(style))
+        breakdown["fonts"] += fonts
+        breakdown["css"] += len(style.encode()) - fonts
+
+    for svg in SVG_RE.findall(content):
+        breakdown["diagrams"] += len(svg.encode())
+
+    for img in IMG_RE.findall(content):
+        data_urls = DATA_URL_RE.findall(img)
+        if not data_urls:
+            continue
+        size = sum(len(url) for url in data_urls)
+        if "mermaid" in img.lower():
+            breakdown["diagrams"] += size
+        else:
+            breakdown["images"] += size
+
+    breakdown["text"] = max(0, len(raw) - sum(breakdown.values()))
+    return breakdown
+
+
+def epub_diagram_entries(epub):
+    """Zip entries of rendered diagrams: pandoc renames media to media/fileN.png,
+    so they are found through the <img class="mermaid-rendered"> referencing them"""
+    entries = set()
+    for name in epub.namelist():
+        if not name.lower().endswith((".xhtml", ".html", ".htm")):
+            continue
+        content = epub.read(name).decode("utf-8", errors="replace")
+        for img in IMG_RE.findall(content):
+            classes = CLASS_RE.search(img)
+            src = SRC_RE.search(img)
+            if not classes or not src or "mermaid" not in classes.group(1).lower():
+                continue
+            target = src.group(1).split("#", 1)[0]
+            entries.add(posixpath.normpath(posixpath.join(posixpath.dirname(name), target)))
+    return entries
+
+
+def epub_breakdown(path):
+    """Split an EPUB (zip) by entry type, using compressed sizes"""
+    breakdown = empty_breakdown()
+    with zipfile.ZipFile(path) as epub:
+        diagrams = epub_diagram_entries(epub)
+        for info in epub.infolist():
+            name = info.filename.lower()
+            ext = os.path.splitext(name)[1]
+            if ext == ".css":
+                component = "css"
+            elif ext in (".ttf", ".otf", ".woff", ".woff2"):
+                component = "fonts"
+            elif ext in (".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp"):
+                component = "diagrams" if info.filename in diagrams else "images"
+            else:
+                component = "text"
+            breakdown[component] += info.compress_size
+    # Zip headers and the central directory count as text overhead
+    breakdown["text"] += max(0, os.path.getsize(path) - sum(breakdown.values()))
+    return breakdown
+
+
+def pdf_breakdown(path):
+    """Estimate image and font stream sizes in a PDF; the rest counts as text.
+    Diagrams are not told apart (vector ones are plain drawing operators, raster
+    ones plain images), so the PDF has no diagrams component"""
+    with open(path, "rb") as f:
+        data = f.read()
+    breakdown = empty_breakdown()
+    del breakdown["diagrams"]
+
+    for match in PDF_OBJECT_RE.finditer(data):
+        header = match.group(1)
+        length = PDF_LENGTH_RE.search(header)
+        if not length:
+            continue
+        size = int(length.group(1))
+        if b"/Subtype /Image" in header or b"/Subtype/Image" in header:
+            breakdown["images"] += size
+        elif any(marker in header for marker in PDF_FONT_MARKERS):
+            breakdown["fonts"] += size
+
+    breakdown["text"] = max(0, len(data) - sum(breakdown.values()))
+    return breakdown
+
+
+def artifact_breakdown(path, fmt):
+    if fmt == "html":
+        return html_breakdown(path)
+    if fmt == "epub":
+        return epub_breakdown(path)
+    if fmt == "pdf":
+        return pdf_breakdown(path)
+    breakdown = empty_breakdown()
+    breakdown["text"] = os.path.getsize(path)
+    return breakdown
+
+
+def collect(public_dir, books):
+    report = {}
+    for book in books:
+        for fmt in FORMATS:
+            path = os.path.join(public_dir, book, f"{book}.{fmt}")
+            if not os.path.exists(path):
+                continue
+            try:
+                breakdown = artifact_breakdown(path, fmt)
+            except (OSError, zipfile.BadZipFile) as e:
+                print(f"Warning: Could not analyse {path}: {e}")
+                breakdown = empty_breakdown()
+            report.setdefault(book, {})[fmt] = {
+                "total": os.path.getsize(path),
+                "components": breakdown,
+            }
+    return report
+
+
+def budgets_for(config, book):
+    budgets = dict(config.get("budgets", {}))
+    budgets.update(config.get("books", {}).get(book, {}).get("budgets", {}))
+    return budgets
+
+
+def format_delta(current, previous):
+    if previous is None:
+        return "new"
+    delta = current - previous
+    if delta == 0:
+        return "±0"
+    percent = f" ({delta / previous:+.1%})" if previous else ""
+    sign = "+" if delta > 0 else "-"
+    return f"{sign}{format_size(abs(delta))}{percent}"
+
+
+def print_report(report, previous, config):
+    """Print the size table and return a list of budget violations"""
+    violations = []
+    for book, formats in sorted(report.items()):
+        print(f"📦 {book}")
+        budgets = budgets_for(config, book)
+        for fmt, entry in formats.items():
+            total = entry["total"]
+            previous_total = previous.get(book, {}).get(fmt, {}).get("total")
+            parts = ", ".join(
+                f"{component} {format_size(size)}"
+                for component, size in entry["components"].items()
+                if size
+            )
+            if "diagrams" not in entry["components"]:
+                parts += ", diagrams not measured (in text/images)"
+            line = f"   {fmt.upper():<5} {format_size(total):>10}  {format_delta(total, previous_total):<18} {parts}"
+
+            if fmt in budgets:
+                budget = parse_size(budgets[fmt])
+                if total > budget:
+                    line += f"  ❌ over budget ({format_size(budget)})"
+                    violations.append((book, fmt, total, budget))
+                else:
+                    line += f"  ✓ budget {format_size(budget)}"
+            print(line)
+    return violations
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Report artifact sizes by component and enforce size budgets"
+    )
+    parser.add_argument("--public", default="public", help="Published output directory")
+    parser.add_argument(
+        "--config", default="books/book-config.json", help="Book configuration file"
+    )
+    parser.add_argument("--book", help="Only report on this book")
+    parser.add_argument(
+        "--report", default=DEFAULT_REPORT, help="Where the previous/current report is kept"
+    )
+    parser.add_argument(
+        "--strict", action="store_true", help="Fail on budget violations (overrides budget_mode)"
+    )
+
+    args = parser.parse_args()
+
+    config = {}
+    if os.path.exists(args.config):
+        with open(args.config, "r", encoding="utf-8") as f:
+            config = json.load(f)
+
+    if args.book:
+        books = [args.book]
+    elif os.path.isdir(args.public):
+        books = sorted(
+            name
+            for name in os.listdir(args.public)
+            if os.path.isdir(os.path.join(args.public, name))
+        )
+    else:
+        books = []
+
+    previous = {}
+    if os.path.exists(args.report):
+        with open(args.report, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+
+    report = collect(args.public, books)
+    if not report:
+        print("No artifacts found to report on")
+        return
+
+    print("📏 Artifact size report")
+    print("=======================")
+    violations = print_report(report, previous, config)
+
+    # Keep entries for books not rebuilt this time so later comparisons still work
+    merged = dict(previous)
+    merged.update(report)
+    os.makedirs(os.path.dirname(os.path.abspath(args.report)), exist_ok=True)
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(merged, f, indent=2, sort_keys=True)
+
+    if violations:
+        fail = args.strict or config.get("budget_mode", "warn") == "fail"
+        for book, fmt, total, budget in violations:
+            print(
+                f"{'Error' if fail else 'Warning'}: {book}.{fmt} is {format_size(total)}, "
+                f"budget {format_size(budget)}"
+            )
+        if fail:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
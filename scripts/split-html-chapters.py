@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Split a book's HTML into one page per chapter
+Writes <book>/chapters/ with an index page (cover, front matter and TOC), one
+page per chapter named after the chapter heading's id, and the book's inline
+CSS and scripts moved into shared, cacheable book.css and book.js files. Pages
+get prev/next navigation with the next chapter prefetched, and links to anchors
+on other pages are rewritten so every existing #anchor keeps working
+"""
+
+import sys
+import os
+import re
+import html
+import json
+import shutil
+import argparse
+
+from bs4 import BeautifulSoup, NavigableString, Comment
+
+HEADING_TAGS = ["h1", "h2", "h3"]
+URL_ATTRS = {"a": "href", "link": "href", "img": "src", "script": "src", "source": "src"}
+ABSOLUTE_URL_RE = re.compile(r"^(?:[a-z][a-z0-9+.-]*:|/|#)", re.I)
+
+NAV_CSS = """
+/* Chapter navigation (split-html-chapters.py) */
+.chapter-nav { display: flex; justify-content: space-between; gap: 1rem; margin: 1.5rem auto; max-width: 900px; padding: 0 1rem; font-size: 0.95em; }
+.chapter-nav a { text-decoration: none; }
+.chapter-nav .chapter-contents { text-align: center; }
+.chapter-nav .chapter-next { text-align: right; margin-left: auto; }
+@media print { .chapter-nav { display: none; } }
+"""
+
+
+def chapter_level(container):
+    """Shallowest heading level used more than once (a lone H1 is the book title)"""
+    for name in HEADING_TAGS:
+        if len(container.find_all(name, id=True, recursive=False)) > 1:
+            return name
+    return "h2"
+
+
+def split_chunks(container, heading_tag):
+    """Split the container's children at each chapter heading, and at shallower
+    headings (e.g. parts) unless they occur once, like the book title"""
+    levels = HEADING_TAGS[: HEADING_TAGS.index(heading_tag) + 1]
+    split_at = {
+        name
+        for name in levels
+        if name == heading_tag or len(container.find_all(name, recursive=False)) > 1
+    }
+    chunks = [{"id": None, "title": None, "nodes": []}]
+    for child in list(container.children):
+        if getattr(child, "name", None) in split_at and child.get("id"):
+            chunks.append(
+                {"id": child["id"], "title": " ".join(child.get_text(" ").split()), "nodes": []}
+            )
+        chunks[-1]["nodes"].append(child)
+    return chunks
+
+
+def page_names(chunks):
+    """Stable file names: index.html for front matter, <heading id>.html otherwise"""
+    used = {"index.html", "book.css", "book.js"}
+    for chunk in chunks[1:]:
+        name = f"{chunk['id']}.html"
+        suffix = 2
+        while name in used:
+            name = f"{chunk['id']}-{suffix}.html"
+            suffix += 1
+        used.add(name)
+        chunk["page"] = name
+    chunks[0]["page"] = "index.html"
+    chunks[0]["title"] = "Contents"
+
+
+def anchor_pages(chunks):
+    """Map every element id to the page it ends up on"""
+    pages = {}
+    for chunk in chunks:
+        for node in chunk["nodes"]:
+            if isinstance(node, NavigableString):
+                continue
+            if node.get("id"):
+                pages[node["id"]] = chunk["page"]
+            for tag in node.find_all(id=True):
+                pages.setdefault(tag["id"], chunk["page"])
+    return pages
+
+
+def rewrite_urls(root, pages, current_page):
+    """Point #anchors at their page and relative URLs one directory up"""
+    for name, attr in URL_ATTRS.items():
+        for tag in root.find_all(name, attrs={attr: True}):
+            url = tag[attr]
+            if url.startswith("#"):
+                page = pages.get(url[1:])
+                if page and page != current_page:
+                    tag[attr] = page + url
+            elif url and not ABSOLUTE_URL_RE.match(url):
+                tag[attr] = "../" + url
+
+
+def extract_shared(soup):
+    """Move inline <style> and classic inline <script> blocks into shared text"""
+    css, js = [], []
+    for style in soup.find_all("style"):
+        css.append(style.string or "")
+        style.decompose()
+    for script in soup.find_all("script"):
+        if script.get("src") or script.get("type") not in (None, "text/javascript"):
+            continue
+        js.append(script.string or "")
+        script.decompose()
+    return "\n".join(css), "\n".join(js)
+
+
+def nav_html(chunks, i):
+    parts = ['<nav class="chapter-nav">']
+    if i > 0:
+        prev = chunks[i - 1]
+        parts.append(f'<a class="chapter-prev" href="{prev["page"]}" rel="prev">← {html.escape(prev["title"])}</a>')
+    if i != 0:
+        parts.append('<a class="chapter-contents" href="index.html">Contents</a>')
+    if i + 1 < len(chunks):
+        nxt = chunks[i + 1]
+        parts.append(f'<a class="chapter-next" href="{nxt["page"]}" rel="next">{html.escape(nxt["title"])} →</a>')
+    parts.append("</nav>")
+    return "".join(parts)
+
+
+def page_html(head, search_box, chunks, i, book_title):
+    chunk = chunks[i]
+    head_links = ['<link rel="stylesheet" href="book.css"/>']
+    if i > 0:
+        head_links.append(f'<link rel="prev" href="{chunks[i - 1]["page"]}"/>')
+    if i + 1 < len(chunks):
+        # Fetch the next chapter while the reader is on this one
+        head_links.append(f'<link rel="next" href="{chunks[i + 1]["page"]}"/>')
+        head_links.append(f'<link rel="prefetch" href="{chunks[i + 1]["page"]}"/>')
+
+    title = html.escape(book_title if i == 0 else f"{chunk['title']} — {book_title}")
+    body = "".join(str(node) for node in chunk["nodes"])
+    nav = nav_html(chunks, i)
+    return (
+        "<!DOCTYPE html>\n<html>\n<head>\n"
+        + head.replace("__PAGE_TITLE__", title)
+        + "\n".join(head_links)
+        + "\n</head>\n<body>\n"
+        + search_box
+        + nav
+        + f'\n<div class="book-container">\n{body}\n</div>\n'
+        + nav
+        + '\n<script src="book.js" defer></script>\n</body>\n</html>\n'
+    )
+
+
+def split_book(html_file, output_dir, heading_tag=None):
+    with open(html_file, "r", encoding="utf-8") as f:
+        soup = BeautifulSoup(f.read(), "html.parser")
+
+    container = soup.find("div", class_="book-container")
+    if not container or not soup.head:
+        print(f"Error: No book-container found in {html_file}")
+        return None
+
+    css, js = extract_shared(soup)
+    heading_tag = heading_tag or chapter_level(container)
+    chunks = split_chunks(container, heading_tag)
+    page_names(chunks)
+    pages = anchor_pages(chunks)
+
+    # The search widget resolves section anchors to pages through this map
+    heading_ids = {tag["id"] for tag in container.find_all(["h1", "h2", "h3", "h4"], id=True)}
+    heading_pages = {anchor: page for anchor, page in pages.items() if anchor in heading_ids}
+    js = f"window.bookAnchorPages={json.dumps(heading_pages, separators=(',', ':'))};\n{js}"
+
+    rewrite_urls(soup.head, pages, None)
+    search_box = ""
+    box = soup.find(id="book-search")
+    if box:
+        if box.get("data-index"):
+            box["data-index"] = "../" + box["data-index"]
+        search_box = str(box) + "\n"
+
+    book_title = soup.title.get_text() if soup.title else ""
+    if soup.title:
+        soup.title.string = "__PAGE_TITLE__"
+    head = "".join(str(node) for node in soup.head.contents if not isinstance(node, Comment))
+
+    if os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir)
+
+    with open(os.path.join(output_dir, "book.css"), "w", encoding="utf-8") as f:
+        f.write(css + NAV_CSS)
+    with open(os.path.join(output_dir, "book.js"), "w", encoding="utf-8") as f:
+        f.write(js)
+
+    for i, chunk in enumerate(chunks):
+        wrapper = BeautifulSoup("", "html.parser")
+        for node in chunk["nodes"]:
+            wrapper.append(node.extract())
+        rewrite_urls(wrapper, pages, chunk["page"])
+        chunk["nodes"] = list(wrapper.contents)
+        with open(os.path.join(output_dir, chunk["page"]), "w", encoding="utf-8") as f:
+            f.write(page_html(head, search_box, chunks, i, book_title))
+
+    return chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Split a book's HTML into one page per chapter"
+    )
+    parser.add_argument("html_file", help="Processed book HTML")
+    parser.add_argument(
+        "--output-dir", help="Output directory (default: chapters/ next to the HTML)"
+    )
+    parser.add_argument(
+        "--level",
+        choices=HEADING_TAGS,
+        help="Heading that starts a chapter (default: auto)",
+    )
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.html_file):
+        print(f"Error: HTML file not found: {args.html_file}")
+        sys.exit(1)
+
+    output_dir = args.output_dir or os.path.join(
+        os.path.dirname(os.path.abspath(args.html_file)), "chapters"
+    )
+    chunks = split_book(args.html_file, output_dir, args.level)
+    if chunks is None:
+        sys.exit(1)
+
+    largest = max(
+        os.path.getsize(os.path.join(output_dir, chunk["page"])) for chunk in chunks
+    )
+    print(
+        f"✓ Split into {len(chunks)} pages in {output_dir} "
+        f"(largest {largest / 1024:.0f} KB, shared CSS/JS cached across pages)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Startup-time benchmark for the Python build scripts
+Loads every script as a module (top-level code only, main() does not run) in a
+fresh interpreter, a few times each, and reports the import cost beyond bare
+interpreter startup together with its heaviest imports (python -X importtime).
+Results are compared with the previous run stored in .cache/startup-bench.json
+"""
+
+import sys
+import os
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(SCRIPTS_DIR)
+DEFAULT_REPORT = os.path.join(REPO_ROOT, ".cache", "startup-bench.json")
+
+LOADER = """
+import sys, importlib.util
+sys.path.insert(0, {scripts_dir!r})
+spec = importlib.util.spec_from_file_location("bench_target", {path!r})
+module = importlib.util.module_from_spec(spec)
+try:
+    spec.loader.exec_module(module)
+except SystemExit:
+    pass  # scripts without a main() guard exit on their argv check
+"""
+
+
+def run_once(code, importtime=False):
+    """Run code in a fresh interpreter; return (seconds, stderr)"""
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ["-X", "importtime"]
+    cmd += ["-c", code]
+    started = time.perf_counter()
+    result = subprocess.run(cmd, capture_output=True, text=True, cwd=REPO_ROOT)
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0 and not importtime:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else "failed")
+    return elapsed, result.stderr
+
+
+def heaviest_imports(stderr, count=3):
+    """Top-level imports with the largest cumulative time from -X importtime output"""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        # Top-level entries are indented by exactly one space
+        if name.startswith(" ") and not name.startswith("  "):
+            imports.append((int(parts[1]) / 1000, name.strip()))
+    imports.sort(reverse=True)
+    return [{"module": name, "ms": round(ms, 1)} for ms, name in imports[:count]]
+
+
+def bench_script(path, runs, baseline):
+    code = LOADER.format(scripts_dir=SCRIPTS_DIR, path=path)
+    times = [run_once(code)[0] for _ in range(runs)]
+    _elapsed, stderr = run_once(code, importtime=True)
+    return {
+        "ms": round(max(0.0, statistics.median(times) - baseline) * 1000, 1),
+        "heaviest": heaviest_imports(stderr),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure the import cost of each build script"
+    )
+    parser.add_argument("scripts", nargs="*", help="Scripts to measure (default: all in scripts/)")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per script (median, default: 5)")
+    parser.add_argument("--report", default=DEFAULT_REPORT, help="Where results are stored")
+    parser.add_argument(
+        "--budget-ms", type=float, help="Exit non-zero if a script's import cost exceeds this"
+    )
+
+    args = parser.parse_args()
+
+    paths = [os.path.abspath(path) for path in args.scripts] or sorted(
+        os.path.join(SCRIPTS_DIR, name)
+        for name in os.listdir(SCRIPTS_DIR)
+        if name.endswith(".py") and name != os.path.basename(__file__)
+    )
+
+    baseline = statistics.median(run_once("pass")[0] for _ in range(args.runs))
+    print(f"⏱️  Import cost per script (beyond {baseline * 1000:.0f} ms interpreter startup)")
+
+    try:
+        with open(args.report, "r", encoding="utf-8") as f:
+            previous = json.load(f).get("scripts", {})
+    except (FileNotFoundError, ValueError):
+        previous = {}
+
+    results = {}
+    over_budget = []
+    for path in paths:
+        name = os.path.basename(path)
+        try:
+            result = bench_script(path, args.runs, baseline)
+        except RuntimeError as e:
+            print(f"   {name:<32}   failed to import: {e}")
+            continue
+        results[name] = result
+
+        delta = ""
+        if name in previous:
+            change = result["ms"] - previous[name]["ms"]
+            if abs(change) >= 1:
+                delta = f" ({change:+.0f} ms)"
+        heaviest = ", ".join(f"{item['module']} {item['ms']:.0f}" for item in result["heaviest"])
+        print(f"   {name:<32} {result['ms']:>6.0f} ms{delta:<10} {heaviest}")
+        if args.budget_ms is not None and result["ms"] > args.budget_ms:
+            over_budget.append(name)
+
+    os.makedirs(os.path.dirname(args.report), exist_ok=True)
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump({"baseline_ms": round(baseline * 1000, 1), "scripts": results}, f, indent=2)
+
+    if over_budget:
+        print(f"✗ Over the {args.budget_ms:.0f} ms budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Cached availability probes for the external tools
+A real probe (importing WeasyPrint, running mmdc --version) costs hundreds of
+milliseconds, so results are cached twice: for the session in EBOOK_PROBE_*
+environment variables (exported by `tool_probe.py shell` to every child
+process), and on disk in .cache/tool-probes.json, keyed by the tool's path and
+modification time so installing or upgrading a tool invalidates the entry.
+Only working tools are kept on disk: a failure usually comes from a missing
+system dependency (pango, mmdc's Chromium) whose installation would not change
+the key, so failed tools are probed again by the next build
+"""
+
+import sys
+import os
+import json
+import shutil
+import tempfile
+import importlib.util
+
+import build_cache
+
+PROBE_FILE = os.path.join(build_cache.CACHE_ROOT, "tool-probes.json")
+TOOLS = ["weasyprint", "mmdc", "ebook-convert"]
+# Shell variables set by `tool_probe.py shell` (names used by build-all-formats.sh)
+SHELL_NAMES = {
+    "weasyprint": "WEASYPRINT_AVAILABLE",
+    "mmdc": "MMDC_AVAILABLE",
+    "ebook-convert": "CALIBRE_AVAILABLE",
+}
+
+
+def env_name(tool):
+    return "EBOOK_PROBE_" + tool.upper().replace("-", "_")
+
+
+def _mtime(path):
+    try:
+        return os.stat(os.path.realpath(path)).st_mtime
+    except OSError:
+        return 0
+
+
+def _identity(tool):
+    """Where the tool lives, or None when it is not installed at all"""
+    if tool == "weasyprint":
+        spec = importlib.util.find_spec("weasyprint")
+        if spec is None or not spec.origin:
+            return None
+        return f"{sys.executable}:{spec.origin}:{_mtime(spec.origin)}"
+    path = shutil.which(tool)
+    return f"{path}:{_mtime(path)}" if path else None
+
+
+def _run_probe(tool):
+    """The expensive check: does the tool actually work?"""
+    if tool == "weasyprint":
+        import contextlib
+
+        try:
+            # WeasyPrint prints its missing-library help to stdout, which the
+            # build scripts eval: keep it on stderr
+            with contextlib.redirect_stdout(sys.stderr):
+                import weasyprint  # noqa: F401  (fails without pango and friends)
+        except (ImportError, OSError):
+            return False
+        return True
+    if tool == "mmdc":
+        import subprocess
+        try:
+            result = subprocess.run(["mmdc", "--version"], capture_output=True, timeout=15)
+        except (subprocess.TimeoutExpired, OSError):
+            return False
+        return result.returncode == 0
+    # ebook-convert starts slowly; being on PATH is enough, as before
+    return True
+
+
+def _save_probes(probes):
+    os.makedirs(os.path.dirname(PROBE_FILE), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(PROBE_FILE), prefix=".tmp-")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(probes, f, indent=2)
+    os.replace(tmp_path, PROBE_FILE)
+
+
+def available(tool):
+    """True if the tool works, from the session, disk cache or a fresh probe"""
+    cached = os.environ.get(env_name(tool))
+    if cached in ("0", "1"):
+        return cached == "1"
+
+    identity = _identity(tool)
+    if identity is None:
+        ok = False
+    else:
+        try:
+            with open(PROBE_FILE, "r", encoding="utf-8") as f:
+                probes = json.load(f)
+        except (FileNotFoundError, ValueError):
+            probes = {}
+        entry = probes.get(tool)
+        if entry and entry.get("identity") == identity and entry.get("ok"):
+            ok = True
+        else:
+            ok = _run_probe(tool)
+            # Failures stay in the session cache only (see the module docstring)
+            if ok:
+                probes[tool] = {"identity": identity, "ok": True}
+                _save_probes(probes)
+            elif probes.pop(tool, None) is not None:
+                _save_probes(probes)
+
+    os.environ[env_name(tool)] = "1" if ok else "0"
+    return ok
+
+
+def main():
+    if len(sys.argv) == 2 and sys.argv[1] == "shell":
+        # eval "$(python3 scripts/tool_probe.py shell)" in the build scripts
+        results = {tool: available(tool) for tool in TOOLS}
+        for tool, ok in results.items():
+            print(f"{SHELL_NAMES[tool]}={'true' if ok else 'false'}")
+        exports = " ".join(f"{env_name(tool)}={int(ok)}" for tool, ok in results.items())
+        print(f"export {exports}")
+    elif len(sys.argv) == 2 and sys.argv[1] in TOOLS:
+        ok = available(sys.argv[1])
+        print(f"{sys.argv[1]}: {'available' if ok else 'not available'}")
+        sys.exit(0 if ok else 1)
+    else:
+        print(f"Usage: python3 tool_probe.py shell | {' | '.join(TOOLS)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
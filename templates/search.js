@@ -0,0 +1,234 @@
+// Full-text search widget for the HTML edition.
+// Queries the prebuilt inverted index (<book>.search.js, written by
+// scripts/build-search-index.py) instead of scanning the DOM. The index is
+// loaded on first use, so it costs nothing until the reader searches.
+(function () {
+  "use strict";
+
+  var MAX_RESULTS = 20;
+  var TITLE_BOOST = 4;
+  var PHRASE_BOOST = 2;
+
+  var container = document.getElementById("book-search");
+  if (!container || !container.dataset.index) {
+    return;
+  }
+
+  var index = null;
+  var loading = null;
+
+  function loadIndex() {
+    if (loading) {
+      return loading;
+    }
+    // A script tag (not fetch) so the index also loads from file:// URLs
+    loading = new Promise(function (resolve, reject) {
+      var script = document.createElement("script");
+      script.src = container.dataset.index;
+      script.onload = function () {
+        index = prepare(window.bookSearchIndex);
+        resolve(index);
+      };
+      script.onerror = reject;
+      document.head.appendChild(script);
+    });
+    return loading;
+  }
+
+  function prepare(raw) {
+    raw.termList = Object.keys(raw.terms).sort();
+    raw.stopSet = new Set(raw.stop);
+    return raw;
+  }
+
+  // Must match tokenize() in scripts/build-search-index.py
+  function tokenize(text) {
+    var normalized = text
+      .normalize("NFKD")
+      .replace(/[\u0300-\u036f]/g, "")
+      .toLowerCase();
+    return normalized.match(/[\p{L}\p{N}]+/gu) || [];
+  }
+
+  // Postings are [doc, firstPosition, delta, delta, ...]
+  function positions(posting) {
+    var out = [];
+    var position = 0;
+    for (var i = 1; i < posting.length; i++) {
+      position += posting[i];
+      out.push(position);
+    }
+    return out;
+  }
+
+  function expand(term, isLast) {
+    if (!isLast) {
+      return index.terms[term] ? [term] : [];
+    }
+    // The word being typed matches as a prefix
+    var list = index.termList;
+    var lo = 0;
+    var hi = list.length;
+    while (lo < hi) {
+      var mid = (lo + hi) >> 1;
+      if (list[mid] < term) {
+        lo = mid + 1;
+      } else {
+        hi = mid;
+      }
+    }
+    var matches = [];
+    for (var i = lo; i < list.length && list[i].lastIndexOf(term, 0) === 0; i++) {
+      matches.push(list[i]);
+      if (matches.length >= 50) {
+        break;
+      }
+    }
+    return matches;
+  }
+
+  function search(query) {
+    var words = tokenize(query).filter(function (word) {
+      return !index.stopSet.has(word);
+    });
+    if (!words.length) {
+      return [];
+    }
+
+    var docCount = index.docs.length;
+    var scores = null;
+    var hits = [];
+
+    words.forEach(function (word, i) {
+      var wordScores = new Map();
+      var wordHits = new Map();
+      expand(word, i === words.length - 1).forEach(function (term) {
+        var postings = index.terms[term];
+        var idf = Math.log(1 + docCount / postings.length);
+        postings.forEach(function (posting) {
+          var doc = posting[0];
+          var docPositions = positions(posting);
+          var titleLength = index.docs[doc][3];
+          var score = docPositions.length * idf;
+          if (docPositions[0] < titleLength) {
+            score *= TITLE_BOOST;
+          }
+          wordScores.set(doc, (wordScores.get(doc) || 0) + score);
+          wordHits.set(doc, (wordHits.get(doc) || []).concat(docPositions));
+        });
+      });
+
+      // Every query word must match (AND semantics)
+      if (scores === null) {
+        scores = wordScores;
+      } else {
+        var merged = new Map();
+        scores.forEach(function (score, doc) {
+          if (wordScores.has(doc)) {
+            merged.set(doc, score + wordScores.get(doc));
+          }
+        });
+        scores = merged;
+      }
+      hits.push(wordHits);
+    });
+
+    // Boost sections where consecutive query words appear next to each other
+    scores.forEach(function (score, doc) {
+      for (var i = 1; i < hits.length; i++) {
+        var previous = new Set(hits[i - 1].get(doc));
+        var adjacent = hits[i].get(doc).some(function (position) {
+          return previous.has(position - 1);
+        });
+        if (adjacent) {
+          score *= PHRASE_BOOST;
+        }
+      }
+      scores.set(doc, score);
+    });
+
+    return Array.from(scores.entries())
+      .sort(function (a, b) {
+        return b[1] - a[1];
+      })
+      .slice(0, MAX_RESULTS)
+      .map(function (entry) {
+        return index.docs[entry[0]];
+      });
+  }
+
+  function render(results, list, query) {
+    list.innerHTML = "";
+    if (query && !results.length) {
+      var empty = document.createElement("li");
+      empty.className = "book-search-empty";
+      empty.textContent = "No matches";
+      list.appendChild(empty);
+    }
+    results.forEach(function (doc) {
+      // doc = [anchor, title, chapter, titleLength, snippet]
+      var item = document.createElement("li");
+      var link = document.createElement("a");
+      // Chapter-split editions map each section anchor to its page
+      var pages = window.bookAnchorPages;
+      link.href = ((pages && pages[doc[0]]) || "") + "#" + doc[0];
+      var title = document.createElement("strong");
+      title.textContent = doc[1];
+      link.appendChild(title);
+      if (doc[2] !== null && doc[2] !== undefined && index.docs[doc[2]][1] !== doc[1]) {
+        var chapter = document.createElement("span");
+        chapter.className = "book-search-chapter";
+        chapter.textContent = index.docs[doc[2]][1];
+        link.appendChild(chapter);
+      }
+      var snippet = document.createElement("span");
+      snippet.className = "book-search-snippet";
+      snippet.textContent = doc[4];
+      link.appendChild(snippet);
+      item.appendChild(link);
+      list.appendChild(item);
+    });
+    list.hidden = !list.children.length;
+  }
+
+  var style = document.createElement("style");
+  style.textContent =
+    ".book-search{position:fixed;top:1rem;right:1rem;z-index:100;width:min(24rem,calc(100vw - 2rem));font:inherit}" +
+    ".book-search input{width:100%;box-sizing:border-box;padding:.5rem .75rem;border:1px solid rgba(127,127,127,.5);border-radius:.5rem;background:Canvas;color:CanvasText;font:inherit}" +
+    ".book-search ol{list-style:none;margin:.25rem 0 0;padding:0;max-height:70vh;overflow:auto;background:Canvas;border:1px solid rgba(127,127,127,.5);border-radius:.5rem}" +
+    ".book-search li a{display:block;padding:.5rem .75rem;color:inherit;text-decoration:none}" +
+    ".book-search li a:hover,.book-search li a:focus{background:rgba(127,127,127,.15)}" +
+    ".book-search-chapter,.book-search-snippet{display:block;font-size:.8em;opacity:.75}" +
+    ".book-search-empty{padding:.5rem .75rem;opacity:.75}" +
+    "@media print{.book-search{display:none}}";
+  document.head.appendChild(style);
+
+  var input = document.createElement("input");
+  input.type = "search";
+  input.placeholder = "Search this book…";
+  input.setAttribute("aria-label", "Search this book");
+  var list = document.createElement("ol");
+  list.hidden = true;
+  container.appendChild(input);
+  container.appendChild(list);
+  container.hidden = false;
+
+  input.addEventListener("focus", loadIndex, { once: true });
+  input.addEventListener("input", function () {
+    var query = input.value;
+    loadIndex().then(function () {
+      if (input.value === query) {
+        render(search(query), list, query.trim());
+      }
+    });
+  });
+  input.addEventListener("keydown", function (event) {
+    if (event.key === "Escape") {
+      input.value = "";
+      render([], list, "");
+    }
+  });
+  list.addEventListener("click", function () {
+    list.hidden = true;
+  });
+})();